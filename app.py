@@ -1,323 +1,1022 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
-from firebase import init_firebase
-from google.cloud import firestore
-import requests
-from PIL import Image
 import io
 import base64
 import time
 from datetime import datetime, time
 import base64
 import os
-from flask import send_from_directory
-from firebase_admin import firestore
+from flask import send_from_directory, send_file, make_response
 from io import BytesIO
 from pathlib import Path
 import subprocess
 import uuid
 import os
-from free_anime_generator import FreeAnimeGenerator
+import json
+import atexit
+import logging
+import threading
+from blob_store import LocalBlobStore, get_blob_store, is_content_key, store_character_image
+from character_pages import CHARACTER_LIST_FIELDS, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, CharacterPageCache, character_summary
+from esp_render_cache import EspRenderCache
+from esp_titles_view import TodayTitlesView
+from esp_variants import ESP_VARIANTS, VARIANT_MIMETYPES, EspVariantStore
+from generation_backends import HedgedGenerator, create_backends
+from generation_jobs import GenerationJobQueue, QueueFullError
+from lazy_init import LazyObject, force, init_seconds, is_initialized, lazy_module
+from observability import REGISTRY, cache_stats_collector, instrument_flask, setup_logging, timed
+from prompt_cache import PromptCache, prompt_cache_key
+from shared_cache import SharedCache, cache_backend_name, get_cache_store
+from tenants import (
+    CHARACTER_USER_FIELD, DEFAULT_USER_ID, TODO_USER_FIELD, TenantError, TenantResolver, tenant_key,
+    validate_tenant_id,
+)
+from todo_title_index import AmbiguousTodoError, TodoTitleIndex
+from todo_write_coalescer import TodoWriteCoalescer, TodoWriteStats, commit_updates, merge_todo_updates
 from functools import lru_cache
+from time import perf_counter
 from datetime import datetime, timedelta
 
+# gevent 워커에서 실행 중이면 gRPC(Firestore)를 gevent 루프와 호환되게 설정
+try:
+    from gevent import monkey
+    if monkey.is_module_patched('socket'):
+        from grpc.experimental import gevent as grpc_gevent
+        grpc_gevent.init_gevent()
+except ImportError:
+    pass
+
+# 로그는 백그라운드 대기열로 출력 (LOG_LEVEL=DEBUG이면 요청 본문 등 상세 로그 포함)
+setup_logging()
+logger = logging.getLogger(__name__)
+
 app = Flask(__name__)
 CORS(app)
+# 요청 처리 시간 히스토그램 + /metrics
+instrument_flask(app)
+
+# google.cloud.firestore(gRPC 포함)는 import만으로 수백 ms가 걸리므로 처음 사용할 때 로드
+firestore = lazy_module('google.cloud.firestore')
+api_exceptions = lazy_module('google.api_core.exceptions')
+
+def _create_db():
+    # FIRESTORE_BACKEND=memory 이면 자격 증명 없이 인메모리 Firestore 사용 (오프라인 실행 / 부하 테스트)
+    if os.environ.get('FIRESTORE_BACKEND') == 'memory':
+        from memory_firestore import MemoryFirestore
+        logger.info("🧪 인메모리 Firestore 사용")
+        return MemoryFirestore.from_env()
+
+    from firebase import init_firebase
+    return init_firebase("lg-dx-school-5eaae-firebase-adminsdk-fbsvc-41ea7b7d71.json")
 
-db = init_firebase("lg-dx-school-5eaae-firebase-adminsdk-fbsvc-41ea7b7d71.json")
+# Firestore 클라이언트는 첫 요청(또는 /warmup)에서 생성 → 콜드 스타트 시 /healthz가 바로 응답
+db = LazyObject(_create_db, 'firestore')
 
-# 캐시 설정
+# 캐시 설정 (CACHE_BACKEND=socket이면 호스트의 모든 워커가 한 벌을 공유)
 CACHE_DURATION = 300  # 5분
-last_esp_image_check = None
-cached_esp_image = None
-last_titles_check = None
-cached_titles = None
+esp_titles_cache = SharedCache('esp_titles', CACHE_DURATION)
+esp_image_selection_cache = SharedCache('esp_image_selection', CACHE_DURATION)
+
+# 요청의 사용자 / 기기 → 테넌트 (기기 → 사용자 매핑은 devices 컬렉션)
+tenant_resolver = TenantResolver(db, SharedCache('device_tenants', 600))
+
+def _request_tenant():
+    """X-User-Id / X-Device-Id 헤더(또는 ?user_id= / ?device=) → 테넌트, 둘 다 없으면 None(전체 범위)"""
+    return tenant_resolver.resolve(
+        request.args.get('user_id') or request.headers.get('X-User-Id'),
+        request.args.get('device') or request.headers.get('X-Device-Id'),
+    )
+
+@app.errorhandler(TenantError)
+def tenant_error(error):
+    return jsonify({'error': str(error)}), error.status
+
+# ESP 이미지 렌더 캐시 (원본 해시 + 크기 기반)
+ESP_IMAGE_SIZE = (400, 400)
+ESP_IMAGE_PATH = 'static/esp.jpg'
+ESP_TENANT_IMAGE_DIR = 'static/esp'
+esp_render_cache = EspRenderCache()
+esp_variant_store = EspVariantStore()
+esp_image_keys = {}  # 파일 경로 → 현재 들어있는 렌더 키
+
+def esp_image_path(tenant):
+    """테넌트별 ESP 이미지 파일 (테넌트가 없으면 기존 static/esp.jpg)"""
+    if tenant is None:
+        return ESP_IMAGE_PATH
+    return f"{ESP_TENANT_IMAGE_DIR}/{tenant}.jpg"
+
+# 캐릭터 이미지 저장소 (BLOB_STORE=local | firebase)
+blob_store = get_blob_store(ensure_app=lambda: force(db))
+
+# 롱폴링 / SSE 대기 시간 (초)
+TITLES_WAIT_TIMEOUT = 55
+SSE_KEEPALIVE_INTERVAL = 15
+
+# 오늘 할일 제목 뷰 (Firestore 리스너로 유지, 준비 전이나 실패 시 기존 조회 방식으로 대체)
+today_titles_view = TodayTitlesView(db)
+
+@app.route('/blobs/<key>', methods=['GET'])
+def get_blob(key):
+    """로컬 블롭 저장소의 이미지 제공 (콘텐츠 주소이므로 영구 캐시 가능)"""
+    if not isinstance(blob_store, LocalBlobStore) or not is_content_key(key) or not blob_store.exists(key):
+        return jsonify({'error': 'Not found'}), 404
+
+    response = send_file(blob_store.path_for(key), conditional=True, max_age=31536000)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
 
 @app.route("/esp-titles", methods=["GET"])
 def get_titles():
-    global last_titles_check, cached_titles
-    
+    tenant = _request_tenant()
     try:
-        current_time = datetime.now()
-        
-        # 캐시가 유효한 경우 캐시된 데이터 반환
-        if (last_titles_check is not None and 
-            cached_titles is not None and 
-            (current_time - last_titles_check).seconds < CACHE_DURATION):
-            return jsonify(cached_titles), 200
+        # 롱폴링: ?wait=<버전> 이면 목록이 바뀔 때까지 연결 유지
+        if 'wait' in request.args:
+            return _wait_for_titles(request.args.get('wait') or None, tenant)
+
+        # 리스너가 유지하는 뷰가 준비되어 있으면 Firestore 조회 없이 바로 응답
+        if today_titles_view is not None and today_titles_view.ready:
+            version, titles = today_titles_view.snapshot(tenant)
+            response = jsonify(titles)
+            response.headers['X-Titles-Version'] = str(version)
+            return response, 200
+
+        # 오늘 날짜를 'YYYY-MM-DD' 형식 문자열로 변환 (날짜가 캐시 키라서 자정에 자동으로 바뀜)
+        today_str = datetime.now().strftime("%Y-%m-%d")
+        titles = esp_titles_cache.get_or_load(
+            f"{tenant_key(tenant)}:{today_str}", lambda: _query_today_titles(today_str, tenant)
+        )
+
+        return jsonify(titles), 200
+
+    except Exception as e:
+        logger.exception("❌ esp-titles 오류: %s", e)
+        return jsonify({'error': str(e)}), 500
 
-        # 오늘 날짜를 'YYYY-MM-DD' 형식 문자열로 변환
-        today_str = current_time.strftime("%Y-%m-%d")
+def _query_today_titles(today_str, tenant=None):
+    """오늘 마감인 미완료 할일 제목 조회 (limit 없이 누락 방지)"""
+    query = db.collection("todos") \
+        .where("due_date_string", "==", today_str) \
+        .where("is_completed", "==", False)
+    if tenant is not None:
+        query = query.where(TODO_USER_FIELD, "==", tenant)
 
-        # 쿼리 최적화: limit 추가
-        docs = db.collection("todos").filter("is_completed", "==", False).limit(20).stream()
+    with timed('firestore_query'):
+        docs = query.select(["title"]).stream()
 
         titles = []
         for doc in docs:
             data = doc.to_dict()
-            due = data.get("due_date_string", "")
-
-            if due == today_str and "title" in data:
+            if "title" in data:
                 titles.append(data["title"])
-
-        # 캐시 업데이트
-        last_titles_check = current_time
-        cached_titles = titles
-
-        return jsonify(titles), 200
-
-    except Exception as e:
-        print(f"❌ esp-titles 오류: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+    return titles
+
+def _wait_for_titles(version, tenant=None):
+    """/esp-titles?wait=<버전> 롱폴링 처리
+
+    gevent 워커(gunicorn.conf.py)에서는 대기 중인 연결이 스레드가 아닌 greenlet을
+    점유하므로 수백 개의 유휴 기기 연결도 적은 비용으로 유지할 수 있습니다.
+    """
+    if today_titles_view is None or not today_titles_view.ready:
+        return jsonify({'error': '실시간 할일 뷰를 사용할 수 없습니다'}), 503
+
+    timeout = min(request.args.get('timeout', TITLES_WAIT_TIMEOUT, type=float), TITLES_WAIT_TIMEOUT)
+
+    current = today_titles_view.snapshot(tenant)
+    if version is None or current[0] != version:
+        result = current
+    else:
+        result = today_titles_view.wait_for_change(version, timeout, tenant)
+
+    if result is None:
+        # 시간 안에 변경 없음 → 같은 버전으로 다시 요청하면 됨
+        response = make_response('', 304)
+        response.headers['X-Titles-Version'] = str(version)
+        return response
+
+    version, titles = result
+    response = jsonify({'version': version, 'titles': titles})
+    response.headers['X-Titles-Version'] = str(version)
+    return response
+
+@app.route("/esp-titles/stream", methods=["GET"])
+def stream_titles():
+    """할일 목록 변경을 Server-Sent Events로 전달
+
+    이벤트 id가 버전이므로 재연결 시 Last-Event-ID(또는 ?since=)로 이어받을 수 있습니다.
+    """
+    tenant = _request_tenant()
+    if today_titles_view is None or not today_titles_view.ready:
+        return jsonify({'error': '실시간 할일 뷰를 사용할 수 없습니다'}), 503
+
+    since = request.headers.get('Last-Event-ID', request.args.get('since')) or None
+
+    def events():
+        version = since
+        current = today_titles_view.snapshot(tenant)
+        while True:
+            if current is None:
+                # 변경 없이 대기 시간이 지나면 연결 유지를 위한 주석 전송
+                yield ": keepalive\n\n"
+            elif current[0] != version:
+                version, titles = current
+                data = json.dumps(titles, ensure_ascii=False)
+                yield f"id: {version}\nevent: titles\ndata: {data}\n\n"
+            current = today_titles_view.wait_for_change(version, SSE_KEEPALIVE_INTERVAL, tenant)
+
+    return Response(events(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
 
 @app.route('/esp-image', methods=['GET'])
 def get_selected_image_for_esp():
-    global last_esp_image_check, cached_esp_image
-    
+    tenant = _request_tenant()
     try:
-        current_time = datetime.now()
-        
-        # 캐시가 유효한 경우 캐시된 데이터 반환
-        if (last_esp_image_check is not None and 
-            cached_esp_image is not None and 
-            (current_time - last_esp_image_check).seconds < CACHE_DURATION):
-            return jsonify(cached_esp_image)
-
-        print("🔍 ESP 이미지 요청 시작...")
-
-        # 쿼리 최적화: 필요한 필드만 선택
-        docs = db.collection('characters') \
-            .filter('is_selected', '==', True) \
-            .select('image_url') \
-            .limit(1).stream()
-
-        selected_doc = next(docs, None)
-
-        if not selected_doc:
-            print("❌ 선택된 캐릭터가 없습니다")
+        variant = request.args.get('variant')
+        if variant is not None and variant not in ESP_VARIANTS:
+            return jsonify({
+                "error": f"Unknown variant: {variant}",
+                "variants": sorted(ESP_VARIANTS)
+            }), 400
+
+        selected = _load_selected_esp_image(tenant)
+        if selected is None:
             return jsonify({"error": "No selected character found"}), 404
 
-        data = selected_doc.to_dict()
-        image_url = data.get('image_url')
+        result, etag, load_source = selected
 
-        if not image_url:
-            print("❌ 이미지 URL이 없습니다")
-            return jsonify({"error": "No image URL found"}), 404
+        if variant is not None:
+            return _esp_variant_response(variant, etag, load_source)
 
-        result = None
-        
-        # Base64 이미지 처리
-        if image_url.startswith('data:image'):
-            print("📷 Base64 이미지 처리 중...")
+        # 기기가 이미 같은 이미지를 갖고 있으면 디코딩/리사이즈 없이 304
+        if load_source is not None and not request.if_none_match.contains(etag):
+            _materialize_esp_image(etag, load_source, result['image_url'])
 
-            # static 폴더 생성
-            os.makedirs('static', exist_ok=True)
+        return _esp_image_response(result, etag)
 
-            # base64 디코딩 → 이미지 열기
-            header, encoded = image_url.split(',', 1)
-            image_data = base64.b64decode(encoded)
-            image = Image.open(BytesIO(image_data))
-
-            if image.mode != "RGB":
-                image = image.convert("RGB")
+    except Exception as e:
+        logger.exception("❌ ESP 이미지 오류: %s", e)
+        return jsonify({"error": str(e)}), 500
 
-            resized_image = image.resize((400, 400))
+def _load_selected_esp_image(tenant=None):
+    """선택된 캐릭터 이미지 조회 (TTL 캐시, 테넌트별)
 
-            file_path = 'static/esp.jpg'
-            resized_image.save(file_path, format='JPEG')
+    Returns:
+        (result, etag, load_source) 또는 선택된 캐릭터가 없으면 None.
+        load_source는 원본 이미지 바이트를 돌려주는 함수이며 외부 네트워크 이미지인 경우 None입니다.
+    """
+    return _with_source_loader(esp_image_selection_cache.get_or_load(
+        tenant_key(tenant), lambda: _query_selected_esp_image(tenant)
+    ))
 
-            print("✅ 이미지 파일 저장 완료 (400x400)")
-            result = {"image_url": "static/esp.jpg"}
-        else:
-            print("🔗 네트워크 이미지 URL 반환")
-            result = {"image_url": image_url}
+def _query_selected_esp_image(tenant=None):
+    logger.debug("🔍 ESP 이미지 요청 시작...")
 
-        # 캐시 업데이트
-        last_esp_image_check = current_time
-        cached_esp_image = result
+    # 쿼리 최적화: 필요한 필드만 선택
+    query = db.collection('characters').where('is_selected', '==', True)
+    if tenant is not None:
+        query = query.where(CHARACTER_USER_FIELD, '==', tenant)
 
-        return jsonify(result)
+    with timed('firestore_query'):
+        docs = query.select(['image_url', 'image_ref']).limit(1).stream()
+        selected_doc = next(docs, None)
 
+    return _esp_image_source(selected_doc, tenant)
+
+def _with_source_loader(selected):
+    """캐시된 (result, etag, source) → (result, etag, load_source)"""
+    if selected is None:
+        return None
+    result, etag, source = selected
+    return result, etag, _source_loader(source)
+
+def _source_loader(source):
+    """원본 위치 ('blob', 키) / ('data', base64) → 원본 바이트를 돌려주는 함수 (네트워크 이미지는 None)"""
+    if source is None:
+        return None
+    kind, value = source
+    if kind == 'blob':
+        return lambda: blob_store.get(value)
+    return lambda: base64.b64decode(value)
+
+def _esp_image_source(selected_doc, tenant=None):
+    """선택된 캐릭터 문서 → (result, etag, source), 이미지가 없으면 None
+
+    공유 캐시(다른 워커 프로세스)에 그대로 저장할 수 있도록 원본은 함수 대신 위치로 돌려줍니다.
+    """
+    if not selected_doc:
+        logger.info("❌ 선택된 캐릭터가 없습니다")
+        return None
+
+    data = selected_doc.to_dict()
+    image_url = data.get('image_url')
+
+    if not image_url:
+        logger.warning("❌ 이미지 URL이 없습니다")
+        return None
+
+    image_ref = data.get('image_ref')
+
+    if image_ref:
+        # 블롭 저장소 이미지: 키가 이미 콘텐츠 해시이므로 그대로 렌더 키로 사용
+        blob_key = image_ref['key']
+        etag = EspRenderCache.make_key(blob_key, ESP_IMAGE_SIZE)
+        source = ('blob', blob_key)
+    elif image_url.startswith('data:image'):
+        header, encoded = image_url.split(',', 1)
+        etag = EspRenderCache.make_key(encoded, ESP_IMAGE_SIZE)
+        source = ('data', encoded)
+    else:
+        logger.debug("🔗 네트워크 이미지 URL 반환")
+        source = None
+        etag = EspRenderCache.make_key(image_url, ESP_IMAGE_SIZE)
+
+    if source is not None:
+        result = {"image_url": esp_image_path(tenant)}
+
+        # 새 캐릭터가 선택되면 기기별 variant를 백그라운드에서 한 번 렌더링
+        if not esp_variant_store.is_rendered(etag):
+            threading.Thread(
+                target=_render_esp_variants, args=(etag, _source_loader(source)), daemon=True
+            ).start()
+    else:
+        result = {"image_url": image_url}
+
+    return result, etag, source
+
+def _materialize_esp_image(etag, load_source, path=ESP_IMAGE_PATH):
+    """선택이 바뀐 경우에만 ESP 이미지 파일(테넌트별) 교체"""
+    if esp_image_keys.get(path) == etag:
+        return
+
+    logger.info("📷 ESP 이미지 처리 중...")
+    key, jpeg_bytes = esp_render_cache.render(etag, load_source, ESP_IMAGE_SIZE)
+
+    # 렌더링은 원본 기준으로 캐시되므로 같은 캐릭터를 고른 테넌트끼리는 파일 쓰기만 따로 함
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(jpeg_bytes)
+    os.replace(tmp_path, path)
+    esp_image_keys[path] = key
+
+    logger.info("✅ 이미지 파일 저장 완료 (400x400)")
+
+def _render_esp_variants(etag, load_source):
+    try:
+        esp_variant_store.ensure(etag, load_source)
     except Exception as e:
-        print(f"❌ ESP 이미지 오류: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return jsonify({"error": str(e)}), 500
-
-# 할일 ID 캐시
-todo_id_cache = {}
+        logger.exception("❌ ESP variant 렌더링 오류: %s", e)
+
+def _esp_image_response(result, etag):
+    """ETag/If-None-Match 처리를 포함한 /esp-image 응답 생성"""
+    if etag and request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    else:
+        response = jsonify(result)
+    response.set_etag(etag)
+    # 기기가 매번 ETag로 재검증하도록 설정
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def _esp_variant_response(variant, etag, load_source):
+    """미리 렌더링된 variant 파일을 그대로 전송"""
+    if load_source is None:
+        return jsonify({"error": "Variants are only available for uploaded images"}), 404
+
+    variant_etag = f"{etag}-{variant}"
+    fmt, (width, height) = ESP_VARIANTS[variant]
+
+    if request.if_none_match.contains(variant_etag):
+        response = make_response('', 304)
+    else:
+        esp_variant_store.ensure(etag, load_source)
+        # send_file은 wsgi.file_wrapper(sendfile)를 사용하므로 요청마다 파일을 메모리로 복사하지 않음
+        response = send_file(
+            esp_variant_store.variant_path(etag, variant),
+            mimetype=VARIANT_MIMETYPES[fmt],
+            conditional=False,
+            etag=False,
+        )
+
+    response.set_etag(variant_etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Image-Format'] = fmt
+    response.headers['X-Image-Width'] = str(width)
+    response.headers['X-Image-Height'] = str(height)
+    return response
+
+# 제목 → 할일 문서 ID 인덱스 (리스너로 이름 변경/삭제 반영)
+todo_title_index = TodoTitleIndex(db)
+
+# 할일 업데이트 쓰기 증폭 통계 (방식별)
+todo_write_stats = {
+    'direct': TodoWriteStats(),
+    'batch': TodoWriteStats(),
+    'coalesced': TodoWriteStats(),
+}
+
+# 병합 대기 시간 (초, 0이면 병합하지 않고 바로 기록)
+TODO_COALESCE_WINDOW = float(os.environ.get('TODO_COALESCE_WINDOW', '0'))
+todo_write_coalescer = None
+if TODO_COALESCE_WINDOW > 0:
+    todo_write_coalescer = TodoWriteCoalescer(
+        db, TODO_COALESCE_WINDOW, todo_write_stats['coalesced'],
+        on_failure=todo_title_index.invalidate_doc,
+    )
+    atexit.register(todo_write_coalescer.flush)
+
+def _find_todo_ref(title, doc_id=None, tenant=None):
+    """제목(또는 명시한 ID)으로 할일 문서 참조 찾기, 없으면 None (테넌트가 있으면 그 사용자의 할일만)
+
+    Raises:
+        AmbiguousTodoError: 같은 제목의 할일이 여러 개라 하나로 정할 수 없을 때
+    """
+    doc_id = doc_id or todo_title_index.resolve(title, tenant)
+    if not doc_id:
+        return None
+    return db.collection('todos').document(doc_id)
+
+def _update_todo_doc(title, doc_ref, update_data, tenant=None, doc_id=None):
+    """할일 문서 업데이트 (존재 확인 읽기 없이 바로 기록)
+
+    인덱스가 가리키던 문서가 삭제된 경우 update의 NotFound로 감지하고,
+    인덱스를 정리한 뒤 제목으로 한 번 더 찾아서 기록합니다.
+    요청에서 ID를 명시했으면(doc_id) 다른 할일로 바꾸지 않고 None을 반환합니다.
+
+    Returns:
+        실제로 업데이트한 문서 참조, 해당 할일이 없으면 None
+
+    Raises:
+        AmbiguousTodoError: 다시 찾을 때 같은 제목의 할일이 여러 개일 때
+    """
+    try:
+        doc_ref.update(update_data)
+        return doc_ref
+    except api_exceptions.NotFound:
+        todo_title_index.invalidate_doc(doc_ref.id)
+    if doc_id:
+        return None
+
+    doc_ref = _find_todo_ref(title, tenant=tenant)
+    if not doc_ref:
+        return None
+    doc_ref.update(update_data)
+    return doc_ref
+
+def _ambiguous_todo_response(error):
+    return jsonify({
+        'error': str(error),
+        'candidates': error.candidates,
+        'hint': '요청에 id를 함께 보내면 해당 할일만 업데이트합니다',
+    }), 409
+
+def _build_todo_update(data):
+    """요청 데이터에서 Firestore 업데이트 필드 구성"""
+    update_data = {'is_completed': data.get('is_completed', False)}
+
+    if data.get('start_time') is not None:
+        update_data['start_time'] = data['start_time']
+    if data.get('stop_time') is not None:
+        update_data['stop_time'] = data['stop_time']
+    if data.get('pause_time') is not None:
+        update_data['pause_times'] = data['pause_time']
+    if data.get('resume_time') is not None:
+        update_data['resume_times'] = data['resume_time']
+
+    return update_data
 
 @app.route('/update-todo', methods=['POST'])
 def update_todo():
+    tenant = _request_tenant()
     try:
         data = request.get_json()
         title = data.get('title')
-        completed = data.get('is_completed', False)
-        start_time = data.get('start_time')
-        stop_time = data.get('stop_time')
-        pause_times = data.get('pause_time')
-        resume_times = data.get('resume_time')
 
-        print(f"\n🚀 /update-todo 호출됨")
-        print(f"📥 받은 데이터: {data}")
+        # 요청 본문은 LOG_LEVEL=DEBUG일 때만 기록
+        logger.debug("📥 /update-todo 받은 데이터: %s", data)
 
         if not title:
-            print(f"❌ title 없음! 업데이트 불가")
+            logger.warning("❌ title 없음! 업데이트 불가")
             return jsonify({'error': '할일 제목(title)이 필요합니다'}), 400
 
-        # 캐시된 ID 확인
-        doc_id = todo_id_cache.get(title)
-        doc_ref = None
-
-        if doc_id:
-            # 캐시된 ID가 있으면 직접 참조
-            doc_ref = db.collection('todos').document(doc_id)
-            doc = doc_ref.get()
-            if not doc.exists:
-                # 캐시가 무효한 경우
-                doc_ref = None
-                del todo_id_cache[title]
+        try:
+            doc_ref = _find_todo_ref(title, data.get('id'), tenant)
+        except AmbiguousTodoError as e:
+            logger.warning("❌ '%s' 제목의 할일이 여러 개: %s", title, e.candidates)
+            return _ambiguous_todo_response(e)
 
         if not doc_ref:
-            # 캐시 미스: title로 검색
-            query = db.collection('todos').filter('title', '==', title).limit(1).get()
-            if not query:
-                print(f"❌ '{title}'에 해당하는 문서 없음")
-                return jsonify({'error': f'"{title}"에 해당하는 할일이 없습니다'}), 404
-
-            doc = query[0]
-            doc_ref = doc.reference
-            # ID 캐시 업데이트
-            todo_id_cache[title] = doc.id
-
-        print(f"✅ 문서 찾음 → ID: {doc_ref.id}")
-
-        update_data = {'is_completed': completed}
-
-        if start_time is not None:
-            update_data['start_time'] = start_time
-        if stop_time is not None:
-            update_data['stop_time'] = stop_time
-        if pause_times is not None:
-            update_data['pause_times'] = pause_times
-        if resume_times is not None:
-            update_data['resume_times'] = resume_times
+            logger.info("❌ '%s'에 해당하는 문서 없음", title)
+            return jsonify({'error': f'"{title}"에 해당하는 할일이 없습니다'}), 404
+
+        logger.debug("✅ 문서 찾음 → ID: %s", doc_ref.id)
+
+        update_data = _build_todo_update(data)
+
+        # 병합 모드: 대기열에 넣고 바로 응답 (window초 뒤 한 번에 기록)
+        if todo_write_coalescer is not None:
+            todo_write_coalescer.submit(doc_ref, update_data)
+            logger.debug("⏳ '%s' 업데이트 병합 대기 (%s초)", title, TODO_COALESCE_WINDOW)
+            return jsonify({'success': True, 'id': doc_ref.id, 'updated': update_data, 'coalesced': True}), 202
 
         # Firestore 업데이트
-        print(f"📤 업데이트할 데이터: {update_data}")
-        doc_ref.update(update_data)
+        logger.debug("📤 업데이트할 데이터: %s", update_data)
+        try:
+            doc_ref = _update_todo_doc(title, doc_ref, update_data, tenant, data.get('id'))
+        except AmbiguousTodoError as e:
+            logger.warning("❌ '%s' 제목의 할일이 여러 개: %s", title, e.candidates)
+            return _ambiguous_todo_response(e)
+        if not doc_ref:
+            logger.info("❌ '%s'에 해당하는 문서 없음", title)
+            return jsonify({'error': f'"{title}"에 해당하는 할일이 없습니다'}), 404
+        todo_write_stats['direct'].record(updates=1, writes=1, commits=1)
 
-        print(f"✅ '{title}' 문서({doc_ref.id}) 업데이트 완료")
-        print(f"🔥 최종 Firestore에 저장된 is_completed 값: {completed}\n")
+        logger.info("✅ '%s' 문서(%s) 업데이트 완료 - is_completed: %s", title, doc_ref.id, update_data['is_completed'])
 
         return jsonify({'success': True, 'id': doc_ref.id, 'updated': update_data})
 
     except Exception as e:
-        print(f"❌ 할일 업데이트 오류: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("❌ 할일 업데이트 오류: %s", e)
         return jsonify({'error': str(e)}), 500
 
+@app.route('/update-todo/batch', methods=['POST'])
+def update_todo_batch():
+    """여러 할일 업데이트를 WriteBatch 하나로 기록
+
+    요청: {"updates": [{"title": ..., "is_completed": ..., ...}, ...]} 또는 업데이트 배열
+    같은 할일에 대한 업데이트는 순서대로 병합되어 한 번만 기록됩니다.
+    """
+    tenant = _request_tenant()
+    try:
+        data = request.get_json()
+        items = data.get('updates') if isinstance(data, dict) else data
+        if not isinstance(items, list) or not items:
+            return jsonify({'error': '업데이트 배열(updates)이 필요합니다'}), 400
+
+        logger.debug("🚀 /update-todo/batch 호출됨 - %d건", len(items))
+
+        results = []
+        pending = {}  # 문서 ID → (doc_ref, 병합된 업데이트)
+        for item in items:
+            title = item.get('title') if isinstance(item, dict) else None
+            if not title:
+                results.append({'title': title, 'success': False, 'error': '할일 제목(title)이 필요합니다'})
+                continue
+
+            try:
+                doc_ref = _find_todo_ref(title, item.get('id'), tenant)
+            except AmbiguousTodoError as e:
+                results.append({'title': title, 'success': False, 'error': str(e), 'candidates': e.candidates})
+                continue
+
+            if not doc_ref:
+                results.append({'title': title, 'success': False, 'error': f'"{title}"에 해당하는 할일이 없습니다'})
+                continue
+
+            update_data = _build_todo_update(item)
+            if doc_ref.id in pending:
+                update_data = merge_todo_updates(pending[doc_ref.id][1], update_data)
+            pending[doc_ref.id] = (doc_ref, update_data)
+            results.append({'title': title, 'success': True, 'id': doc_ref.id})
+
+        stats = TodoWriteStats()
+        stats.record(updates=len(items))
+        failures = commit_updates(db, list(pending.values()), stats)
+
+        for doc_id in failures:
+            todo_title_index.invalidate_doc(doc_id)
+
+        for result in results:
+            if result.get('id') in failures:
+                result['success'] = False
+                result['error'] = failures[result['id']]
+
+        todo_write_stats['batch'].record(updates=stats.updates, writes=stats.writes, commits=stats.commits)
+        logger.info("✅ 배치 업데이트 완료 - 요청 %d건 → 문서 쓰기 %d건, 커밋 %d회", stats.updates, stats.writes, stats.commits)
+
+        return jsonify({
+            'success': all(r['success'] for r in results),
+            'results': results,
+            # 요청마다 따로 기록했다면 updates건의 쓰기와 updates회의 RPC가 필요
+            'write_amplification': {
+                'before': {'writes': stats.updates, 'commits': stats.updates},
+                'after': {'writes': stats.writes, 'commits': stats.commits},
+            },
+        })
+
+    except Exception as e:
+        logger.exception("❌ 배치 업데이트 오류: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/update-todo/stats', methods=['GET'])
+def update_todo_stats():
+    """업데이트 방식별 쓰기 증폭 통계"""
+    result = {mode: stats.to_dict() for mode, stats in todo_write_stats.items()}
+    result['title_index'] = todo_title_index.stats()
+    return jsonify(result)
+
+def _parse_generation_request(data, user_id=None, base_url=None):
+    """생성 요청 검증 → (작업 파라미터, 오류 메시지)
+
+    캐릭터 소유자는 본문의 user_id, 없으면 user_id 인자(X-User-Id 헤더), 둘 다 없으면 anonymous_user입니다.
+    base_url(요청의 host_url)은 BLOB_PUBLIC_BASE_URL이 없을 때 이미지 URL의 서버 주소로 씁니다.
+    """
+    # 데이터 검증 추가
+    if not data:
+        return None, '요청 데이터가 없습니다'
+
+    prompt = data.get('prompt')
+    if not prompt:
+        return None, '프롬프트가 필요합니다'
+
+    size = data.get('size', 512)
+    if not isinstance(size, int) or not 64 <= size <= 1024:
+        return None, 'size는 64~1024 사이의 정수여야 합니다'
+
+    try:
+        user_id = validate_tenant_id(data.get('user_id') or user_id or DEFAULT_USER_ID)
+    except TenantError as e:
+        return None, str(e)
+
+    params = {
+        'user_id': user_id,
+        'prompt': prompt,
+        'name': data.get('name', f'AI Character {datetime.now().strftime("%Y%m%d_%H%M%S")}'),
+        'style': data.get('style', '3D mascot'),
+        'size': size,
+        # True이면 캐시를 건너뛰고 새 이미지를 생성
+        'new_variation': bool(data.get('new_variation', False)),
+        'base_url': base_url,
+    }
+    return params, None
+
+# 이미지 생성 백엔드 (우선순위 순서, 서킷 브레이커 + p95 지연 시 다음 백엔드 동시 시작)
+# GENERATION_BACKENDS=stub 으로 외부 API 없이 테스트 가능
+image_generator = HedgedGenerator(
+    create_backends(os.environ.get('GENERATION_BACKENDS', 'pollinations,huggingface')),
+    default_hedge_delay=float(os.environ.get('GENERATION_HEDGE_DELAY', '10')),
+)
+
+def _generate_image(prompt, style, size):
+    """프롬프트로 이미지 생성 → (이미지 바이트, content type)"""
+    with timed('generation'):
+        return image_generator.generate(prompt, style, size, timeout=GENERATION_SYNC_TIMEOUT)
+
+def _character_document(character_id, params, image_fields):
+    """characters 컬렉션에 저장할 문서"""
+    return {
+        'character_id': character_id,
+        'user_id': params.get('user_id', DEFAULT_USER_ID),
+        'name': params['name'],
+        'prompt': params['prompt'],
+        'generation_type': 'prompt',
+        **image_fields,
+        'created_at': firestore.SERVER_TIMESTAMP,
+        'type': 'custom',
+        'style': params['style'],
+        'is_selected': False  # 기본값으로 선택되지 않은 상태
+    }
+
+def _generate_character(params):
+    """캐릭터 이미지 생성 후 Firestore에 저장 (생성 작업 워커에서 실행)"""
+    prompt = params['prompt']
+    name = params['name']
+    style = params['style']
+    size = (params.get('size', 512),) * 2
+
+    logger.info("🎨 캐릭터 생성 시작 - 프롬프트: %s", prompt)
+    logger.debug("📝 이름: %s, 스타일: %s", name, style)
+
+    # 같은 프롬프트/스타일/크기면 캐시된 이미지를 재사용하고, 동시에 들어온 같은 요청은 한 번만 생성
+    cache_key = prompt_cache_key(prompt, style, size)
+    if params.get('new_variation'):
+        image_bytes, content_type = _generate_image(prompt, style, size)
+        prompt_cache.put(cache_key, image_bytes, content_type)
+    else:
+        image_bytes, content_type = prompt_cache.get_or_generate(
+            cache_key, lambda: _generate_image(prompt, style, size)
+        )
+
+    # 원본과 썸네일은 블롭 저장소에, 문서에는 참조만 저장
+    image_fields = store_character_image(blob_store, image_bytes, content_type, params.get('base_url'))
+
+    # Firestore 저장
+    character_ref = db.collection('characters').document()
+    character_id = character_ref.id
+
+    character_ref.set(_character_document(character_id, params, image_fields))
+    logger.info("✅ 캐릭터 저장 완료 - ID: %s", character_id)
+    character_page_cache.invalidate()
+
+    return {
+        'character_id': character_id,
+        'image_url': image_fields['image_url'],
+        'thumbnail_urls': image_fields['thumbnail_urls'],
+    }
+
+# 프롬프트 결과 캐시 (항목 수 / 전체 바이트 한도 중 먼저 도달하는 쪽으로 LRU 제거)
+prompt_cache = PromptCache(
+    max_entries=int(os.environ.get('PROMPT_CACHE_MAX_ENTRIES', '64')),
+    max_bytes=int(os.environ.get('PROMPT_CACHE_MAX_BYTES', str(64 * 1024 * 1024))),
+)
+
+# 생성 작업 큐 (워커 수 / 대기열 크기 제한)
+# 작업 상태는 GENERATION_JOBS_DB(SQLite)에 두므로 gunicorn 워커 어디로 조회가 와도 같은 작업이 보임
+# (''이면 프로세스 메모리 - 워커가 하나일 때만 사용)
+GENERATION_SYNC_TIMEOUT = float(os.environ.get('GENERATION_SYNC_TIMEOUT', '120'))
+GENERATION_WAIT_LIMIT = 60
+generation_jobs = GenerationJobQueue(
+    _generate_character,
+    workers=int(os.environ.get('GENERATION_WORKERS', '2')),
+    max_queue=int(os.environ.get('GENERATION_QUEUE_SIZE', '16')),
+    db_path=os.environ.get('GENERATION_JOBS_DB', 'generation_jobs.db') or None,
+    max_attempts=int(os.environ.get('GENERATION_MAX_ATTEMPTS', '3')),
+)
+
+def _queue_full_response(error):
+    response = jsonify({'error': str(error)})
+    response.headers['Retry-After'] = '10'
+    return response, 429
+
+@app.route('/generate/prompt/jobs', methods=['POST'])
+def submit_generation_job():
+    """생성 작업을 대기열에 넣고 작업 ID를 바로 반환"""
+    params, error = _parse_generation_request(
+        request.get_json(), request.headers.get('X-User-Id'), request.host_url
+    )
+    if error:
+        return jsonify({'error': error}), 400
+
+    try:
+        job = generation_jobs.submit(params)
+    except QueueFullError as e:
+        return _queue_full_response(e)
+
+    logger.info("📥 생성 작업 등록: %s", job['id'])
+    return jsonify({'job_id': job['id'], 'status': job['status'], 'status_url': f"/jobs/{job['id']}"}), 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_generation_job(job_id):
+    """생성 작업 상태 조회 (?wait=<초> 이면 끝날 때까지 최대 그 시간만큼 대기)"""
+    wait = min(request.args.get('wait', 0, type=float), GENERATION_WAIT_LIMIT)
+    job = generation_jobs.wait(job_id, wait) if wait > 0 else generation_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': '작업을 찾을 수 없습니다'}), 404
+    return jsonify(job)
+
+@app.route('/generate/backends', methods=['GET'])
+def generation_backend_stats():
+    """생성 백엔드별 서킷 상태 / 응답 시간과 캐시 · 작업 큐 통계"""
+    return jsonify({
+        'backends': image_generator.stats(),
+        'prompt_cache': prompt_cache.stats(),
+        'jobs': generation_jobs.stats(),
+    })
+
 @app.route('/generate/prompt', methods=['POST'])
 def generate_from_prompt():
+    """동기 생성 API (작업 큐에 넣고 끝날 때까지 대기하는 호환용 래퍼)"""
     try:
-        data = request.get_json()
-        
-        # 데이터 검증 추가
-        if not data:
-            return jsonify({'error': '요청 데이터가 없습니다'}), 400
-            
-        prompt = data.get('prompt')
-        if not prompt:
-            return jsonify({'error': '프롬프트가 필요합니다'}), 400
-            
-        name = data.get('name', f'AI Character {datetime.now().strftime("%Y%m%d_%H%M%S")}')
-        style = data.get('style', '3D mascot')
-
-        print(f"🎨 캐릭터 생성 시작 - 프롬프트: {prompt}")
-        print(f"📝 이름: {name}, 스타일: {style}")
+        params, error = _parse_generation_request(
+            request.get_json(), request.headers.get('X-User-Id'), request.host_url
+        )
+        if error:
+            return jsonify({'error': error}), 400
 
         try:
-            # FreeAnimeGenerator 사용 (만약 없다면 대체 방법 사용)
-            generator = FreeAnimeGenerator()
-            image_url = generator.generate_with_pollinations(prompt)
-
-            if not image_url:
-                raise Exception("이미지 생성 실패")
-
-            # 이미지 다운로드 → static/images 에 저장
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"ai_character_{timestamp}.png"
-            filepath = generator.download_image(image_url, filename)
-
-            if not filepath:
-                raise Exception("이미지 다운로드 실패")
-
-            # Base64 인코딩
-            with open(filepath, "rb") as image_file:
-                img_base64 = base64.b64encode(image_file.read()).decode()
-            image_data_url = f"data:image/png;base64,{img_base64}"
-            
-        except Exception as gen_error:
-            print(f"❌ FreeAnimeGenerator 오류: {gen_error}")
-            # 대체 방법: 허깅페이스 API 사용
-            try:
-                print("🔄 허깅페이스 API로 대체 시도...")
-                
-                # 애니메이션 스타일 프롬프트 개선
-                enhanced_prompt = f"anime style, cute character, {prompt}, high quality, detailed"
-                
-                payload = {
-                    "inputs": enhanced_prompt,
-                    "parameters": {
-                        "num_inference_steps": 30,
-                        "guidance_scale": 7.5,
-                        "width": 512,
-                        "height": 512
-                    }
-                }
-                
-                image_bytes = query_huggingface(payload)
-                
-                # 이미지를 Base64로 인코딩
-                img_base64 = base64.b64encode(image_bytes).decode()
-                image_data_url = f"data:image/png;base64,{img_base64}"
-                
-                print("✅ 허깅페이스 API로 이미지 생성 성공")
-                
-            except Exception as hf_error:
-                print(f"❌ 허깅페이스 API도 실패: {hf_error}")
-                return jsonify({'error': f'이미지 생성 실패: {str(hf_error)}'}), 500
-
-        # Firestore 저장
-        character_ref = db.collection('characters').document()
-        character_id = character_ref.id
-
-        character_data = {
-            'character_id': character_id,
-            'user_id': 'anonymous_user',
-            'name': name,
-            'prompt': prompt,
-            'generation_type': 'prompt',
-            'image_url': image_data_url,
-            'created_at': firestore.SERVER_TIMESTAMP,
-            'type': 'custom',
-            'style': style,
-            'is_selected': False  # 기본값으로 선택되지 않은 상태
-        }
-
-        character_ref.set(character_data)
-        print(f"✅ 캐릭터 저장 완료 - ID: {character_id}")
+            job = generation_jobs.submit(params)
+        except QueueFullError as e:
+            return _queue_full_response(e)
+
+        job = generation_jobs.wait(job['id'], GENERATION_SYNC_TIMEOUT)
+
+        if job['status'] == 'failed':
+            return jsonify({'error': job['error']}), 500
+
+        if job['status'] != 'succeeded':
+            # 제한 시간 안에 끝나지 않으면 작업 ID로 이어서 조회하도록 안내
+            return jsonify({
+                'success': False,
+                'job_id': job['id'],
+                'status': job['status'],
+                'status_url': f"/jobs/{job['id']}"
+            }), 202
 
         return jsonify({
             'success': True,
-            'character_id': character_id,
-            'image_url': image_data_url,
+            'character_id': job['result']['character_id'],
+            'image_url': job['result']['image_url'],
+            'thumbnail_urls': job['result']['thumbnail_urls'],
             'message': '캐릭터가 성공적으로 생성되고 저장되었습니다!'
         })
 
     except Exception as e:
-        print(f"❌ 캐릭터 생성 오류: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return jsonify({'error': f'캐릭터 생성 중 오류 발생: {str(e)}'}), 500 
\ No newline at end of file
+        logger.exception("❌ 캐릭터 생성 오류: %s", e)
+        return jsonify({'error': f'캐릭터 생성 중 오류 발생: {str(e)}'}), 500
+
+
+# 캐릭터 목록 페이지 캐시 (캐릭터 생성 / 선택 시 비움)
+character_page_cache = CharacterPageCache(ttl=int(os.environ.get('CHARACTER_PAGE_CACHE_TTL', '60')))
+
+def _load_character_page(cursor, limit, include_image, tenant=None):
+    """created_at 내림차순으로 한 페이지 조회 (cursor: 이전 페이지 마지막 문서 ID)
+
+    테넌트가 있으면 그 사용자의 캐릭터만 조회합니다 (user_id + created_at 복합 색인 필요).
+    """
+    fields = CHARACTER_LIST_FIELDS + (['image_url'] if include_image else [])
+    query = db.collection('characters')
+    if tenant is not None:
+        query = query.where(CHARACTER_USER_FIELD, '==', tenant)
+    query = query \
+        .order_by('created_at', direction=firestore.Query.DESCENDING) \
+        .select(fields)
+
+    if cursor:
+        cursor_doc = db.collection('characters').document(cursor).get(field_paths=['created_at'])
+        if not cursor_doc.exists:
+            return None
+        query = query.start_after(cursor_doc)
+
+    # 다음 페이지가 있는지 알기 위해 하나 더 조회
+    with timed('firestore_query'):
+        docs = list(query.limit(limit + 1).stream())
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+
+    return {
+        'characters': [character_summary(doc, include_image) for doc in docs],
+        'next_cursor': docs[-1].id if has_more else None,
+    }
+
+@app.route('/characters', methods=['GET'])
+def list_characters():
+    """캐릭터 목록 (이미지 본문 대신 썸네일 URL, ?cursor=<문서 ID>&limit=<개수>로 페이지 이동)
+
+    ?include_image=1 이면 원본 image_url도 함께 반환합니다.
+    """
+    tenant = _request_tenant()
+    limit = max(1, min(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), MAX_PAGE_SIZE))
+    cursor = request.args.get('cursor') or None
+    include_image = request.args.get('include_image') in ('1', 'true')
+
+    try:
+        page = character_page_cache.get_or_load(
+            (tenant, cursor, limit, include_image),
+            lambda: _load_character_page(cursor, limit, include_image, tenant),
+        )
+    except Exception as e:
+        logger.exception("❌ 캐릭터 목록 조회 오류: %s", e)
+        return jsonify({'error': f'캐릭터 목록 조회 중 오류 발생: {str(e)}'}), 500
+
+    if page is None:
+        return jsonify({'error': '잘못된 커서입니다'}), 400
+    return jsonify(page)
+
+@app.route('/characters/<character_id>/select', methods=['POST'])
+def select_character(character_id):
+    """캐릭터 선택 (같은 사용자의 기존 선택 해제 후 하나만 선택)"""
+    character_ref = db.collection('characters').document(character_id)
+    character_doc = character_ref.get(field_paths=[CHARACTER_USER_FIELD])
+    if not character_doc.exists:
+        return jsonify({'error': '캐릭터를 찾을 수 없습니다'}), 404
+    owner = character_doc.to_dict().get(CHARACTER_USER_FIELD)
+
+    query = db.collection('characters').where('is_selected', '==', True)
+    if owner:
+        query = query.where(CHARACTER_USER_FIELD, '==', owner)
+    selected = query.select(['is_selected']).stream()
+
+    batch = db.batch()
+    for doc in selected:
+        if doc.id != character_id:
+            batch.update(doc.reference, {'is_selected': False})
+    batch.update(character_ref, {'is_selected': True})
+    batch.commit()
+
+    character_page_cache.invalidate()
+    # ESP 이미지가 다음 요청에서 바로 바뀌도록 선택 캐시 만료 (소유자 테넌트 + 전체 범위)
+    esp_image_selection_cache.invalidate(tenant_key(None))
+    if owner:
+        esp_image_selection_cache.invalidate(tenant_key(owner))
+
+    logger.info("✅ 캐릭터 선택: %s", character_id)
+    return jsonify({'success': True, 'character_id': character_id})
+
+@app.route('/characters/stats', methods=['GET'])
+def character_page_stats():
+    return jsonify(character_page_cache.stats())
+
+@app.route('/cache/stats', methods=['GET'])
+def shared_cache_stats():
+    """이름별 TTL 캐시 통계 (이 워커 프로세스 기준)"""
+    return jsonify({
+        'backend': cache_backend_name(),
+        'store': get_cache_store().usage(),
+        'caches': {
+            cache.name: cache.stats()
+            for cache in (esp_titles_cache, esp_image_selection_cache, tenant_resolver.cache)
+        },
+    })
+
+# 기존 캐시들의 적중 / 미스 수를 /metrics로 내보냄
+REGISTRY.register_collector(cache_stats_collector({
+    'esp_render': esp_render_cache,
+    'esp_titles': esp_titles_cache,
+    'esp_image_selection': esp_image_selection_cache,
+    'todo_title_index': todo_title_index,
+    'prompt': prompt_cache,
+    'character_pages': character_page_cache,
+}))
+
+# 리스너는 첫 요청(또는 /warmup)에서 백그라운드로 시작 - import만으로는 Firestore에 접속하지 않음
+_listeners_thread = None
+_listeners_lock = threading.Lock()
+
+def _start_listeners():
+    # 리스너 없이도 /esp-titles와 제목 인덱스는 조회 방식으로 동작
+    try:
+        today_titles_view.start()
+    except Exception as e:
+        logger.warning("❌ 오늘 할일 뷰 리스너 시작 실패 (조회 방식으로 대체): %s", e)
+    try:
+        todo_title_index.start()
+    except Exception as e:
+        logger.warning("❌ 할일 제목 인덱스 리스너 시작 실패: %s", e)
+
+def start_background_services():
+    """리스너를 별도 스레드에서 한 번만 시작 → 그 스레드"""
+    global _listeners_thread
+    with _listeners_lock:
+        if _listeners_thread is None:
+            _listeners_thread = threading.Thread(target=_start_listeners, name='start-listeners', daemon=True)
+            _listeners_thread.start()
+        return _listeners_thread
+
+# 상태 확인 / 워밍업 / 메트릭 요청은 초기화를 시작하지 않음
+_COLD_PATHS = {'/healthz', '/warmup', '/metrics'}
+
+@app.before_request
+def _start_on_first_request():
+    if _listeners_thread is None and request.path not in _COLD_PATHS:
+        start_background_services()
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    """프로세스 상태 (Firestore 초기화 전에도 바로 응답)"""
+    return jsonify({
+        'status': 'ok',
+        'firestore': 'ready' if is_initialized(db) else 'pending',
+        'titles_view': today_titles_view.ready,
+    })
+
+WARMUP_TIMEOUT = float(os.environ.get('WARMUP_TIMEOUT', '10'))
+
+def warmup():
+    """Firestore 클라이언트 생성 → 무거운 모듈 로드 → 리스너 시작 → 캐시 채우기
+
+    각 단계는 실패해도 다음 단계를 계속 진행하며, 단계별 소요 시간(ms) 또는 오류를 돌려줍니다.
+    """
+    def load_modules():
+        force(firestore)
+        force(api_exceptions)
+        from PIL import Image  # noqa: F401 - 이미지 처리 첫 요청의 import 비용을 미리 치름
+
+    def start_listeners():
+        start_background_services().join(WARMUP_TIMEOUT)
+        if not today_titles_view.wait_ready(WARMUP_TIMEOUT):
+            raise TimeoutError('오늘 할일 뷰가 준비되지 않았습니다')
+
+    # 선택된 캐릭터 조회가 gRPC 채널을 열고 ESP 이미지 선택 캐시(전체 범위)를 채움
+    steps = [
+        ('firestore', lambda: force(db)),
+        ('modules', load_modules),
+        ('listeners', start_listeners),
+        ('esp_image_selection', _load_selected_esp_image),
+    ]
+
+    result = {}
+    for name, func in steps:
+        start = perf_counter()
+        try:
+            func()
+            result[name] = {'ms': round((perf_counter() - start) * 1000, 1)}
+        except Exception as e:
+            logger.warning("❌ 워밍업 단계 실패 (%s): %s", name, e)
+            result[name] = {'error': str(e)}
+    return result
+
+@app.route('/warmup', methods=['GET', 'POST'])
+def warmup_route():
+    """인스턴스가 트래픽을 받기 전에 호출하면 첫 사용자 요청이 초기화 비용을 치르지 않음"""
+    steps = warmup()
+    ok = all('error' not in step for step in steps.values())
+    return jsonify({
+        'status': 'ok' if ok else 'degraded',
+        'steps': steps,
+        'firestore_init_ms': round((init_seconds(db) or 0) * 1000, 1),
+    }), 200 if ok else 503
+
+# WARMUP_ON_START=1 이면 import 직후 백그라운드에서 워밍업 (요청 처리는 막지 않음)
+if os.environ.get('WARMUP_ON_START') == '1':
+    threading.Thread(target=warmup, name='warmup', daemon=True).start()
@@ -0,0 +1,641 @@
+"""
+asyncio 기반 서버 (ASGI)
+
+ESP 폴링(/esp-titles, /esp-image), 롱폴링/SSE, 캐릭터 생성/목록, 할일 업데이트처럼 Firestore나
+외부 HTTP를 기다리는 경로를 이벤트 루프에서 처리합니다. 대기 중인 요청이 스레드를 점유하지 않으므로
+프로세스 하나로 수천 개의 기기 연결과 오래 걸리는 생성 요청을 함께 유지할 수 있습니다.
+
+- Firestore: google.cloud.firestore.AsyncClient (FIRESTORE_BACKEND=memory이면 인메모리 대역)
+- 이미지 생성 / 다운로드: httpx.AsyncClient (generation_backends의 agenerate)
+- PIL 디코딩 / 리사이즈 / 썸네일: 별도 스레드 풀에서 실행
+
+여기에 없는 경로는 기존 Flask 앱(app.py, 호환 모드)으로 그대로 전달됩니다.
+캐시, 할일 뷰, 블롭 저장소, 생성 백엔드 상태는 Flask 앱과 공유합니다.
+
+실행:
+    uvicorn asgi_app:app --host 0.0.0.0 --port 5050
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.wsgi import WSGIMiddleware
+from starlette.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+
+import app as compat
+from blob_store import LocalBlobStore, is_content_key, store_character_image
+from character_pages import CHARACTER_LIST_FIELDS, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, character_summary
+from esp_variants import ESP_VARIANTS, VARIANT_MIMETYPES
+from generation_backends import GenerationError, close_async_http_client
+from lazy_init import LazyObject, force, lazy_module
+from observability import REGISTRY, REQUEST_LATENCY, timed
+from prompt_cache import prompt_cache_key
+from tenants import CHARACTER_USER_FIELD, TODO_USER_FIELD, TenantError, tenant_key
+from todo_title_index import AmbiguousTodoError
+
+logger = logging.getLogger(__name__)
+
+# 동시에 진행할 생성 수 / 그 이상 기다릴 수 있는 요청 수 (넘으면 429)
+ASYNC_GENERATION_LIMIT = int(os.environ.get('ASYNC_GENERATION_LIMIT', '16'))
+ASYNC_GENERATION_QUEUE = int(os.environ.get('GENERATION_QUEUE_SIZE', '16'))
+
+# PIL 작업용 스레드 풀 (이벤트 루프를 막지 않도록)
+image_executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 2, thread_name_prefix='image-worker')
+
+
+def _create_async_db():
+    """app.py와 같은 프로젝트 / 자격 증명으로 비동기 Firestore 클라이언트 생성"""
+    if os.environ.get('FIRESTORE_BACKEND') == 'memory':
+        from memory_firestore import AsyncMemoryFirestore
+        return AsyncMemoryFirestore(force(compat.db))
+
+    import firebase_admin
+    from google.cloud.firestore import AsyncClient
+
+    force(compat.db)  # Firebase 앱 초기화가 먼저 필요
+    firebase_app = firebase_admin.get_app()
+    return AsyncClient(project=firebase_app.project_id, credentials=firebase_app.credential.get_credential())
+
+
+# 첫 Firestore 요청에서 생성 (콜드 스타트 단축)
+adb = LazyObject(_create_async_db, 'firestore_async')
+api_exceptions = lazy_module('google.api_core.exceptions')
+
+
+async def in_image_executor(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(image_executor, func, *args)
+
+
+def _query_number(request, name, default, cast=float):
+    try:
+        return cast(request.query_params[name])
+    except (KeyError, ValueError):
+        return default
+
+
+def _etag_matches(request, etag):
+    """If-None-Match 헤더에 etag가 있는지 확인"""
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    for candidate in header.split(','):
+        candidate = candidate.strip()
+        if candidate == '*' or candidate.removeprefix('W/').strip('"') == etag:
+            return True
+    return False
+
+
+def _error(message, status_code, **extra):
+    return JSONResponse({'error': message, **extra}, status_code=status_code)
+
+
+async def _request_tenant(request):
+    """app._request_tenant()의 비동기 버전"""
+    return await compat.tenant_resolver.aresolve(
+        adb,
+        request.query_params.get('user_id') or request.headers.get('x-user-id'),
+        request.query_params.get('device') or request.headers.get('x-device-id'),
+    )
+
+
+async def tenant_error(request, error):
+    return _error(str(error), error.status)
+
+
+async def _request_json(request):
+    try:
+        return await request.json()
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+class TitlesNotifier:
+    """TodayTitlesView 변경(리스너 스레드)을 이벤트 루프의 대기 요청에 전달"""
+
+    def __init__(self):
+        self._loop = None
+        self._event = None
+
+    def attach(self, view):
+        self._loop = asyncio.get_running_loop()
+        self._event = asyncio.Event()
+        view.add_listener(self._on_change)
+
+    def detach(self, view):
+        view.remove_listener(self._on_change)
+
+    def _on_change(self, version):
+        self._loop.call_soon_threadsafe(self._notify)
+
+    def _notify(self):
+        # 기다리는 요청을 모두 깨우고 다음 변경용 이벤트로 교체
+        self._event.set()
+        self._event = asyncio.Event()
+
+    async def wait_for_change(self, view, version, timeout, user_id=None):
+        """뷰(의 user_id 사용자) 버전이 version과 달라질 때까지 대기 → (버전, 제목 목록), 시간 초과 시 None"""
+        deadline = time.monotonic() + timeout
+        while True:
+            current = view.snapshot(user_id)
+            if current[0] != version:
+                return current
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            try:
+                await asyncio.wait_for(self._event.wait(), remaining)
+            except asyncio.TimeoutError:
+                return None
+
+
+titles_notifier = TitlesNotifier()
+
+
+def _titles_view():
+    view = compat.today_titles_view
+    if view is None or not view.ready:
+        return None
+    return view
+
+
+async def esp_titles(request):
+    tenant = await _request_tenant(request)
+    try:
+        if 'wait' in request.query_params:
+            return await _wait_for_titles(request, tenant)
+
+        view = _titles_view()
+        if view is not None:
+            version, titles = view.snapshot(tenant)
+            return JSONResponse(titles, headers={'X-Titles-Version': str(version)})
+
+        # 리스너를 쓸 수 없으면 Flask 앱과 같은 TTL 캐시를 거쳐 조회
+        today_str = datetime.now().strftime("%Y-%m-%d")
+        titles = await compat.esp_titles_cache.aget_or_load(
+            f"{tenant_key(tenant)}:{today_str}", lambda: _query_today_titles(today_str, tenant)
+        )
+        return JSONResponse(titles)
+
+    except Exception as e:
+        logger.exception("❌ esp-titles 오류: %s", e)
+        return _error(str(e), 500)
+
+
+async def _query_today_titles(today_str, tenant=None):
+    query = adb.collection("todos") \
+        .where("due_date_string", "==", today_str) \
+        .where("is_completed", "==", False)
+    if tenant is not None:
+        query = query.where(TODO_USER_FIELD, "==", tenant)
+
+    with timed('firestore_query'):
+        query = query.select(["title"])
+        return [doc.to_dict()["title"] async for doc in query.stream() if "title" in doc.to_dict()]
+
+
+async def _wait_for_titles(request, tenant=None):
+    """/esp-titles?wait=<버전> 롱폴링 (대기 중에는 스레드를 점유하지 않음)"""
+    view = _titles_view()
+    if view is None:
+        return _error('실시간 할일 뷰를 사용할 수 없습니다', 503)
+
+    version = request.query_params.get('wait') or None
+    timeout = min(_query_number(request, 'timeout', compat.TITLES_WAIT_TIMEOUT), compat.TITLES_WAIT_TIMEOUT)
+
+    current = view.snapshot(tenant)
+    if version is None or current[0] != version:
+        result = current
+    else:
+        result = await titles_notifier.wait_for_change(view, version, timeout, tenant)
+
+    if result is None:
+        return Response(status_code=304, headers={'X-Titles-Version': str(version)})
+
+    version, titles = result
+    return JSONResponse({'version': version, 'titles': titles}, headers={'X-Titles-Version': str(version)})
+
+
+async def esp_titles_stream(request):
+    """할일 목록 변경을 Server-Sent Events로 전달 (Last-Event-ID / ?since=로 이어받기)"""
+    tenant = await _request_tenant(request)
+    view = _titles_view()
+    if view is None:
+        return _error('실시간 할일 뷰를 사용할 수 없습니다', 503)
+
+    since = request.headers.get('last-event-id', request.query_params.get('since')) or None
+
+    async def events():
+        version = since
+        current = view.snapshot(tenant)
+        while True:
+            if current is None:
+                yield ": keepalive\n\n"
+            elif current[0] != version:
+                version, titles = current
+                data = json.dumps(titles, ensure_ascii=False)
+                yield f"id: {version}\nevent: titles\ndata: {data}\n\n"
+            current = await titles_notifier.wait_for_change(view, version, compat.SSE_KEEPALIVE_INTERVAL, tenant)
+
+    return StreamingResponse(events(), media_type='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+
+async def _load_selected_esp_image(tenant=None):
+    """선택된 캐릭터 이미지 조회 (TTL 캐시, 테넌트별) → (result, etag, load_source) 또는 None"""
+    selected = await compat.esp_image_selection_cache.aget_or_load(
+        tenant_key(tenant), lambda: _query_selected_esp_image(tenant)
+    )
+    return compat._with_source_loader(selected)
+
+
+async def _query_selected_esp_image(tenant=None):
+    query = adb.collection('characters').where('is_selected', '==', True)
+    if tenant is not None:
+        query = query.where(CHARACTER_USER_FIELD, '==', tenant)
+
+    with timed('firestore_query'):
+        docs = await query.select(['image_url', 'image_ref']).limit(1).get()
+
+    return compat._esp_image_source(docs[0] if docs else None, tenant)
+
+
+async def esp_image(request):
+    tenant = await _request_tenant(request)
+    try:
+        variant = request.query_params.get('variant')
+        if variant is not None and variant not in ESP_VARIANTS:
+            return _error(f"Unknown variant: {variant}", 400, variants=sorted(ESP_VARIANTS))
+
+        selected = await _load_selected_esp_image(tenant)
+        if selected is None:
+            return _error("No selected character found", 404)
+
+        result, etag, load_source = selected
+        headers = {'ETag': f'"{etag}"', 'Cache-Control': 'no-cache'}
+
+        if variant is not None:
+            return await _esp_variant_response(request, variant, etag, load_source)
+
+        if _etag_matches(request, etag):
+            return Response(status_code=304, headers=headers)
+
+        if load_source is not None:
+            await in_image_executor(compat._materialize_esp_image, etag, load_source, result['image_url'])
+        return JSONResponse(result, headers=headers)
+
+    except Exception as e:
+        logger.exception("❌ ESP 이미지 오류: %s", e)
+        return _error(str(e), 500)
+
+
+async def _esp_variant_response(request, variant, etag, load_source):
+    if load_source is None:
+        return _error("Variants are only available for uploaded images", 404)
+
+    variant_etag = f"{etag}-{variant}"
+    fmt, (width, height) = ESP_VARIANTS[variant]
+    headers = {
+        'ETag': f'"{variant_etag}"',
+        'Cache-Control': 'no-cache',
+        'X-Image-Format': fmt,
+        'X-Image-Width': str(width),
+        'X-Image-Height': str(height),
+    }
+
+    if _etag_matches(request, variant_etag):
+        return Response(status_code=304, headers=headers)
+
+    await in_image_executor(compat.esp_variant_store.ensure, etag, load_source)
+    return FileResponse(
+        compat.esp_variant_store.variant_path(etag, variant),
+        media_type=VARIANT_MIMETYPES[fmt],
+        headers=headers,
+    )
+
+
+async def get_blob(request):
+    key = request.path_params['key']
+    store = compat.blob_store
+    if not isinstance(store, LocalBlobStore) or not is_content_key(key) or not store.exists(key):
+        return _error('Not found', 404)
+    return FileResponse(store.path_for(key), headers={'Cache-Control': 'public, max-age=31536000, immutable'})
+
+
+def _ambiguous_todo_error(error):
+    return _error(str(error), 409, candidates=error.candidates,
+                  hint='요청에 id를 함께 보내면 해당 할일만 업데이트합니다')
+
+
+async def update_todo(request):
+    tenant = await _request_tenant(request)
+    try:
+        data = await _request_json(request) or {}
+        title = data.get('title')
+        logger.debug("📥 /update-todo 받은 데이터: %s", data)
+
+        if not title:
+            return _error('할일 제목(title)이 필요합니다', 400)
+
+        index = compat.todo_title_index
+        try:
+            # 인덱스 적중이면 바로 반환되고, 미스일 때만 스레드 풀에서 Firestore 조회
+            doc_id = data.get('id') or await run_in_threadpool(index.resolve, title, tenant)
+        except AmbiguousTodoError as e:
+            return _ambiguous_todo_error(e)
+
+        if not doc_id:
+            return _error(f'"{title}"에 해당하는 할일이 없습니다', 404)
+
+        update_data = compat._build_todo_update(data)
+
+        if compat.todo_write_coalescer is not None:
+            compat.todo_write_coalescer.submit(compat.db.collection('todos').document(doc_id), update_data)
+            return JSONResponse({'success': True, 'id': doc_id, 'updated': update_data, 'coalesced': True},
+                                status_code=202)
+
+        try:
+            await adb.collection('todos').document(doc_id).update(update_data)
+        except api_exceptions.NotFound:
+            # 인덱스가 가리키던 문서가 삭제됨 → 정리 후 제목으로 한 번 더 찾기 (ID를 명시한 요청은 404)
+            index.invalidate_doc(doc_id)
+            try:
+                doc_id = None if data.get('id') else await run_in_threadpool(index.resolve, title, tenant)
+            except AmbiguousTodoError as e:
+                return _ambiguous_todo_error(e)
+            if not doc_id:
+                return _error(f'"{title}"에 해당하는 할일이 없습니다', 404)
+            await adb.collection('todos').document(doc_id).update(update_data)
+
+        compat.todo_write_stats['direct'].record(updates=1, writes=1, commits=1)
+        logger.info("✅ '%s' 문서(%s) 업데이트 완료 - is_completed: %s", title, doc_id, update_data['is_completed'])
+        return JSONResponse({'success': True, 'id': doc_id, 'updated': update_data})
+
+    except Exception as e:
+        logger.exception("❌ 할일 업데이트 오류: %s", e)
+        return _error(str(e), 500)
+
+
+class _GenerationSlots:
+    """동시 생성 수 제한 (대기 요청이 너무 많으면 바로 거절)"""
+
+    def __init__(self, limit, max_waiting):
+        self._semaphore = asyncio.Semaphore(limit)
+        self._limit = limit
+        self._max_waiting = max_waiting
+        self.active = 0
+
+    def full(self):
+        return self.active >= self._limit + self._max_waiting
+
+    @asynccontextmanager
+    async def slot(self):
+        self.active += 1
+        try:
+            async with self._semaphore:
+                yield
+        finally:
+            self.active -= 1
+
+
+generation_slots = _GenerationSlots(ASYNC_GENERATION_LIMIT, ASYNC_GENERATION_QUEUE)
+
+
+async def _generate_image(prompt, style, size):
+    with timed('generation'):
+        return await compat.image_generator.agenerate(prompt, style, size, timeout=compat.GENERATION_SYNC_TIMEOUT)
+
+
+async def _generate_character(params):
+    """app._generate_character의 비동기 버전"""
+    prompt, style = params['prompt'], params['style']
+    size = (params['size'],) * 2
+    logger.info("🎨 캐릭터 생성 시작 - 프롬프트: %s", prompt)
+
+    cache_key = prompt_cache_key(prompt, style, size)
+    if params['new_variation']:
+        image_bytes, content_type = await _generate_image(prompt, style, size)
+        compat.prompt_cache.put(cache_key, image_bytes, content_type)
+    else:
+        image_bytes, content_type = await compat.prompt_cache.aget_or_generate(
+            cache_key, lambda: _generate_image(prompt, style, size)
+        )
+
+    # 썸네일 생성(PIL)과 블롭 저장은 스레드 풀에서
+    image_fields = await in_image_executor(
+        store_character_image, compat.blob_store, image_bytes, content_type, params.get('base_url')
+    )
+
+    character_ref = adb.collection('characters').document()
+    await character_ref.set(compat._character_document(character_ref.id, params, image_fields))
+    compat.character_page_cache.invalidate()
+    logger.info("✅ 캐릭터 저장 완료 - ID: %s", character_ref.id)
+
+    return {
+        'character_id': character_ref.id,
+        'image_url': image_fields['image_url'],
+        'thumbnail_urls': image_fields['thumbnail_urls'],
+    }
+
+
+async def generate_from_prompt(request):
+    params, error = compat._parse_generation_request(
+        await _request_json(request), request.headers.get('x-user-id'), str(request.base_url)
+    )
+    if error:
+        return _error(error, 400)
+
+    if generation_slots.full():
+        return JSONResponse({'error': '생성 대기열이 가득 찼습니다'}, status_code=429, headers={'Retry-After': '10'})
+
+    try:
+        async with generation_slots.slot():
+            result = await _generate_character(params)
+    except GenerationError as e:
+        logger.error("❌ 캐릭터 생성 오류: %s", e)
+        return _error(str(e), 500)
+    except Exception as e:
+        logger.exception("❌ 캐릭터 생성 오류: %s", e)
+        return _error(f'캐릭터 생성 중 오류 발생: {str(e)}', 500)
+
+    return JSONResponse({
+        'success': True,
+        **result,
+        'message': '캐릭터가 성공적으로 생성되고 저장되었습니다!'
+    })
+
+
+async def _load_character_page(cursor, limit, include_image, tenant=None):
+    fields = CHARACTER_LIST_FIELDS + (['image_url'] if include_image else [])
+    query = adb.collection('characters')
+    if tenant is not None:
+        query = query.where(CHARACTER_USER_FIELD, '==', tenant)
+    query = query \
+        .order_by('created_at', direction='DESCENDING') \
+        .select(fields)
+
+    if cursor:
+        cursor_doc = await adb.collection('characters').document(cursor).get(field_paths=['created_at'])
+        if not cursor_doc.exists:
+            return None
+        query = query.start_after(cursor_doc)
+
+    with timed('firestore_query'):
+        docs = await query.limit(limit + 1).get()
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+
+    return {
+        'characters': [character_summary(doc, include_image) for doc in docs],
+        'next_cursor': docs[-1].id if has_more else None,
+    }
+
+
+async def list_characters(request):
+    tenant = await _request_tenant(request)
+    limit = max(1, min(_query_number(request, 'limit', DEFAULT_PAGE_SIZE, int), MAX_PAGE_SIZE))
+    cursor = request.query_params.get('cursor') or None
+    include_image = request.query_params.get('include_image') in ('1', 'true')
+
+    cache = compat.character_page_cache
+    key = (tenant, cursor, limit, include_image)
+    try:
+        page, generation = cache.lookup(key)
+        if page is None:
+            page = await _load_character_page(cursor, limit, include_image, tenant)
+            cache.store(key, page, generation)
+    except Exception as e:
+        logger.exception("❌ 캐릭터 목록 조회 오류: %s", e)
+        return _error(f'캐릭터 목록 조회 중 오류 발생: {str(e)}', 500)
+
+    if page is None:
+        return _error('잘못된 커서입니다', 400)
+    return JSONResponse(page)
+
+
+async def select_character(request):
+    character_id = request.path_params['character_id']
+    characters = adb.collection('characters')
+    character_ref = characters.document(character_id)
+    character_doc = await character_ref.get(field_paths=[CHARACTER_USER_FIELD])
+    if not character_doc.exists:
+        return _error('캐릭터를 찾을 수 없습니다', 404)
+    owner = character_doc.to_dict().get(CHARACTER_USER_FIELD)
+
+    # 같은 사용자의 기존 선택만 해제
+    query = characters.where('is_selected', '==', True)
+    if owner:
+        query = query.where(CHARACTER_USER_FIELD, '==', owner)
+    selected = await query.select(['is_selected']).get()
+
+    batch = adb.batch()
+    for doc in selected:
+        if doc.id != character_id:
+            batch.update(doc.reference, {'is_selected': False})
+    batch.update(character_ref, {'is_selected': True})
+    await batch.commit()
+
+    compat.character_page_cache.invalidate()
+    # ESP 이미지가 다음 요청에서 바로 바뀌도록 선택 캐시 만료 (소유자 테넌트 + 전체 범위)
+    compat.esp_image_selection_cache.invalidate(tenant_key(None))
+    if owner:
+        compat.esp_image_selection_cache.invalidate(tenant_key(owner))
+
+    logger.info("✅ 캐릭터 선택: %s", character_id)
+    return JSONResponse({'success': True, 'character_id': character_id})
+
+
+async def metrics(request):
+    return Response(REGISTRY.render(), media_type='text/plain; version=0.0.4')
+
+
+routes = [
+    Route('/esp-titles', esp_titles, methods=['GET']),
+    Route('/esp-titles/stream', esp_titles_stream, methods=['GET']),
+    Route('/esp-image', esp_image, methods=['GET']),
+    Route('/blobs/{key}', get_blob, methods=['GET']),
+    Route('/update-todo', update_todo, methods=['POST']),
+    Route('/generate/prompt', generate_from_prompt, methods=['POST']),
+    Route('/characters', list_characters, methods=['GET']),
+    Route('/characters/{character_id}/select', select_character, methods=['POST']),
+    Route('/metrics', metrics, methods=['GET']),
+    # 나머지 경로는 Flask 앱이 스레드 풀에서 처리
+    Mount('/', app=WSGIMiddleware(compat.app)),
+]
+
+# 히스토그램 라벨을 Flask와 같은 경로 형식(<이름>)으로 맞춤
+_ROUTE_LABELS = {
+    route.endpoint: route.path.replace('{', '<').replace('}', '>')
+    for route in routes if isinstance(route, Route)
+}
+
+
+class RequestMetricsMiddleware:
+    """비동기 경로의 요청 처리 시간 기록 (Flask로 전달된 요청은 Flask 쪽에서 기록)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = {'code': 500}
+
+        async def send_with_status(message):
+            if message['type'] == 'http.response.start':
+                status['code'] = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            endpoint = _ROUTE_LABELS.get(scope.get('endpoint'))
+            if endpoint is not None:
+                REQUEST_LATENCY.observe(
+                    time.perf_counter() - start,
+                    endpoint=endpoint, method=scope['method'], status=str(status['code']),
+                )
+
+
+@asynccontextmanager
+async def lifespan(app):
+    view = compat.today_titles_view
+    if view is not None:
+        titles_notifier.attach(view)
+    # 리스너는 백그라운드에서 연결 (Firebase 초기화를 기다리지 않고 바로 요청을 받음)
+    compat.start_background_services()
+    logger.info("🚀 비동기 서버 시작")
+    try:
+        yield
+    finally:
+        if view is not None:
+            titles_notifier.detach(view)
+        await close_async_http_client()
+        image_executor.shutdown(wait=False)
+
+
+app = Starlette(
+    routes=routes,
+    middleware=[
+        Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*']),
+        Middleware(RequestMetricsMiddleware),
+    ],
+    exception_handlers={TenantError: tenant_error},
+    lifespan=lifespan,
+)
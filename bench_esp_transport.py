@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+ESP32 전송 방식별 처리량 / 지연 비교 (HTTP POST vs 상시 연결 브로커)
+
+가상 기기(esp_device_sim.py) devices대를 띄우고, 기기마다 변경 하나짜리 메시지 messages개를
+리스너와 같은 방식(기기별 동시 요청 1개, 기기끼리는 병렬)으로 보낸 뒤 전송 방식별로 기록합니다.
+- http          : requests.Session으로 POST, 기기가 응답마다 연결을 닫음 (ESP32 WebServer 기본 동작)
+- http-keepalive: 같은 POST, 기기가 연결을 유지 (HTTP의 최선)
+- broker        : esp_broker.EspBroker의 device/<기기 ID> 토픽으로 발행, 기기 ACK까지
+
+msgs_per_sec은 전체 처리량, latency는 메시지 하나를 보내고 확인을 받기까지의 시간입니다.
+루프백에서 재므로 실제 Wi-Fi보다 연결 설정 비용이 작게 나옵니다 (상대 비교용).
+
+사용법:
+    python bench_esp_transport.py
+    python bench_esp_transport.py --devices 16 --messages 500 --format msgpack --json
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from bench_esp_wire import make_todo
+from esp_broker import EspBroker
+from esp_device_sim import SimulatedDevice, SimulatedHttpDevice
+from esp_wire import WIRE_FORMATS, encode
+
+TRANSPORTS = ('http', 'http-keepalive', 'broker')
+
+
+def make_messages(count, wire_format, seed):
+    """기기 하나에 보낼 (본문, Content-Type) 목록 - 할일 하나의 수정이 이어지는 흐름"""
+    rng = random.Random(seed)
+    todo = make_todo(0, rng)
+    messages = []
+    for seq in range(1, count + 1):
+        todo['title'] = f"할일 {seq}"
+        if wire_format == 'json':
+            change = {'action': 'update', 'id': 'todo0', 'data': dict(todo), 'seq': seq}
+        else:
+            change = {'action': 'patch', 'id': 'todo0', 'seq': seq, 'set': {'title': todo['title']}}
+        messages.append(encode([change], wire_format))
+    return messages
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run_devices(senders, messages):
+    """기기별 send 함수를 병렬로 실행 → (걸린 시간, 메시지별 지연 목록)"""
+    latencies = []
+    lock = threading.Lock()
+
+    def stream(send):
+        local = []
+        for body, content_type in messages:
+            start = time.perf_counter()
+            send(body, content_type)
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(senders)) as pool:
+        for future in [pool.submit(stream, send) for send in senders]:
+            future.result()
+    return time.perf_counter() - start, latencies
+
+
+def bench_http(devices, messages, keep_alive):
+    sims = [SimulatedHttpDevice(keep_alive=keep_alive) for _ in range(devices)]
+    session = requests.Session()
+    session.mount('http://', requests.adapters.HTTPAdapter(pool_connections=devices, pool_maxsize=devices))
+
+    def sender(sim):
+        def send(body, content_type):
+            response = session.post(sim.endpoint, data=body, headers={'Content-Type': content_type}, timeout=5)
+            response.raise_for_status()
+        return send
+
+    try:
+        elapsed, latencies = run_devices([sender(sim) for sim in sims], messages)
+        received = sum(sim.received for sim in sims)
+    finally:
+        session.close()
+        for sim in sims:
+            sim.close()
+    return elapsed, latencies, received
+
+
+def bench_broker(devices, messages):
+    tokens = {f"bench-{i}": f"token-{i}" for i in range(devices)}
+    broker = EspBroker(host='127.0.0.1', port=0, authenticate=lambda device_id, token: tokens.get(device_id) == token)
+    port = broker.start()
+
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name='bench-devices', daemon=True).start()
+    sims = [SimulatedDevice(device_id, '127.0.0.1', port, token=token) for device_id, token in tokens.items()]
+    for sim in sims:
+        connected = threading.Event()
+        asyncio.run_coroutine_threadsafe(sim.run(connected), loop)
+        connected.wait(5)
+
+    def sender(sim):
+        topic = f"device/{sim.device_id}"
+
+        def send(body, content_type):
+            broker.publish(topic, body, content_type)
+        return send
+
+    try:
+        elapsed, latencies = run_devices([sender(sim) for sim in sims], messages)
+        received = sum(sim.received for sim in sims)
+    finally:
+        broker.stop()
+        loop.call_soon_threadsafe(loop.stop)
+    return elapsed, latencies, received
+
+
+def run(transport, devices, messages):
+    if transport == 'broker':
+        elapsed, latencies, received = bench_broker(devices, messages)
+    else:
+        elapsed, latencies, received = bench_http(devices, messages, keep_alive=transport == 'http-keepalive')
+    sent = len(latencies)
+    return {
+        'transport': transport,
+        'messages': sent,
+        'received': received,
+        'seconds': round(elapsed, 3),
+        'msgs_per_sec': round(sent / elapsed, 1),
+        'latency_ms_p50': round(percentile(latencies, 0.5) * 1000, 3),
+        'latency_ms_p99': round(percentile(latencies, 0.99) * 1000, 3),
+        'bytes_per_message': round(sum(len(body) for body, _ in messages) / len(messages), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ESP32 전송 방식 벤치마크 (HTTP POST vs 브로커)')
+    parser.add_argument('--devices', type=int, default=8, help='가상 기기 수')
+    parser.add_argument('--messages', type=int, default=200, help='기기별 메시지 수')
+    parser.add_argument('--format', default='json', choices=WIRE_FORMATS, help='메시지 형식')
+    parser.add_argument('--transport', action='append', choices=TRANSPORTS, help='비교할 전송 방식 (기본: 전부)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', action='store_true', help='결과를 JSON으로 출력')
+    args = parser.parse_args()
+
+    messages = make_messages(args.messages, args.format, args.seed)
+    results = [run(transport, args.devices, messages) for transport in args.transport or TRANSPORTS]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'transport':<15} {'msgs':>6} {'recv':>6} {'msgs/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'B/msg':>7}")
+    print("-" * 64)
+    for row in results:
+        print(f"{row['transport']:<15} {row['messages']:>6} {row['received']:>6} {row['msgs_per_sec']:>9.1f} "
+              f"{row['latency_ms_p50']:>8.3f} {row['latency_ms_p99']:>8.3f} {row['bytes_per_message']:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
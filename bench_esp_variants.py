@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+ESP variant 포맷별 서버 렌더링 시간과 전송 크기를 비교하는 벤치마크
+
+사용법:
+    python bench_esp_variants.py                 # 합성 테스트 이미지 사용
+    python bench_esp_variants.py image.png -n 20 # 실제 캐릭터 이미지 사용
+"""
+
+import argparse
+import json
+import time
+from io import BytesIO
+
+from PIL import Image, ImageDraw
+
+from esp_variants import ESP_VARIANTS, decode_source, render_variant
+
+
+def make_test_image(size=512):
+    """캐릭터 이미지와 비슷한 그라데이션 + 도형 이미지 생성"""
+    image = Image.new('RGB', (size, size))
+    pixels = image.load()
+    for y in range(size):
+        for x in range(size):
+            pixels[x, y] = (x * 255 // size, y * 255 // size, 160)
+
+    draw = ImageDraw.Draw(image)
+    draw.ellipse((size // 4, size // 4, size * 3 // 4, size * 3 // 4), fill=(250, 220, 200))
+    draw.ellipse((size * 3 // 8, size * 3 // 8, size * 7 // 16, size * 7 // 16), fill=(20, 20, 20))
+    draw.ellipse((size * 9 // 16, size * 3 // 8, size * 5 // 8, size * 7 // 16), fill=(20, 20, 20))
+
+    buffer = BytesIO()
+    image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def run(source_bytes, repeat):
+    image = decode_source(source_bytes)
+
+    results = []
+    for variant in sorted(ESP_VARIANTS):
+        timings = []
+        payload = b''
+        for _ in range(repeat):
+            start = time.perf_counter()
+            payload = render_variant(image, variant)
+            timings.append(time.perf_counter() - start)
+
+        timings.sort()
+        fmt, (width, height) = ESP_VARIANTS[variant]
+        results.append({
+            'variant': variant,
+            'format': fmt,
+            'width': width,
+            'height': height,
+            'bytes': len(payload),
+            'render_ms_median': round(timings[len(timings) // 2] * 1000, 3),
+            'render_ms_max': round(timings[-1] * 1000, 3),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ESP variant 렌더링 벤치마크')
+    parser.add_argument('image', nargs='?', help='원본 이미지 경로 (없으면 합성 이미지 사용)')
+    parser.add_argument('-n', '--repeat', type=int, default=10, help='variant별 반복 횟수')
+    parser.add_argument('--json', action='store_true', help='결과를 JSON으로 출력')
+    args = parser.parse_args()
+
+    if args.image:
+        with open(args.image, 'rb') as f:
+            source_bytes = f.read()
+    else:
+        source_bytes = make_test_image()
+
+    results = run(source_bytes, args.repeat)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'variant':<12} {'size':>9} {'bytes':>9} {'median ms':>10} {'max ms':>8}")
+    print("-" * 52)
+    for row in results:
+        size = f"{row['width']}x{row['height']}"
+        print(f"{row['variant']:<12} {size:>9} {row['bytes']:>9} "
+              f"{row['render_ms_median']:>10.2f} {row['render_ms_max']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
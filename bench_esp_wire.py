@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+ESP32 푸시 메시지 형식(json / json-delta / msgpack)별 전송 크기와 기기 쪽 파싱 비용 비교
+
+전형적인 편집 흐름을 DeviceOutbox(인메모리 SQLite)에 넣고 변경마다 한 번씩 전송한다고 보고,
+형식별로 다음을 기록합니다.
+- bytes: 전송한 본문 바이트 합계 / 메시지당 평균
+- parse_us: 본문 디코딩 시간 중앙값 (이 머신의 Python 기준, 형식 간 상대 비교용)
+- arduinojson_bytes: ArduinoJson 6(32비트 MCU)에서 메시지 하나를 담는 데 필요한 JsonDocument 크기 추정
+  (값 / 멤버마다 16바이트 + 복사되는 문자열, 최댓값)
+
+사용법:
+    python bench_esp_wire.py
+    python bench_esp_wire.py --ticks 200 --json
+"""
+
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+import msgpack
+
+from esp_delivery import DeviceOutbox
+from esp_wire import WIRE_FORMATS, encode
+
+# ArduinoJson 6, 32비트: VariantSlot 하나가 16바이트
+ARDUINOJSON_SLOT_BYTES = 16
+
+
+def make_todo(i, rng):
+    return {
+        'title': f"할일 {i} - {rng.choice(['보고서 작성', '운동', '장보기', '코드 리뷰'])}",
+        'is_completed': False,
+        'due_date_string': '2024-06-01',
+        'userId': 'user_1234567890',
+        'priority': rng.choice(['high', 'medium', 'low']),
+        'category': rng.choice(['업무', '개인', '공부']),
+        'order': i,
+        'start_time': None,
+        'stop_time': None,
+        'pause_times': [],
+        'resume_times': [],
+        'createdAt': '2024-05-30T09:00:00',
+        'updatedAt': '2024-05-30T09:00:00',
+    }
+
+
+def edit_streams(ticks, seed):
+    """흐름 이름 → [(action, todo_id, data)]"""
+    rng = random.Random(seed)
+    clock = datetime(2024, 6, 1, 9, 0, 0)
+
+    def stamp():
+        nonlocal clock
+        clock += timedelta(seconds=rng.randint(5, 300))
+        return clock.isoformat()
+
+    streams = {}
+
+    # 타이머: 일시정지 / 재개가 배열 뒤에 계속 추가됨
+    todo = make_todo(0, rng)
+    todo['start_time'] = stamp()
+    events = [('create', 'timer', dict(todo))]
+    for tick in range(ticks):
+        field = 'pause_times' if tick % 2 == 0 else 'resume_times'
+        todo[field] = todo[field] + [stamp()]
+        todo['updatedAt'] = clock.isoformat()
+        events.append(('update', 'timer', dict(todo)))
+    streams['timer'] = events
+
+    # 완료 토글
+    todo = make_todo(1, rng)
+    events = [('create', 'toggle', dict(todo))]
+    for _ in range(ticks):
+        todo['is_completed'] = not todo['is_completed']
+        todo['updatedAt'] = stamp()
+        events.append(('update', 'toggle', dict(todo)))
+    streams['toggle'] = events
+
+    # 여러 할일의 생성 / 수정 / 삭제가 섞인 흐름
+    todos, events = {}, []
+    for step in range(ticks):
+        roll = rng.random()
+        if not todos or roll < 0.2:
+            todo_id = f"todo{step}"
+            todos[todo_id] = make_todo(step, rng)
+            events.append(('create', todo_id, dict(todos[todo_id])))
+        elif roll < 0.9:
+            todo_id = rng.choice(sorted(todos))
+            todo = todos[todo_id]
+            field = rng.choice(['title', 'priority', 'is_completed', 'pause_times', 'category'])
+            if field == 'title':
+                todo['title'] = todo['title'] + ' (수정)'
+            elif field == 'priority':
+                todo['priority'] = rng.choice(['high', 'medium', 'low'])
+            elif field == 'is_completed':
+                todo['is_completed'] = not todo['is_completed']
+            elif field == 'pause_times':
+                todo['pause_times'] = todo['pause_times'] + [stamp()]
+            else:
+                todo['category'] = rng.choice(['업무', '개인', '공부'])
+            todo['updatedAt'] = stamp()
+            events.append(('update', todo_id, dict(todo)))
+        else:
+            todo_id = rng.choice(sorted(todos))
+            del todos[todo_id]
+            events.append(('delete', todo_id, {}))
+    streams['mixed'] = events
+    return streams
+
+
+def arduinojson_bytes(value, keys_are_strings):
+    """ArduinoJson 6 JsonDocument 크기 추정 (값 / 멤버 슬롯 + 복사되는 문자열)"""
+    if isinstance(value, dict):
+        size = 0
+        for key, item in value.items():
+            size += ARDUINOJSON_SLOT_BYTES + arduinojson_bytes(item, keys_are_strings)
+            if keys_are_strings or isinstance(key, str):
+                size += len(str(key).encode('utf-8')) + 1
+        return size
+    if isinstance(value, list):
+        return sum(ARDUINOJSON_SLOT_BYTES + arduinojson_bytes(item, keys_are_strings) for item in value)
+    if isinstance(value, str):
+        return len(value.encode('utf-8')) + 1
+    return 0
+
+
+def run(events, wire_format, repeat):
+    """흐름 하나를 한 형식으로 전송 → 결과"""
+    outbox = DeviceOutbox()
+    outbox.register_device('bench', 'http://bench', wire_format=wire_format)
+
+    payloads = []
+    for action, todo_id, data in events:
+        outbox.enqueue([(action, todo_id, data, None)])
+        batch = outbox.next_batch('bench', 1)
+        if not batch:
+            continue
+        payloads.append(encode(batch, wire_format)[0])
+        outbox.ack('bench', [change['seq'] for change in batch])
+    outbox.close()
+
+    if wire_format == 'msgpack':
+        def decode(body):
+            return msgpack.unpackb(body, strict_map_key=False)
+    else:
+        decode = json.loads
+
+    timings, memory = [], []
+    for body in payloads:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            decoded = decode(body)
+        timings.append((time.perf_counter() - start) / repeat)
+        memory.append(arduinojson_bytes(decoded, wire_format != 'msgpack'))
+
+    timings.sort()
+    total = sum(len(body) for body in payloads)
+    return {
+        'format': wire_format,
+        'messages': len(payloads),
+        'bytes_total': total,
+        'bytes_per_message': round(total / max(1, len(payloads)), 1),
+        'parse_us_median': round(timings[len(timings) // 2] * 1e6, 2) if timings else 0.0,
+        'arduinojson_bytes_max': max(memory, default=0),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ESP32 푸시 메시지 형식 벤치마크')
+    parser.add_argument('--ticks', type=int, default=100, help='흐름별 변경 수')
+    parser.add_argument('--repeat', type=int, default=200, help='메시지별 디코딩 반복 횟수')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', action='store_true', help='결과를 JSON으로 출력')
+    args = parser.parse_args()
+
+    results = []
+    for name, events in edit_streams(args.ticks, args.seed).items():
+        for wire_format in WIRE_FORMATS:
+            results.append({'stream': name, **run(events, wire_format, args.repeat)})
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'stream':<8} {'format':<11} {'msgs':>5} {'bytes':>8} {'B/msg':>7} {'parse us':>9} {'AJ bytes':>9}")
+    print("-" * 62)
+    for row in results:
+        print(f"{row['stream']:<8} {row['format']:<11} {row['messages']:>5} {row['bytes_total']:>8} "
+              f"{row['bytes_per_message']:>7.1f} {row['parse_us_median']:>9.2f} {row['arduinojson_bytes_max']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+FreeAnimeGenerator 다운로드 경로 마이크로 벤치마크
+
+로컬 HTTP 서버가 Pollinations 역할을 하며, HEAD/GET 요청마다 이미지를 "렌더링"하는
+지연(--render-ms)을 둡니다. 기존 방식(HEAD + 새 연결 GET + response.content 전체 버퍼링)과
+현재 방식(공유 세션 + 스트리밍 GET 한 번)의 지연 시간과 최대 메모리 사용량을 비교합니다.
+
+사용법:
+    python bench_generator_download.py
+    python bench_generator_download.py --size-kb 2048 --render-ms 200 -n 10
+"""
+
+import argparse
+import base64
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from free_anime_generator import FreeAnimeGenerator
+
+
+def start_stand_in_server(payload, render_delay):
+    """이미지 생성 서버 대역 (요청마다 렌더링 지연 후 응답)"""
+    counters = {'HEAD': 0, 'GET': 0, 'connections': 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def setup(self):
+            super().setup()
+            counters['connections'] += 1
+
+        def _headers(self):
+            time.sleep(render_delay)
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/png')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+
+        def do_HEAD(self):
+            counters['HEAD'] += 1
+            self._headers()
+
+        def do_GET(self):
+            counters['GET'] += 1
+            self._headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, counters
+
+
+def legacy_download(url, filepath):
+    """변경 전 방식: HEAD 확인 → 새 연결로 GET → 전체를 메모리에 올린 뒤 저장 + base64"""
+    response = requests.head(url, timeout=10)
+    if response.status_code != 200:
+        return None
+    response = requests.get(url, timeout=30)
+    response.raise_for_status()
+    with open(filepath, 'wb') as f:
+        f.write(response.content)
+    with open(filepath, 'rb') as f:
+        return f"data:image/png;base64,{base64.b64encode(f.read()).decode()}"
+
+
+def current_download_to_disk(generator, prompt, filename):
+    """현재 방식: 공유 세션으로 스트리밍 GET 한 번, 디스크에만 청크 단위로 저장"""
+    url = generator.generate_with_pollinations(prompt)
+    return generator.fetch_image(url, filename)['filepath']
+
+
+def current_download(generator, prompt, filename):
+    """현재 방식: 공유 세션으로 스트리밍 GET 한 번, 같은 패스에서 data URL 생성"""
+    url = generator.generate_with_pollinations(prompt)
+    return generator.fetch_image(url, filename, with_data_url=True)['data_url']
+
+
+def measure(label, func, repeat, counters):
+    before = dict(counters)
+    timings = []
+    peak = 0
+    for i in range(repeat):
+        tracemalloc.start()
+        start = time.perf_counter()
+        func(i)
+        timings.append(time.perf_counter() - start)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    timings.sort()
+    return {
+        'method': label,
+        'latency_ms_median': round(timings[len(timings) // 2] * 1000, 2),
+        'latency_ms_max': round(timings[-1] * 1000, 2),
+        'peak_python_memory_kb': round(peak / 1024, 1),
+        'head_requests': counters['HEAD'] - before['HEAD'],
+        'get_requests': counters['GET'] - before['GET'],
+        'tcp_connections': counters['connections'] - before['connections'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='이미지 다운로드 경로 벤치마크')
+    parser.add_argument('--size-kb', type=int, default=1024, help='이미지 크기 (KB)')
+    parser.add_argument('--render-ms', type=float, default=100, help='요청당 렌더링 지연 (ms)')
+    parser.add_argument('-n', '--repeat', type=int, default=5, help='방식별 반복 횟수')
+    args = parser.parse_args()
+
+    payload = os.urandom(args.size_kb * 1024)
+    server, counters = start_stand_in_server(payload, args.render_ms / 1000)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/prompt"
+    work_dir = tempfile.mkdtemp()
+
+    try:
+        generator = FreeAnimeGenerator(base_url=base_url)
+        generator.static_dir = work_dir
+
+        results = [
+            measure('legacy (HEAD + GET, buffered)',
+                    lambda i: legacy_download(f"{base_url}/cat?seed={i}", os.path.join(work_dir, f"legacy_{i}.png")),
+                    args.repeat, counters),
+            measure('pooled session, single streaming GET',
+                    lambda i: current_download_to_disk(generator, f"cat {i}", f"disk_{i}.png"),
+                    args.repeat, counters),
+            measure('pooled session, single streaming GET + data URL',
+                    lambda i: current_download(generator, f"cat {i}", f"current_{i}.png"),
+                    args.repeat, counters),
+        ]
+    finally:
+        server.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(json.dumps({
+        'image_kb': args.size_kb,
+        'render_ms': args.render_ms,
+        'repeat': args.repeat,
+        'results': results,
+    }, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
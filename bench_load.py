@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+서버 부하 테스트 벤치마크
+
+인메모리 Firestore(FIRESTORE_BACKEND=memory)와 stub 생성 백엔드(GENERATION_BACKENDS=stub)로
+app.py를 같은 프로세스의 멀티스레드 HTTP 서버로 띄운 뒤, 엔드포인트마다 정해진 동시 접속 수로
+요청을 보내고 처리량과 p50/p95/p99 지연 시간을 JSON으로 출력합니다.
+같은 --seed / 옵션이면 같은 데이터와 같은 요청 순서를 사용하므로 결과를 커밋 간에 비교할 수 있습니다.
+
+사용법:
+    python bench_load.py
+    python bench_load.py --concurrency 1,8,32 --requests 400 --firestore-latency-ms 20
+    python bench_load.py --endpoints esp-titles,update-todo --output bench_load.json
+"""
+
+import argparse
+import base64
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from io import BytesIO
+
+import requests
+
+ENDPOINTS = ('esp-titles', 'esp-image', 'update-todo', 'generate-prompt')
+
+
+def make_seed_data(todo_count, character_count, seed):
+    """할일 / 캐릭터 초기 데이터 생성"""
+    from PIL import Image
+
+    rng = random.Random(seed)
+    today = date.today()
+    todos = {}
+    for i in range(todo_count):
+        due = today if i % 2 == 0 else today + timedelta(days=rng.randint(1, 7))
+        todos[f"todo{i:05d}"] = {
+            'title': f"bench todo {i}",
+            'is_completed': rng.random() < 0.3,
+            'due_date_string': due.isoformat(),
+            'userId': 'bench_user',
+            'pause_times': [],
+            'resume_times': [],
+        }
+
+    characters = {}
+    for i in range(character_count):
+        buffer = BytesIO()
+        color = tuple(rng.randrange(256) for _ in range(3))
+        Image.new('RGB', (512, 512), color).save(buffer, format='PNG')
+        characters[f"char{i:04d}"] = {
+            'character_id': f"char{i:04d}",
+            'user_id': 'anonymous_user',
+            'name': f"bench character {i}",
+            'image_url': 'data:image/png;base64,' + base64.b64encode(buffer.getvalue()).decode(),
+            'created_at': datetime(2025, 1, 1) + timedelta(minutes=i),
+            'is_selected': i == 0,
+        }
+
+    return {'todos': todos, 'characters': characters}
+
+
+def start_server(app):
+    from werkzeug.serving import make_server
+
+    # 요청마다 찍히는 접속 로그가 측정에 섞이지 않도록 끔
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def make_request_factory(endpoint, base_url, todo_titles, seed):
+    """요청 번호 → (method, url, json) 를 돌려주는 함수 (번호가 같으면 항상 같은 요청)"""
+    if endpoint == 'esp-titles':
+        return lambda i: ('GET', f"{base_url}/esp-titles", None)
+    if endpoint == 'esp-image':
+        return lambda i: ('GET', f"{base_url}/esp-image", None)
+    if endpoint == 'update-todo':
+        def update(i):
+            rng = random.Random(seed * 1000003 + i)
+            return 'POST', f"{base_url}/update-todo", {
+                'title': todo_titles[rng.randrange(len(todo_titles))],
+                'is_completed': rng.random() < 0.5,
+            }
+        return update
+    if endpoint == 'generate-prompt':
+        # 절반은 같은 프롬프트를 반복해 캐시 / 단일 비행 경로도 함께 측정
+        return lambda i: ('POST', f"{base_url}/generate/prompt", {
+            'prompt': f"bench character {i if i % 2 else 0}",
+            'size': 128,
+        })
+    raise ValueError(endpoint)
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+def run_level(endpoint, request_for, concurrency, total):
+    """동시 접속 수 concurrency로 total개 요청을 보내고 결과 요약"""
+    local = threading.local()
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+
+    def send(i):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        method, url, body = request_for(i)
+        start = time.perf_counter()
+        try:
+            status = session.request(method, url, json=body, timeout=120).status_code
+        except requests.RequestException as e:
+            status = type(e).__name__
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(send, range(total)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    ok = sum(count for status, count in statuses.items() if status.isdigit() and int(status) < 400)
+    return {
+        'endpoint': endpoint,
+        'concurrency': concurrency,
+        'requests': total,
+        'ok': ok,
+        'statuses': statuses,
+        'throughput_rps': round(total / wall, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'max_ms': round(latencies[-1] * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='서버 부하 테스트 (인메모리 Firestore + stub 생성 백엔드)')
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS), help=f"쉼표로 구분 ({', '.join(ENDPOINTS)})")
+    parser.add_argument('--concurrency', default='1,8,32', help='동시 접속 수 목록 (쉼표로 구분)')
+    parser.add_argument('--requests', type=int, default=200, help='엔드포인트 / 동시 접속 수마다 보낼 요청 수')
+    parser.add_argument('--todos', type=int, default=500, help='초기 할일 문서 수')
+    parser.add_argument('--characters', type=int, default=20, help='초기 캐릭터 문서 수')
+    parser.add_argument('--firestore-latency-ms', type=float, default=5, help='Firestore RPC마다 넣을 지연 (ms)')
+    parser.add_argument('--generation-delay-ms', type=float, default=50, help='stub 생성 백엔드 지연 (ms)')
+    parser.add_argument('--seed', type=int, default=42, help='데이터 / 요청 순서 난수 시드')
+    parser.add_argument('--output', help='결과 JSON을 저장할 파일 (없으면 표준 출력)')
+    args = parser.parse_args()
+
+    endpoints = [e.strip() for e in args.endpoints.split(',') if e.strip()]
+    levels = [int(c) for c in args.concurrency.split(',')]
+    for endpoint in endpoints:
+        if endpoint not in ENDPOINTS:
+            parser.error(f"알 수 없는 엔드포인트: {endpoint}")
+
+    # app import 전에 오프라인 설정 (작업 디렉토리를 임시 폴더로 바꿔 static/ 출력을 격리)
+    output = os.path.abspath(args.output) if args.output else None
+    original_dir = os.getcwd()
+    work_dir = tempfile.mkdtemp(prefix='bench_load_')
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    os.chdir(work_dir)
+    os.environ.update({
+        'FIRESTORE_BACKEND': 'memory',
+        'FIRESTORE_LATENCY_MS': str(args.firestore_latency_ms),
+        'GENERATION_BACKENDS': 'stub',
+        'GENERATION_QUEUE_SIZE': str(max(levels) * 2),
+        'LOG_LEVEL': os.environ.get('LOG_LEVEL', 'WARNING'),
+    })
+
+    try:
+        import app as server_app
+        from generation_backends import StubBackend
+
+        for state in server_app.image_generator._states:
+            if isinstance(state.backend, StubBackend):
+                state.backend.delay = args.generation_delay_ms / 1000
+
+        data = make_seed_data(args.todos, args.characters, args.seed)
+        server_app.db.load(data)
+        todo_titles = sorted(todo['title'] for todo in data['todos'].values())
+
+        server, base_url = start_server(server_app.app)
+        # 리스너가 초기 데이터를 반영할 시간 + 첫 요청 예열
+        time.sleep(0.5)
+        for endpoint in endpoints:
+            method, url, body = make_request_factory(endpoint, base_url, todo_titles, args.seed)(0)
+            requests.request(method, url, json=body, timeout=120)
+
+        results = []
+        for endpoint in endpoints:
+            request_for = make_request_factory(endpoint, base_url, todo_titles, args.seed)
+            for concurrency in levels:
+                result = run_level(endpoint, request_for, concurrency, args.requests)
+                results.append(result)
+                print(f"{endpoint:16} c={concurrency:<4} {result['throughput_rps']:>8} rps  "
+                      f"p50 {result['p50_ms']:>8} ms  p95 {result['p95_ms']:>8} ms  p99 {result['p99_ms']:>8} ms",
+                      file=sys.stderr)
+
+        server.shutdown()
+    finally:
+        os.chdir(original_dir)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = json.dumps({
+        'config': {
+            'requests': args.requests,
+            'concurrency': levels,
+            'todos': args.todos,
+            'characters': args.characters,
+            'firestore_latency_ms': args.firestore_latency_ms,
+            'generation_delay_ms': args.generation_delay_ms,
+            'seed': args.seed,
+        },
+        'results': results,
+    }, indent=2, ensure_ascii=False)
+
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(report + '\n')
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+import base64
+import hashlib
+import os
+import re
+import tempfile
+from io import BytesIO
+
+
+# 미리 만들어 두는 썸네일 크기 (정사각형 한 변 길이)
+THUMBNAIL_SIZES = (64, 128, 256)
+
+_EXTENSIONS = {
+    'image/png': 'png',
+    'image/jpeg': 'jpg',
+    'image/webp': 'webp',
+    'image/gif': 'gif',
+}
+
+
+_KEY_PATTERN = re.compile(r'^[0-9a-f]{64}\.[a-z]+$')
+
+
+def content_key(data, content_type):
+    """콘텐츠 주소 키: 바이트의 SHA-256 + 확장자"""
+    extension = _EXTENSIONS.get(content_type, 'bin')
+    return f"{hashlib.sha256(data).hexdigest()}.{extension}"
+
+
+def is_content_key(key):
+    """content_key 형식인지 확인 (경로 조작 방지)"""
+    return bool(_KEY_PATTERN.match(key))
+
+
+class BlobStore:
+    """이미지 바이트 저장소 인터페이스
+
+    키는 content_key로 만든 콘텐츠 주소이므로 같은 이미지는 한 번만 저장되고,
+    한 번 저장된 키의 내용은 바뀌지 않습니다.
+    """
+
+    def put(self, data, content_type):
+        """바이트 저장 후 키 반환"""
+        raise NotImplementedError
+
+    def get(self, key):
+        """키에 해당하는 바이트 반환"""
+        raise NotImplementedError
+
+    def exists(self, key):
+        raise NotImplementedError
+
+    def url_for(self, key, base_url=None):
+        """클라이언트가 이미지를 받을 수 있는 절대 URL (Firestore에 저장되어 앱이 그대로 Image.network로 읽음)
+
+        base_url: 저장소에 정해진 주소가 없을 때 쓸 서버 주소 (요청의 host_url)
+        """
+        raise NotImplementedError
+
+
+class LocalBlobStore(BlobStore):
+    """로컬 파일시스템 저장소 (기본값)
+
+    root_dir/ab/abcdef....png 형태로 저장하며 Flask의 /blobs/<키> 경로로 제공합니다.
+    URL은 base_url(BLOB_PUBLIC_BASE_URL), 없으면 url_for에 넘긴 요청의 서버 주소로 만든 절대 URL입니다
+    (앱은 상대 URL을 불러올 수 없으므로 둘 다 없으면 ValueError).
+    """
+
+    def __init__(self, root_dir='static/blobs', base_url=''):
+        self.root_dir = root_dir
+        self.base_url = base_url.rstrip('/')
+        os.makedirs(self.root_dir, exist_ok=True)
+
+    def path_for(self, key):
+        return os.path.join(self.root_dir, key[:2], key)
+
+    def put(self, data, content_type):
+        key = content_key(data, content_type)
+        path = self.path_for(key)
+        if os.path.exists(path):
+            return key
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 같은 내용을 동시에 저장하는 스레드 / 워커끼리 임시 파일이 겹치지 않도록 호출마다 새 이름
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            # 다른 쪽이 같은 키를 먼저 저장함 - 내용이 같으므로 성공
+            if not os.path.exists(path):
+                raise
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return key
+
+    def get(self, key):
+        with open(self.path_for(key), 'rb') as f:
+            return f.read()
+
+    def exists(self, key):
+        return os.path.exists(self.path_for(key))
+
+    def url_for(self, key, base_url=None):
+        base_url = self.base_url or (base_url or '').rstrip('/')
+        if not base_url:
+            raise ValueError("로컬 블롭 저장소의 절대 URL을 만들 수 없습니다 (BLOB_PUBLIC_BASE_URL 설정 필요)")
+        return f"{base_url}/blobs/{key}"
+
+
+class FirebaseStorageBlobStore(BlobStore):
+    """Firebase Storage(Cloud Storage) 저장소
+
+    키를 prefix 아래 객체 이름으로 사용하며, 객체를 공개로 설정하고 공개 URL을 돌려줍니다.
+    """
+
+    def __init__(self, bucket_name=None, prefix='characters', ensure_app=None):
+        self.bucket_name = bucket_name
+        self.prefix = prefix.strip('/')
+        self._ensure_app = ensure_app
+        self._bucket = None
+
+    @property
+    def bucket(self):
+        """버킷은 처음 사용할 때 연결 (ensure_app: 그 전에 Firebase 앱을 초기화하는 함수)"""
+        if self._bucket is None:
+            from firebase_admin import storage
+
+            if self._ensure_app is not None:
+                self._ensure_app()
+            self._bucket = storage.bucket(self.bucket_name)
+        return self._bucket
+
+    def _blob(self, key):
+        return self.bucket.blob(f"{self.prefix}/{key}")
+
+    def put(self, data, content_type):
+        key = content_key(data, content_type)
+        blob = self._blob(key)
+        if not blob.exists():
+            blob.cache_control = 'public, max-age=31536000, immutable'
+            blob.upload_from_string(data, content_type=content_type)
+            blob.make_public()
+        return key
+
+    def get(self, key):
+        return self._blob(key).download_as_bytes()
+
+    def exists(self, key):
+        return self._blob(key).exists()
+
+    def url_for(self, key, base_url=None):
+        return self._blob(key).public_url
+
+
+def get_blob_store(ensure_app=None):
+    """환경 변수 설정에 맞는 저장소 생성
+
+    BLOB_STORE=local(기본) | firebase
+    BLOB_PUBLIC_BASE_URL: 로컬 저장소 URL 앞에 붙일 서버 주소 (예: http://192.168.0.12:5050,
+                          없으면 생성 요청이 들어온 서버 주소)
+    BLOB_BUCKET: Firebase Storage 버킷 이름 (없으면 기본 버킷)
+    """
+    backend = os.environ.get('BLOB_STORE', 'local')
+    if backend == 'firebase':
+        return FirebaseStorageBlobStore(os.environ.get('BLOB_BUCKET'), ensure_app=ensure_app)
+    return LocalBlobStore(base_url=os.environ.get('BLOB_PUBLIC_BASE_URL', ''))
+
+
+def make_thumbnail(image, size):
+    """비율을 유지해 size x size 안에 들어가는 PNG 썸네일 생성"""
+    thumbnail = image.copy()
+    thumbnail.thumbnail((size, size))
+    buffer = BytesIO()
+    thumbnail.save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+
+def store_character_image(store, data, content_type='image/png', base_url=None):
+    """원본과 썸네일을 저장하고 문서에 넣을 참조 필드 반환
+
+    base_url: 저장소에 공개 주소가 없을 때 URL에 쓸 서버 주소 (BlobStore.url_for)
+
+    Returns:
+        {'image_url', 'image_ref', 'thumbnail_urls'} - characters 문서에 그대로 병합
+    """
+    from PIL import Image  # 이미지 처리 첫 요청에서 로드 (콜드 스타트 단축)
+
+    image = Image.open(BytesIO(data))
+    image.load()
+
+    key = store.put(data, content_type)
+    thumbnails = {
+        str(size): store.put(make_thumbnail(image, size), 'image/png')
+        for size in THUMBNAIL_SIZES
+    }
+
+    return {
+        'image_url': store.url_for(key, base_url),
+        'image_ref': {
+            'key': key,
+            'content_type': content_type,
+            'width': image.width,
+            'height': image.height,
+            'size': len(data),
+            'thumbnails': thumbnails,
+        },
+        'thumbnail_urls': {size: store.url_for(thumb_key, base_url) for size, thumb_key in thumbnails.items()},
+    }
+
+
+def parse_data_url(data_url):
+    """data:image/...;base64,... → (바이트, content type)"""
+    header, encoded = data_url.split(',', 1)
+    content_type = header[len('data:'):].split(';', 1)[0] or 'image/png'
+    return base64.b64decode(encoded), content_type
@@ -0,0 +1,234 @@
+"""
+할일 변경 저널 (flask_firestore_listener.py의 GET /changes)
+
+딥슬립에서 깨어난 ESP32가 꺼져 있던 동안의 변경을 한 번의 요청으로 받아 가도록,
+리스너가 기기로 보낸 변경을 전체에서 증가하는 seq와 함께 기록합니다.
+- 최근 capacity개는 메모리 링 버퍼에 두고, 밀려난 항목은 추가 전용 파일(JSON Lines)에 씁니다.
+  파일이 spill_max_bytes를 넘으면 오래된 절반을 버립니다.
+- read(since, limit)은 since 이후의 변경을 할일별 마지막 상태 하나로 합쳐 돌려주고,
+  since가 이미 버려졌거나 저널이 모르는 seq면 None(→ 전체 다시 받기)을 돌려줍니다.
+- 정상 종료(close) 때는 링 버퍼까지 파일에 써 두어 재시작 후에도 seq를 이어 갑니다.
+  비정상 종료로 링 버퍼를 잃었으면 seq를 capacity만큼 건너뛰어 새로 시작하고
+  그 이전 seq는 모두 다시 받기로 처리합니다 (기기가 본 seq가 다른 변경에 재사용되지 않도록).
+"""
+
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# 파일 seq 색인 간격 (줄 수) - read에서 since 근처로 바로 이동
+INDEX_EVERY = 256
+
+
+def compact(entries, limit=None):
+    """저널 항목 목록(seq 순) → 할일별로 합친 변경 목록, 마지막으로 반영한 항목의 seq
+
+    create 뒤의 update는 create, 이 구간에서 만들어졌다가 삭제된 할일은 delete 하나로 보냅니다
+    (기기에 없을 수도 있는 할일의 delete는 무시하면 됨).
+    limit개의 할일을 채우면 그 뒤에 처음 나오는 새 할일 앞에서 멈춥니다.
+    """
+    merged = {}
+    last_seq = None
+    for entry in entries:
+        todo_id = entry['id']
+        if todo_id not in merged and limit is not None and len(merged) >= limit:
+            break
+        previous = merged.get(todo_id)
+        action = entry['action']
+        if previous and previous['action'] == 'create' and action == 'update':
+            action = 'create'
+        merged[todo_id] = {'action': action, 'id': todo_id, 'data': entry['data'], 'seq': entry['seq']}
+        last_seq = entry['seq']
+    changes = sorted(merged.values(), key=lambda change: change['seq'])
+    for change in changes:
+        if change['action'] == 'delete':
+            del change['data']
+    return changes, last_seq
+
+
+class ChangeJournal:
+    """seq가 붙은 할일 변경 기록 (메모리 링 버퍼 + 추가 전용 파일, 스레드 안전)
+
+    항목: {'seq', 'scope', 'action', 'id', 'data', 'owner', 'ts'}
+    """
+
+    def __init__(self, capacity=10000, spill_path=None, spill_max_bytes=16 * 1024 * 1024):
+        self.capacity = capacity
+        self.spill_path = spill_path
+        self.spill_max_bytes = spill_max_bytes
+        self._lock = threading.Lock()
+        self._ring = deque()
+        self._index = []    # [(seq, 파일 오프셋)] - INDEX_EVERY줄마다
+        self._spilled = 0   # 파일에 있는 항목 수
+        self._floor = 1     # 읽을 수 있는 가장 오래된 seq
+        self._seq = 0
+        self._evicted = 0
+        if spill_path:
+            self._load()
+            # 다음 시작 때 close() 없이 끝났는지 알 수 있도록 시작 표시
+            with open(spill_path, 'ab') as f:
+                f.write((json.dumps({'opened': self._seq}) + '\n').encode('utf-8'))
+
+    def _load(self):
+        """파일에서 seq / 색인 복구 (정상 종료 표시가 없으면 파일을 비우고 seq를 건너뜀)"""
+        if not os.path.exists(self.spill_path):
+            return
+        last_seq, first_seq, closed, seen = 0, None, False, False
+        with open(self.spill_path, 'rb') as f:
+            for line in f:
+                seen = True
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    closed = False
+                    continue
+                if 'seq' in record:
+                    first_seq = record['seq'] if first_seq is None else first_seq
+                    last_seq, closed = record['seq'], False
+                else:
+                    # 시작 / 종료 표시: {'opened': seq} / {'closed': seq}
+                    closed = 'closed' in record
+                    last_seq = max(last_seq, record.get('closed', record.get('opened', 0)))
+        if not seen:
+            return
+
+        if closed:
+            self._seq = last_seq
+            self._floor = first_seq if first_seq is not None else last_seq + 1
+            self._reindex()
+            logger.info("📒 변경 저널 복구: seq %d까지 (파일에 %d개)", last_seq, self._spilled)
+        else:
+            self._seq = last_seq + self.capacity
+            self._floor = self._seq + 1
+            open(self.spill_path, 'wb').close()
+            logger.warning("⚠️ 변경 저널이 정상 종료되지 않음 - seq %d부터 새로 시작 (이전 seq는 다시 받기)",
+                           self._seq + 1)
+
+    def _reindex(self):
+        """파일의 seq 색인 / 항목 수 다시 만들기 (self._lock을 잡은 상태 또는 초기화 중에 호출)"""
+        self._index, self._spilled = [], 0
+        with open(self.spill_path, 'rb') as f:
+            offset = 0
+            for line in f:
+                record = json.loads(line)
+                if 'seq' in record:
+                    if self._spilled % INDEX_EVERY == 0:
+                        self._index.append((record['seq'], offset))
+                    self._spilled += 1
+                offset += len(line)
+
+    def append(self, changes, scope=None):
+        """변경 목록 [(action, todo_id, data, owner)]을 기록 → 마지막 seq"""
+        now = time.time()
+        with self._lock:
+            for action, todo_id, data, owner in changes:
+                self._seq += 1
+                self._ring.append({
+                    'seq': self._seq, 'scope': scope, 'action': action, 'id': todo_id,
+                    'data': {} if action == 'delete' else data, 'owner': owner, 'ts': now,
+                })
+            overflow = len(self._ring) - self.capacity
+            if overflow > 0:
+                evicted = [self._ring.popleft() for _ in range(overflow)]
+                self._evicted += overflow
+                if self.spill_path:
+                    self._spill(evicted)
+                else:
+                    self._floor = self._ring[0]['seq'] if self._ring else self._seq + 1
+            return self._seq
+
+    def _spill(self, entries):
+        """링 버퍼에서 밀려난 항목을 파일 끝에 추가 (self._lock을 잡은 상태에서 호출)"""
+        lines = [(json.dumps(entry, ensure_ascii=False, default=str) + '\n').encode('utf-8') for entry in entries]
+        with open(self.spill_path, 'ab') as f:
+            offset = f.tell()
+            for entry, line in zip(entries, lines):
+                if self._spilled % INDEX_EVERY == 0:
+                    self._index.append((entry['seq'], offset))
+                self._spilled += 1
+                offset += len(line)
+            f.write(b''.join(lines))
+        if offset > self.spill_max_bytes:
+            self._trim()
+
+    def _trim(self):
+        """파일의 오래된 절반 버리기 (self._lock을 잡은 상태에서 호출)"""
+        with open(self.spill_path, 'rb') as f:
+            lines = [line for line in f if 'seq' in json.loads(line)]
+        kept = lines[len(lines) // 2:]
+        tmp_path = self.spill_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.writelines(kept)
+        os.replace(tmp_path, self.spill_path)
+        self._reindex()
+        self._floor = json.loads(kept[0])['seq'] if kept else (self._ring[0]['seq'] if self._ring else self._seq + 1)
+        logger.info("✂️ 변경 저널 파일 정리: %d개 항목 유지 (seq %d부터)", len(kept), self._floor)
+
+    def _read_spill(self, since):
+        """파일에서 seq > since인 항목 (self._lock을 잡은 상태에서 호출)"""
+        position = bisect.bisect_right([seq for seq, _ in self._index], since + 1) - 1
+        offset = self._index[max(position, 0)][1] if self._index else 0
+        entries = []
+        with open(self.spill_path, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                record = json.loads(line)
+                if record.get('seq', 0) > since:
+                    entries.append(record)
+        return entries
+
+    @property
+    def head(self):
+        """마지막으로 기록한 seq (아무것도 없으면 0)"""
+        return self._seq
+
+    def read(self, since, limit=100, scopes=None):
+        """since 이후의 변경 → {'changes': [...], 'next': seq, 'head': seq, 'more': bool}
+
+        scopes가 있으면 그 범위(listener_scopes.TodoScope.key)의 변경만 봅니다.
+        since가 저널 범위 밖이면(이미 버려졌거나 저널이 모르는 seq) None을 돌려주므로
+        호출한 쪽은 전체 목록을 다시 보내야 합니다.
+        """
+        with self._lock:
+            head = self._seq
+            if since > head or since < self._floor - 1:
+                return None
+            entries = []
+            if self.spill_path and self._spilled and (not self._ring or since + 1 < self._ring[0]['seq']):
+                entries.extend(self._read_spill(since))
+            entries.extend(entry for entry in self._ring if entry['seq'] > since)
+
+        if scopes is not None:
+            scopes = set(scopes)
+            entries = [entry for entry in entries if entry['scope'] in scopes]
+        changes, last_seq = compact(entries, limit)
+        # limit에서 멈췄으면 다음 요청은 거기서부터, 아니면 (다른 범위 항목을 건너뛰었더라도) head부터
+        more = last_seq is not None and any(entry['seq'] > last_seq for entry in entries)
+        return {'changes': changes, 'next': last_seq if more else head, 'head': head, 'more': more}
+
+    def close(self):
+        """링 버퍼를 파일에 쓰고 정상 종료 표시 (재시작 후 seq를 이어 감)"""
+        with self._lock:
+            if not self.spill_path:
+                return
+            if self._ring:
+                self._spill(list(self._ring))
+                self._ring.clear()
+            with open(self.spill_path, 'ab') as f:
+                f.write((json.dumps({'closed': self._seq}) + '\n').encode('utf-8'))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'head': self._seq,
+                'floor': self._floor,
+                'memory': len(self._ring),
+                'spilled': self._spilled,
+                'evicted': self._evicted,
+            }
@@ -0,0 +1,100 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+# 목록에 내려주는 필드 (이미지 본문인 image_url은 기본적으로 제외)
+CHARACTER_LIST_FIELDS = [
+    'character_id', 'name', 'prompt', 'style', 'type', 'generation_type',
+    'created_at', 'is_selected', 'thumbnail_urls',
+]
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 50
+
+
+def character_summary(doc, include_image=False):
+    """characters 문서 → 목록 항목
+
+    thumbnail_urls가 없는 예전 문서(base64 image_url)는 빈 썸네일로 내려가므로,
+    migrate_character_images.py로 변환하거나 include_image로 원본을 요청해야 합니다.
+    """
+    data = doc.to_dict()
+    created_at = data.get('created_at')
+    item = {
+        'character_id': data.get('character_id') or doc.id,
+        'name': data.get('name'),
+        'prompt': data.get('prompt'),
+        'style': data.get('style'),
+        'type': data.get('type'),
+        'generation_type': data.get('generation_type'),
+        'created_at': created_at.isoformat() if hasattr(created_at, 'isoformat') else created_at,
+        'is_selected': data.get('is_selected', False),
+        'thumbnail_urls': data.get('thumbnail_urls') or {},
+    }
+    if include_image:
+        item['image_url'] = data.get('image_url')
+    return item
+
+
+class CharacterPageCache:
+    """캐릭터 목록 페이지 캐시
+
+    (커서, 페이지 크기, 원본 포함 여부)별로 조회 결과를 ttl초 동안 보관합니다.
+    캐릭터가 생성/선택되면 invalidate()로 전체를 비웁니다. 비우기 전에 시작된 조회 결과는
+    세대(generation) 번호가 달라 저장되지 않습니다.
+    """
+
+    def __init__(self, max_pages=64, ttl=60):
+        self.max_pages = max_pages
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+        self._pages = OrderedDict()  # 키 → (저장 시각, 페이지)
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def lookup(self, key):
+        """Returns: (캐시된 페이지 또는 None, 세대 번호) - 세대 번호는 store()에 그대로 전달"""
+        with self._lock:
+            entry = self._pages.get(key)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl:
+                self._pages.move_to_end(key)
+                self.hits += 1
+                return entry[1], self._generation
+            self.misses += 1
+            return None, self._generation
+
+    def store(self, key, page, generation):
+        """lookup() 이후 조회한 페이지 저장 (그 사이 invalidate()되었으면 버림)"""
+        with self._lock:
+            if generation == self._generation:
+                self._pages[key] = (time.monotonic(), page)
+                self._pages.move_to_end(key)
+                while len(self._pages) > self.max_pages:
+                    self._pages.popitem(last=False)
+
+    def get_or_load(self, key, load):
+        """캐시된 페이지를 반환하거나 load()로 조회해 저장"""
+        page, generation = self.lookup(key)
+        if page is None:
+            page = load()
+            self.store(key, page, generation)
+        return page
+
+    def invalidate(self):
+        with self._lock:
+            self._pages.clear()
+            self._generation += 1
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pages': len(self._pages),
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+            }
@@ -0,0 +1,308 @@
+"""
+ESP32용 상시 연결 발행 / 구독 브로커 (flask_firestore_listener.py)
+
+기기가 TCP 연결 하나를 열어 두고 그 위로 변경을 받으므로, 변경마다 HTTP 요청(TCP 연결 + 헤더)을
+새로 만들지 않습니다. asyncio(표준 라이브러리)로 별도 스레드에서 동작하고, 토픽은 두 종류입니다.
+- device/<기기 ID>: 그 기기 하나, 기기가 ACK해야 전달 완료 (아웃박스 전송에 사용)
+- group/<이름>: HELLO에서 구독한 기기 전체, 확인 없이 보냄 (방송용)
+
+프레임: [종류 1바이트][본문 길이 4바이트, big-endian][본문]
+- HELLO   (기기 → 서버) JSON {"device": "<기기 ID>", "token": "<기기 비밀값>", "groups": ["<그룹>", ...]}
+          비밀값이 authenticate(기기 등록 정보)와 맞지 않으면 WELCOME 없이 연결을 닫음
+- WELCOME (서버 → 기기) JSON {"heartbeat": <초>}
+- PUBLISH (서버 → 기기) [메시지 ID 4바이트][형식 1바이트: 0 JSON / 1 MessagePack][esp_wire로 인코딩한 본문]
+- ACK     (기기 → 서버) [메시지 ID 4바이트][선택: JSON {"ack": <seq>} - HTTP 응답 본문과 같은 의미]
+- NACK    (기기 → 서버) [메시지 ID 4바이트][JSON {"error": "...", "retry": true | false}]
+- PING / PONG (양방향, 본문 없음)
+
+서버는 heartbeat초마다 PING을 보내고, heartbeat × HEARTBEAT_MISSES초 동안 아무 프레임도 받지 못하면
+죽은 연결로 보고 닫습니다 (응답을 기다리던 전송은 재시도 가능한 DeliveryError).
+"""
+
+import asyncio
+import concurrent.futures
+import json
+import logging
+import struct
+import threading
+import time
+
+from esp_delivery import DeliveryError
+
+logger = logging.getLogger(__name__)
+
+HELLO, WELCOME, PUBLISH, ACK, NACK, PING, PONG = range(1, 8)
+CONTENT_TYPES = {'application/json': 0, 'application/msgpack': 1}
+
+HEADER = struct.Struct('>BI')
+MESSAGE_ID = struct.Struct('>I')
+
+# 기기에서 받는 프레임의 최대 크기 (ACK / HELLO만 오므로 작게)
+MAX_FRAME = 64 * 1024
+# 이 횟수만큼의 heartbeat 동안 아무 프레임도 없으면 죽은 연결
+HEARTBEAT_MISSES = 3
+
+
+def encode_frame(kind, payload=b''):
+    return HEADER.pack(kind, len(payload)) + payload
+
+
+async def read_frame(reader, max_size=MAX_FRAME):
+    """스트림에서 프레임 하나 → (종류, 본문)"""
+    kind, length = HEADER.unpack(await reader.readexactly(HEADER.size))
+    if length > max_size:
+        raise ValueError(f"프레임이 너무 큼 ({length}바이트)")
+    return kind, await reader.readexactly(length)
+
+
+class _Connection:
+    def __init__(self, device_id, groups, writer):
+        self.device_id = device_id
+        self.groups = set(groups)
+        self.writer = writer
+        self.pending = {}  # 메시지 ID → Future (ACK 대기)
+        self.connected_at = time.time()
+        self.last_seen = time.monotonic()
+        self.sent = 0
+        self.rtt = None  # 마지막 PING → PONG 왕복 시간
+        self._ping_sent = None
+
+    def peer(self):
+        return self.writer.get_extra_info('peername')
+
+
+class EspBroker:
+    """기기별 / 그룹별 토픽을 가진 TCP 발행 / 구독 브로커
+
+    publish()는 다른 스레드(OutboxDispatcher 작업 스레드 등)에서 호출하는 블로킹 함수입니다.
+    authenticate(device_id, token) → bool은 HELLO마다 브로커 스레드에서 불리며, 없으면 모든 연결을 거부합니다.
+    on_connect(device_id)는 기기가 인증을 마칠 때마다 브로커 스레드에서 불립니다.
+    """
+
+    def __init__(self, host='127.0.0.1', port=1884, heartbeat=15.0, write_timeout=5.0, authenticate=None,
+                 on_connect=None):
+        self.host = host
+        self.port = port
+        self.heartbeat = heartbeat
+        self.write_timeout = write_timeout
+        self.authenticate = authenticate
+        self.on_connect = on_connect
+        self._connections = {}  # 기기 ID → _Connection (브로커 스레드에서만 변경)
+        self._next_id = 0
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._dead_peers = 0
+        self._rejected = 0
+        self._tasks = set()  # 연결별 처리 태스크 (종료 때 정리)
+
+    def start(self):
+        """브로커 스레드 시작 (이미 시작했으면 무시) → 실제로 연 포트"""
+        if self._thread is not None:
+            return self.port
+        self._thread = threading.Thread(target=self._run, name='esp-broker', daemon=True)
+        self._thread.start()
+        self._ready.wait(10)
+        return self.port
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._server = self._loop.run_until_complete(
+            asyncio.start_server(self._handle, self.host, self.port)
+        )
+        # port=0이면 운영체제가 고른 포트
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info("📡 ESP32 브로커 시작: %s:%d (heartbeat %.0f초)", self.host, self.port, self.heartbeat)
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._loop.close()
+
+    async def _handle(self, reader, writer):
+        connection = None
+        task = asyncio.current_task()
+        self._tasks.add(task)
+        try:
+            kind, payload = await asyncio.wait_for(read_frame(reader), self.heartbeat)
+            hello = json.loads(payload) if kind == HELLO else {}
+            if not isinstance(hello.get('device'), str):
+                logger.warning("⚠️ ESP32 브로커: HELLO 없는 연결 닫음 (%s)", writer.get_extra_info('peername'))
+                return
+            if self.authenticate is None or not self.authenticate(hello['device'], hello.get('token')):
+                self._rejected += 1
+                logger.warning("🚫 ESP32 브로커: %s 인증 실패 - 연결 닫음 (%s)",
+                               hello['device'], writer.get_extra_info('peername'))
+                return
+            connection = _Connection(hello['device'], hello.get('groups') or [], writer)
+            previous = self._connections.get(connection.device_id)
+            if previous is not None:
+                # 같은 비밀값으로 다시 연결함 - 이전 연결은 반쯤 끊긴 상태이므로 정리
+                logger.warning("🔁 ESP32 브로커: %s 새 연결(%s)이 이전 연결(%s)을 대체",
+                               connection.device_id, connection.peer(), previous.peer())
+                self._drop(previous, "새 연결로 대체됨")
+            self._connections[connection.device_id] = connection
+
+            writer.write(encode_frame(WELCOME, json.dumps({'heartbeat': self.heartbeat}).encode('utf-8')))
+            await asyncio.wait_for(writer.drain(), self.write_timeout)
+            logger.info("🔌 ESP32 브로커 연결: %s (%s, 그룹 %s)",
+                        connection.device_id, connection.peer(), sorted(connection.groups) or '-')
+            if self.on_connect:
+                try:
+                    self.on_connect(connection.device_id)
+                except Exception:
+                    logger.exception("❌ ESP32 브로커 on_connect 오류")
+
+            pinger = asyncio.ensure_future(self._ping(connection))
+            try:
+                await self._read_loop(connection, reader)
+            finally:
+                pinger.cancel()
+        except asyncio.TimeoutError:
+            if connection is not None:
+                self._dead_peers += 1
+                logger.warning("💀 ESP32 브로커: %s 응답 없음 (%.0f초) - 연결 닫음",
+                               connection.device_id, self.heartbeat * HEARTBEAT_MISSES)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception as e:
+            logger.warning("⚠️ ESP32 브로커 연결 오류 (%s): %s", connection and connection.device_id, e)
+        finally:
+            if connection is not None and self._connections.get(connection.device_id) is connection:
+                self._drop(connection, "연결 끊김")
+            writer.close()
+            self._tasks.discard(task)
+
+    async def _read_loop(self, connection, reader):
+        while True:
+            kind, payload = await asyncio.wait_for(read_frame(reader), self.heartbeat * HEARTBEAT_MISSES)
+            connection.last_seen = time.monotonic()
+            if kind in (ACK, NACK):
+                (message_id,) = MESSAGE_ID.unpack_from(payload)
+                future = connection.pending.pop(message_id, None)
+                if future is None or future.done():
+                    continue
+                body = json.loads(payload[MESSAGE_ID.size:]) if len(payload) > MESSAGE_ID.size else {}
+                if kind == ACK:
+                    future.set_result(body)
+                else:
+                    future.set_exception(DeliveryError(
+                        f"ESP32 거부: {body.get('error', '')}", retry=bool(body.get('retry', True))))
+            elif kind == PING:
+                connection.writer.write(encode_frame(PONG))
+            elif kind == PONG and connection._ping_sent is not None:
+                connection.rtt = time.monotonic() - connection._ping_sent
+                connection._ping_sent = None
+
+    async def _ping(self, connection):
+        try:
+            while True:
+                await asyncio.sleep(self.heartbeat)
+                connection._ping_sent = time.monotonic()
+                connection.writer.write(encode_frame(PING))
+                await asyncio.wait_for(connection.writer.drain(), self.write_timeout)
+        except (asyncio.TimeoutError, ConnectionError):
+            # 보내지도 못하는 연결 - 닫으면 읽기 쪽도 끝남
+            connection.writer.close()
+
+    def _drop(self, connection, reason):
+        """연결 정리 (브로커 스레드에서 호출) - ACK를 기다리던 전송은 재시도 가능한 실패로"""
+        if self._connections.get(connection.device_id) is connection:
+            del self._connections[connection.device_id]
+        for future in connection.pending.values():
+            if not future.done():
+                future.set_exception(DeliveryError(f"브로커 연결 끊김 ({reason})"))
+        connection.pending.clear()
+        connection.writer.close()
+        logger.info("🔌 ESP32 브로커 연결 해제: %s (%s)", connection.device_id, reason)
+
+    def connected(self, device_id):
+        return device_id in self._connections
+
+    def publish(self, topic, body, content_type='application/json', timeout=5.0):
+        """topic으로 본문 발행 (블로킹)
+
+        device/<기기 ID>: 기기의 ACK 본문(dict)을 돌려줌, 연결이 없거나 timeout 안에 ACK가 없으면 DeliveryError
+        group/<이름>: 확인 없이 구독 중인 기기 전체에 보내고 받은 기기 수를 돌려줌
+        """
+        if self._loop is None:
+            raise DeliveryError("브로커가 시작되지 않았습니다")
+        future = asyncio.run_coroutine_threadsafe(self._publish(topic, body, content_type, timeout), self._loop)
+        try:
+            return future.result(timeout + self.write_timeout + 1)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise DeliveryError(f"브로커 발행 시간 초과 ({topic})")
+
+    async def _publish(self, topic, body, content_type, timeout):
+        kind, _, name = topic.partition('/')
+        if kind == 'group':
+            receivers = [c for c in self._connections.values() if name in c.groups]
+            for connection in receivers:
+                self._write_publish(connection, body, content_type)
+            return len(receivers)
+        if kind != 'device':
+            raise ValueError(f"알 수 없는 토픽: {topic}")
+
+        connection = self._connections.get(name)
+        if connection is None:
+            raise DeliveryError(f"ESP32({name})가 브로커에 연결되어 있지 않음")
+        future = self._loop.create_future()
+        message_id = self._write_publish(connection, body, content_type)
+        connection.pending[message_id] = future
+        try:
+            await asyncio.wait_for(connection.writer.drain(), self.write_timeout)
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise DeliveryError(f"ESP32({name}) ACK 시간 초과")
+        finally:
+            connection.pending.pop(message_id, None)
+
+    def _write_publish(self, connection, body, content_type):
+        self._next_id = (self._next_id + 1) & 0xFFFFFFFF
+        payload = MESSAGE_ID.pack(self._next_id) + bytes([CONTENT_TYPES.get(content_type, 0)]) + body
+        connection.writer.write(encode_frame(PUBLISH, payload))
+        connection.sent += 1
+        return self._next_id
+
+    def stats(self):
+        connections = list(self._connections.values())
+        return {
+            'port': self.port,
+            'dead_peers': self._dead_peers,
+            'rejected': self._rejected,
+            'devices': {
+                c.device_id: {
+                    'peer': '%s:%s' % c.peer()[:2] if c.peer() else None,
+                    'groups': sorted(c.groups),
+                    'connected_at': c.connected_at,
+                    'sent': c.sent,
+                    'pending': len(c.pending),
+                    'rtt_ms': round(c.rtt * 1000, 1) if c.rtt is not None else None,
+                }
+                for c in connections
+            },
+        }
+
+    def stop(self):
+        """연결을 모두 닫고 브로커 스레드 종료"""
+        if self._loop is None or self._loop.is_closed():
+            return
+
+        async def shutdown():
+            self._server.close()
+            for connection in list(self._connections.values()):
+                self._drop(connection, "브로커 종료")
+            # 연결을 닫으면 처리 태스크는 EOF로 끝남 (취소하면 asyncio가 오류 로그를 남김)
+            if self._tasks:
+                await asyncio.wait(list(self._tasks), timeout=self.write_timeout)
+            await self._server.wait_closed()
+
+        try:
+            asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result(5)
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(5)
+            self._thread = None
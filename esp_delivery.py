@@ -0,0 +1,664 @@
+"""
+ESP32 기기들로 할일 변경사항 전달 (flask_firestore_listener.py)
+
+변경사항은 기기별로 SQLite 아웃박스(DeviceOutbox)에 기록하고, OutboxDispatcher가 기기마다 따로 보냅니다.
+- 같은 기기의 같은 할일에 대한 미전송 변경은 마지막 상태 하나로 합칩니다.
+- 여러 할일의 변경을 한 요청에 모아 보냅니다 (batch_size개까지).
+- 기기마다 동시 요청 수(max_inflight)와 재시도 일정(지수 백오프 + 지터)이 따로 있어,
+  느리거나 꺼진 기기가 다른 기기의 전송을 막지 않습니다.
+- 기기가 확인(ack)한 변경만 아웃박스에서 지우고 그 기기의 커서(acked_seq)를 올리므로,
+  리스너 프로세스가 재시작해도 전달되지 않은 변경은 다시 보냅니다 (최소 한 번 전달).
+- delta 형식(esp_wire.DELTA_FORMATS) 기기는 마지막으로 확인한 할일 상태를 기억해 두고
+  달라진 필드만 patch로 보냅니다.
+- 리스너(범위)별로 마지막으로 본 할일 내용 해시와 read_time을 아웃박스와 같은 트랜잭션으로 저장하므로,
+  재시작 후 초기 스냅샷은 실제로 달라진 할일만 골라 기기마다 한 번의 요청(bulk)으로 보냅니다.
+"""
+
+import hashlib
+import hmac
+import json
+import logging
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from esp_wire import DELTA_FORMATS, compute_delta
+
+logger = logging.getLogger(__name__)
+
+# 컬렉션 전체를 보는 리스너의 범위 키 (listener_scopes.TodoScope.key)
+ALL_SCOPE = '*'
+
+
+class DeliveryError(Exception):
+    """ESP32 전송 실패
+
+    retry=False이면 다시 보내도 성공할 수 없는 요청(잘못된 페이로드 등)이므로 버립니다.
+    """
+
+    def __init__(self, message, retry=True):
+        super().__init__(message)
+        self.retry = retry
+
+
+def content_hash(encoded):
+    """할일 문서 JSON(sort_keys) → 내용 해시"""
+    return hashlib.sha1(encoded.encode('utf-8')).hexdigest()
+
+
+def token_hash(token):
+    """기기 비밀값 → 저장용 해시 (devices.token_hash)"""
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+def merge_change(pending, new):
+    """같은 할일의 두 변경 (action, data) → 하나
+
+    ESP32가 아직 확인하지 않은 create 뒤의 update는 최신 데이터의 create로 보냅니다.
+    """
+    if pending and pending[0] == 'create' and new[0] == 'update':
+        return ('create', new[1])
+    return new
+
+
+class DeviceOutbox:
+    """기기 목록 + 기기별 미전달 변경 (SQLite)
+
+    outbox의 seq는 전체에서 증가하는 번호로, 같은 기기 안에서는 변경 순서를 나타냅니다.
+    user_id가 있는 기기는 그 사용자의 할일 변경만, 없는 기기는 모든 변경을 받습니다.
+    device_todos에는 delta 형식 기기가 마지막으로 확인한 할일 상태(patch의 기준)를 저장합니다.
+    next_batch로 꺼낸 변경의 내용은 기기 / 할일별로 메모리에 기억해 두었다가 ack 때 기준 상태로 씁니다
+    (전송 중에 같은 할일의 새 변경이 들어와 아웃박스 행이 교체되어도 기기가 적용한 상태를 잃지 않도록).
+    scope_hashes / meta에는 리스너 범위별로 마지막으로 본 할일 내용 해시와 read_time을,
+    devices.synced_scope에는 기기가 전체 문서를 받은 범위(scope_hashes의 범위 키)를,
+    devices.token_hash에는 브로커(esp_broker.py) HELLO에 쓰는 기기 비밀값의 해시를 저장합니다.
+    """
+
+    def __init__(self, db_path=':memory:'):
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._sent = {}  # 기기 ID → {할일 ID: (seq, action, data)} - next_batch로 꺼낸 변경
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS devices ("
+                " id TEXT PRIMARY KEY, endpoint TEXT NOT NULL, user_id TEXT,"
+                " max_inflight INTEGER, acked_seq INTEGER NOT NULL DEFAULT 0, updated_at REAL)"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS outbox ("
+                " seq INTEGER PRIMARY KEY AUTOINCREMENT, device_id TEXT NOT NULL, todo_id TEXT NOT NULL,"
+                " action TEXT NOT NULL, data TEXT NOT NULL, created_at REAL NOT NULL,"
+                " UNIQUE (device_id, todo_id))"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS device_todos ("
+                " device_id TEXT NOT NULL, todo_id TEXT NOT NULL, data TEXT NOT NULL,"
+                " PRIMARY KEY (device_id, todo_id))"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS scope_hashes ("
+                " scope TEXT NOT NULL, todo_id TEXT NOT NULL, hash TEXT NOT NULL, user_id TEXT,"
+                " PRIMARY KEY (scope, todo_id))"
+            )
+            self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(devices)")}
+            if 'format' not in columns:
+                self._db.execute("ALTER TABLE devices ADD COLUMN format TEXT")
+            if 'scope' not in columns:
+                self._db.execute("ALTER TABLE devices ADD COLUMN scope TEXT")
+            if 'synced_scope' not in columns:
+                self._db.execute("ALTER TABLE devices ADD COLUMN synced_scope TEXT")
+            if 'token_hash' not in columns:
+                self._db.execute("ALTER TABLE devices ADD COLUMN token_hash TEXT")
+            tables = {row[0] for row in self._db.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            if 'todo_hashes' in tables:
+                # 범위 구분 전 형식: 컬렉션 전체 리스너의 해시, 기기들은 전체 컬렉션을 받아 둔 상태
+                self._db.execute(
+                    "INSERT OR IGNORE INTO scope_hashes (scope, todo_id, hash, user_id)"
+                    " SELECT ?, todo_id, hash, user_id FROM todo_hashes", (ALL_SCOPE,)
+                )
+                self._db.execute("UPDATE meta SET key = ? WHERE key = 'read_time'", (f"read_time:{ALL_SCOPE}",))
+                self._db.execute("UPDATE devices SET synced_scope = ? WHERE synced_scope IS NULL", (ALL_SCOPE,))
+                self._db.execute("DROP TABLE todo_hashes")
+            self._db.commit()
+
+    def register_device(self, device_id, endpoint, user_id=None, max_inflight=None, wire_format=None,
+                        scope=None, broker_token=None):
+        """기기 추가 / 변경 (커서와 미전달 변경은 유지)
+
+        wire_format: esp_wire.WIRE_FORMATS 중 하나 (None이면 'json')
+        scope: 받을 할일 범위 설정 dict (listener_scopes.TodoScope.from_config, None이면 기본 범위)
+        broker_token: 브로커 HELLO의 token과 비교할 기기 비밀값 (None이면 브로커로 연결할 수 없음, 해시만 저장)
+        """
+        wire_format = wire_format or 'json'
+        with self._lock:
+            row = self._db.execute("SELECT format FROM devices WHERE id = ?", (device_id,)).fetchone()
+            if row and (row[0] or 'json') != wire_format:
+                # delta 기준 상태는 delta 형식일 때만 유지되므로 형식이 바뀌면 다시 전체 문서부터
+                self._db.execute("DELETE FROM device_todos WHERE device_id = ?", (device_id,))
+            self._db.execute(
+                "INSERT INTO devices (id, endpoint, user_id, max_inflight, format, scope, token_hash, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT(id) DO UPDATE SET endpoint = excluded.endpoint, user_id = excluded.user_id,"
+                " max_inflight = excluded.max_inflight, format = excluded.format, scope = excluded.scope,"
+                " token_hash = excluded.token_hash, updated_at = excluded.updated_at",
+                (device_id, endpoint, user_id, max_inflight, wire_format,
+                 json.dumps(scope) if scope is not None else None,
+                 token_hash(broker_token) if broker_token else None, time.time()),
+            )
+            self._db.commit()
+
+    def remove_device(self, device_id):
+        """기기와 그 기기의 미전달 변경 삭제"""
+        with self._lock:
+            self._db.execute("DELETE FROM outbox WHERE device_id = ?", (device_id,))
+            self._db.execute("DELETE FROM device_todos WHERE device_id = ?", (device_id,))
+            removed = self._db.execute("DELETE FROM devices WHERE id = ?", (device_id,)).rowcount
+            self._db.commit()
+            self._sent.pop(device_id, None)
+        return removed > 0
+
+    def devices(self):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, endpoint, user_id, max_inflight, acked_seq, format, scope, synced_scope"
+                " FROM devices ORDER BY id"
+            ).fetchall()
+        return [
+            {'id': r[0], 'endpoint': r[1], 'user_id': r[2], 'max_inflight': r[3], 'acked_seq': r[4],
+             'format': r[5] or 'json', 'scope': json.loads(r[6]) if r[6] else None, 'synced_scope': r[7]}
+            for r in rows
+        ]
+
+    def check_token(self, device_id, token):
+        """브로커 HELLO의 기기 ID / 비밀값이 등록된 기기와 맞는지 (비밀값이 없는 기기는 항상 False)"""
+        if not isinstance(token, str) or not token:
+            return False
+        with self._lock:
+            row = self._db.execute("SELECT token_hash FROM devices WHERE id = ?", (device_id,)).fetchone()
+        return bool(row and row[0]) and hmac.compare_digest(row[0], token_hash(token))
+
+    def has_token(self, device_id):
+        """기기에 브로커 비밀값이 등록되어 있는지"""
+        with self._lock:
+            row = self._db.execute("SELECT token_hash FROM devices WHERE id = ?", (device_id,)).fetchone()
+        return bool(row and row[0])
+
+    def set_synced_scope(self, device_ids, scope):
+        """기기들이 scope 범위의 전체 문서를 받았음을 기록 (이후로는 그 범위의 diff만 보냄)"""
+        with self._lock:
+            self._db.executemany(
+                "UPDATE devices SET synced_scope = ? WHERE id = ?", [(scope, device_id) for device_id in device_ids]
+            )
+            self._db.commit()
+
+    def enqueue(self, changes, read_time=None, scope=ALL_SCOPE, devices=None):
+        """변경 목록을 받을 기기들의 아웃박스에 한 트랜잭션으로 기록
+
+        scope(리스너 범위, listener_scopes.TodoScope.key)마다 리스너가 마지막으로 본 내용 해시와 같은 변경
+        (내용 없는 수정, 이미 본 문서의 재전달)은 건너뛰고, 해시 / read_time도 같은 트랜잭션으로 저장해
+        재시작 후 diff의 기준으로 씁니다. scope=None이면 해시를 보지도 저장하지도 않습니다.
+
+        Args:
+            changes: [(action, todo_id, data, user_id)] - user_id는 할일 소유자 (없으면 None)
+            read_time: 이 변경들을 담은 스냅샷의 read_time (datetime)
+            devices: 받을 기기 ID 목록 (None이면 기기의 user_id가 없거나 소유자와 같은 기기 전체)
+
+        Returns:
+            (기기 ID → 그 기기에 추가된 마지막 seq, 실제로 기록한 변경 목록 [(action, todo_id, data, user_id)])
+            - 기록한 변경의 action은 해시 비교 결과로 바뀔 수 있음 (이미 본 할일의 create → update)
+        """
+        now = time.time()
+        targets = {}
+        recorded = []
+        with self._lock:
+            registered = self._db.execute("SELECT id, user_id FROM devices").fetchall()
+            if devices is not None:
+                wanted = set(devices)
+                registered = [(device_id, None) for device_id, _ in registered if device_id in wanted]
+
+            for action, todo_id, data, owner in changes:
+                encoded = json.dumps({} if action == 'delete' else data, default=str, sort_keys=True)
+                if scope is not None:
+                    action = self._record_hash(scope, action, todo_id, encoded, owner)
+                    if action is None:
+                        continue
+                recorded.append((action, todo_id, data, owner))
+
+                for device_id, device_user in registered:
+                    if device_user is not None and device_user != owner:
+                        continue
+                    previous = self._db.execute(
+                        "SELECT action FROM outbox WHERE device_id = ? AND todo_id = ?", (device_id, todo_id)
+                    ).fetchone()
+                    merged_action = merge_change(previous, (action, None))[0]
+                    if previous:
+                        # 새 seq로 다시 넣어 기기 안의 변경 순서를 유지
+                        self._db.execute(
+                            "DELETE FROM outbox WHERE device_id = ? AND todo_id = ?", (device_id, todo_id)
+                        )
+                    cursor = self._db.execute(
+                        "INSERT INTO outbox (device_id, todo_id, action, data, created_at) VALUES (?, ?, ?, ?, ?)",
+                        (device_id, todo_id, merged_action, encoded, now),
+                    )
+                    targets[device_id] = cursor.lastrowid
+            if read_time is not None and scope is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                    (f"read_time:{scope}", read_time.isoformat()),
+                )
+            self._db.commit()
+        return targets, recorded
+
+    def _record_hash(self, scope, action, todo_id, encoded, owner):
+        """범위의 내용 해시 갱신 → 보낼 action (이미 본 내용이거나 본 적 없는 문서의 삭제면 None)
+
+        self._lock을 잡은 상태에서 호출
+        """
+        row = self._db.execute(
+            "SELECT hash FROM scope_hashes WHERE scope = ? AND todo_id = ?", (scope, todo_id)
+        ).fetchone()
+        if action == 'delete':
+            if row is None:
+                return None
+            self._db.execute("DELETE FROM scope_hashes WHERE scope = ? AND todo_id = ?", (scope, todo_id))
+            return action
+
+        digest = content_hash(encoded)
+        if row is not None and row[0] == digest:
+            return None
+        self._db.execute(
+            "INSERT OR REPLACE INTO scope_hashes (scope, todo_id, hash, user_id) VALUES (?, ?, ?, ?)",
+            (scope, todo_id, digest, owner),
+        )
+        return 'update' if row is not None and action == 'create' else action
+
+    def missing_todos(self, present_ids, scope=ALL_SCOPE):
+        """범위의 리스너가 본 적 있지만 present_ids(현재 스냅샷)에 없는 할일 → [(할일 ID, 소유자)]
+
+        리스너가 꺼져 있는 동안 삭제되었거나 범위를 벗어난(자정 롤오버 등) 할일을 찾는 데 사용합니다.
+        """
+        with self._lock:
+            rows = self._db.execute("SELECT todo_id, user_id FROM scope_hashes WHERE scope = ?", (scope,)).fetchall()
+        return [(todo_id, owner) for todo_id, owner in rows if todo_id not in present_ids]
+
+    def prune_scopes(self, keep):
+        """keep에 없고 어느 기기의 synced_scope도 아닌 범위의 해시 / read_time 삭제 → 삭제한 범위 목록
+
+        지운 범위를 다시 열면 처음부터 전체 동기화합니다.
+        """
+        with self._lock:
+            keep = set(keep)
+            keep.update(row[0] for row in self._db.execute(
+                "SELECT DISTINCT synced_scope FROM devices WHERE synced_scope IS NOT NULL"))
+            stored = {row[0] for row in self._db.execute("SELECT DISTINCT scope FROM scope_hashes")}
+            stored.update(row[0][len('read_time:'):] for row in self._db.execute(
+                "SELECT key FROM meta WHERE key LIKE 'read_time:%'"))
+            removed = sorted(stored - keep)
+            for scope in removed:
+                self._db.execute("DELETE FROM scope_hashes WHERE scope = ?", (scope,))
+                self._db.execute("DELETE FROM meta WHERE key = ?", (f"read_time:{scope}",))
+            self._db.commit()
+        return removed
+
+    def snapshot_info(self, scope=ALL_SCOPE):
+        """범위의 리스너 스냅샷 상태 (저장된 할일 수, 마지막 read_time)"""
+        with self._lock:
+            count = self._db.execute("SELECT COUNT(*) FROM scope_hashes WHERE scope = ?", (scope,)).fetchone()[0]
+            row = self._db.execute("SELECT value FROM meta WHERE key = ?", (f"read_time:{scope}",)).fetchone()
+        return {'todos': count, 'read_time': row[0] if row else None}
+
+    def pending_devices(self):
+        """미전달 변경이 있는 기기 ID 집합"""
+        with self._lock:
+            return {row[0] for row in self._db.execute("SELECT DISTINCT device_id FROM outbox")}
+
+    def next_batch(self, device_id, limit, exclude_todos=()):
+        """기기의 미전달 변경을 seq 순서로 최대 limit개
+
+        Returns:
+            json 형식: [{'seq', 'action', 'id', 'data', 'timestamp'}]
+            delta 형식: 기준 상태가 있는 update는 {'seq', 'action': 'patch', 'id', 'set', 'unset', 'append'}
+                        (빈 키는 생략), 나머지는 {'seq', 'action', 'id', 'data'}
+
+        exclude_todos(지금 전송 중인 할일)는 건너뛰어 같은 할일이 동시에 두 번 전송되지 않게 합니다.
+        달라진 필드가 없는 update는 보내지 않고 바로 지웁니다.
+        돌려준 변경의 내용(patch면 patch를 계산한 전체 문서)은 ack 때 기준 상태로 쓰도록 기억해 둡니다.
+        """
+        with self._lock:
+            row = self._db.execute("SELECT format FROM devices WHERE id = ?", (device_id,)).fetchone()
+            delta = bool(row) and row[0] in DELTA_FORMATS
+            rows = self._db.execute(
+                "SELECT seq, todo_id, action, data, created_at FROM outbox WHERE device_id = ? ORDER BY seq",
+                (device_id,),
+            ).fetchall()
+
+            batch, unchanged = [], []
+            sent = self._sent.setdefault(device_id, {})
+            for seq, todo_id, action, encoded, created_at in rows:
+                if todo_id in exclude_todos:
+                    continue
+                data = json.loads(encoded)
+                if not delta:
+                    batch.append({'seq': seq, 'action': action, 'id': todo_id, 'data': data, 'timestamp': created_at})
+                elif action == 'update' and (change := self._patch(device_id, seq, todo_id, data)) is not None:
+                    if change is False:
+                        unchanged.append((device_id, seq))
+                        continue
+                    batch.append(change)
+                elif action == 'delete':
+                    batch.append({'seq': seq, 'action': action, 'id': todo_id})
+                else:
+                    batch.append({'seq': seq, 'action': action, 'id': todo_id, 'data': data})
+                # 같은 할일은 한 번에 하나만 전송 중이므로 할일별로 마지막에 꺼낸 것만 기억
+                sent[todo_id] = (seq, action, encoded)
+                if len(batch) >= limit:
+                    break
+
+            if unchanged:
+                self._db.executemany("DELETE FROM outbox WHERE device_id = ? AND seq = ?", unchanged)
+                self._db.commit()
+            return batch
+
+    def _patch(self, device_id, seq, todo_id, data):
+        """기기가 확인한 상태 대비 patch 변경 (기준 상태가 없으면 None, 달라진 것이 없으면 False)
+
+        self._lock을 잡은 상태에서 호출
+        """
+        row = self._db.execute(
+            "SELECT data FROM device_todos WHERE device_id = ? AND todo_id = ?", (device_id, todo_id)
+        ).fetchone()
+        if row is None:
+            return None
+        set_fields, unset, append = compute_delta(json.loads(row[0]), data)
+        if not (set_fields or unset or append):
+            return False
+        change = {'seq': seq, 'action': 'patch', 'id': todo_id}
+        if set_fields:
+            change['set'] = set_fields
+        if unset:
+            change['unset'] = unset
+        if append:
+            change['append'] = append
+        return change
+
+    def ack(self, device_id, seqs, delivered=True):
+        """기기가 확인한 변경 삭제 후 커서(acked_seq)를 올림
+
+        전송 뒤 같은 할일의 새 변경이 들어와 이미 교체된 seq는 아웃박스에서 지우지 않습니다 (새 변경은 남아서
+        다시 전송). delta 형식 기기는 next_batch 때 기억해 둔 보낸 내용을 다음 patch의 기준으로 저장하므로,
+        행이 교체되었더라도 기준 상태는 기기가 실제로 적용한 상태로 올라갑니다.
+        delivered=False(기기가 거부)이면 기준 상태를 지워 다음 변경을 전체 문서로 보냅니다.
+        """
+        if not seqs:
+            return
+        with self._lock:
+            sent = self._sent.get(device_id, {})
+            wanted = set(seqs)
+            acked = {seq: (todo_id, action, data)
+                     for todo_id, (seq, action, data) in sent.items() if seq in wanted}
+            for seq, (todo_id, _, _) in acked.items():
+                del sent[todo_id]
+            row = self._db.execute("SELECT format FROM devices WHERE id = ?", (device_id,)).fetchone()
+            if row and row[0] in DELTA_FORMATS:
+                missing = [seq for seq in seqs if seq not in acked]
+                if missing:
+                    # next_batch를 거치지 않은 seq (아웃박스에 남아 있는 행의 내용)
+                    marks = ','.join('?' * len(missing))
+                    acked.update((seq, (todo_id, action, data)) for seq, todo_id, action, data in self._db.execute(
+                        f"SELECT seq, todo_id, action, data FROM outbox WHERE device_id = ? AND seq IN ({marks})",
+                        (device_id, *missing),
+                    ))
+                for todo_id, action, data in acked.values():
+                    if action == 'delete' or not delivered:
+                        self._db.execute(
+                            "DELETE FROM device_todos WHERE device_id = ? AND todo_id = ?", (device_id, todo_id)
+                        )
+                    else:
+                        self._db.execute(
+                            "INSERT OR REPLACE INTO device_todos (device_id, todo_id, data) VALUES (?, ?, ?)",
+                            (device_id, todo_id, data),
+                        )
+            self._db.executemany(
+                "DELETE FROM outbox WHERE device_id = ? AND seq = ?", [(device_id, seq) for seq in seqs]
+            )
+            self._db.execute(
+                "UPDATE devices SET acked_seq = MAX(acked_seq, ?) WHERE id = ?", (max(seqs), device_id)
+            )
+            self._db.commit()
+
+    def pending_counts(self):
+        """기기 ID → 미전달 변경 수"""
+        with self._lock:
+            return dict(self._db.execute("SELECT device_id, COUNT(*) FROM outbox GROUP BY device_id"))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class OutboxDispatcher:
+    """DeviceOutbox의 변경을 기기별로 병렬 전송
+
+    send(device, changes)는 변경 목록을 기기 하나에 한 번의 요청으로 보내고, 기기가 일부만 확인했으면
+    마지막으로 확인한 seq를, 전부 확인했으면 None을 돌려줍니다. 실패하면 예외(DeliveryError 등)를 냅니다.
+    스케줄러 스레드 하나가 보낼 기기를 고르고, workers개의 스레드가 실제 요청을 처리합니다.
+    """
+
+    def __init__(self, outbox, send, workers=32, batch_size=20, max_inflight=1,
+                 base_backoff=0.5, max_backoff=30.0, bulk_batch_size=1000):
+        self.outbox = outbox
+        self.send = send
+        self.batch_size = batch_size
+        self.bulk_batch_size = bulk_batch_size
+        self.max_inflight = max_inflight
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+        self._cond = threading.Condition()
+        self._devices = {}  # 기기 ID → 기기 정보 (outbox.devices())
+        self._state = {}  # 기기 ID → 전송 상태 (_device_state)
+        self._ready = set()  # 미전달 변경이 있을 수 있는 기기
+        self._closed = False
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='esp-delivery')
+
+        self.reload_devices()
+        # 재시작 전에 전달하지 못한 변경부터 다시 전송
+        self._ready.update(device_id for device_id in outbox.pending_devices() if device_id in self._devices)
+
+        self._scheduler = threading.Thread(target=self._schedule, name='esp-delivery-scheduler', daemon=True)
+        self._scheduler.start()
+
+    @staticmethod
+    def _device_state():
+        return {'requests': 0, 'todos': set(), 'failures': 0, 'retry_at': 0.0, 'bulk_until': None,
+                'sent': 0, 'errors': 0, 'rejected': 0, 'last_error': None}
+
+    def reload_devices(self):
+        """outbox의 기기 목록을 다시 읽음 (기기 추가 / 변경 / 삭제 후 호출)"""
+        devices = {device['id']: device for device in self.outbox.devices()}
+        with self._cond:
+            self._devices = devices
+            for device_id in list(self._state):
+                if device_id not in devices and not self._state[device_id]['requests']:
+                    del self._state[device_id]
+            self._ready.intersection_update(devices)
+            self._cond.notify_all()
+
+    def wake(self, device_id):
+        """기기의 재시도 대기를 없애고 미전달 변경을 바로 보냄 (기기가 다시 연결되었을 때)"""
+        with self._cond:
+            state = self._state.get(device_id)
+            if state is not None:
+                state['failures'] = 0
+                state['retry_at'] = 0.0
+            if device_id in self._devices:
+                self._ready.add(device_id)
+            self._cond.notify_all()
+
+    def submit(self, changes, read_time=None, bulk=False, scope=ALL_SCOPE, devices=None):
+        """변경 목록을 아웃박스에 기록하고 해당 기기들을 깨움 (DeviceOutbox.enqueue 참고)
+
+        bulk=True(재시작 후 초기 동기화, 범위 합류)이면 기기마다 이번 변경까지를 bulk_batch_size개 단위
+        (기본 1000, 보통 한 번)의 요청으로 보냅니다.
+        scope / devices는 DeviceOutbox.enqueue와 같습니다.
+
+        Returns:
+            실제로 기록한 변경 목록 (이미 본 내용과 같은 변경 제외)
+        """
+        targets, recorded = self.outbox.enqueue(changes, read_time, scope, devices)
+        if targets:
+            with self._cond:
+                self._ready.update(targets)
+                if bulk:
+                    for device_id, last_seq in targets.items():
+                        self._state.setdefault(device_id, self._device_state())['bulk_until'] = last_seq
+                self._cond.notify_all()
+        return recorded
+
+    def _limit(self, device):
+        return device.get('max_inflight') or self.max_inflight
+
+    def _schedule(self):
+        while True:
+            with self._cond:
+                if self._closed:
+                    return
+                now = time.monotonic()
+                candidates = []
+                next_retry = None
+                for device_id in self._ready:
+                    device = self._devices.get(device_id)
+                    if device is None:
+                        continue
+                    state = self._state.setdefault(device_id, self._device_state())
+                    if state['requests'] >= self._limit(device):
+                        continue
+                    if state['retry_at'] > now:
+                        next_retry = state['retry_at'] if next_retry is None else min(next_retry, state['retry_at'])
+                        continue
+                    limit = self.bulk_batch_size if state['bulk_until'] else self.batch_size
+                    candidates.append((device, set(state['todos']), limit))
+                # 처리할 기기가 없으면 새 변경 / 전송 완료 / 가장 빠른 재시도 시각까지 대기
+                if not candidates:
+                    self._cond.wait(None if next_retry is None else max(0.0, next_retry - now))
+                    continue
+
+            # SQLite 조회는 잠금 밖에서 (submit / 완료 처리를 막지 않도록)
+            for device, exclude, limit in candidates:
+                batch = self.outbox.next_batch(device['id'], limit, exclude)
+                with self._cond:
+                    state = self._state.get(device['id'])
+                    if state is None:
+                        continue
+                    if state['bulk_until'] and (not batch or batch[-1]['seq'] >= state['bulk_until']):
+                        state['bulk_until'] = None
+                    if not batch:
+                        # 전송 중인 요청이 끝나면 _deliver가 다시 _ready에 넣음
+                        self._ready.discard(device['id'])
+                        continue
+                    state['requests'] += 1
+                    state['todos'].update(change['id'] for change in batch)
+                self._executor.submit(self._deliver, device, batch)
+
+    def _deliver(self, device, batch):
+        device_id = device['id']
+        error = None
+        try:
+            acked = self.send(device, batch)
+        except Exception as e:
+            acked, error = None, e
+
+        if error is None:
+            seqs = [change['seq'] for change in batch if acked is None or change['seq'] <= acked]
+            self.outbox.ack(device_id, seqs)
+            if len(seqs) < len(batch):
+                error = DeliveryError(f"{len(batch) - len(seqs)}건 미확인 (ack={acked})")
+            else:
+                logger.debug("✅ ESP32 전송 성공 (%s): %d건", device_id, len(batch))
+        elif not getattr(error, 'retry', True):
+            # 다시 보내도 성공할 수 없으므로 확인된 것으로 처리해 뒤 변경이 막히지 않게 함
+            self.outbox.ack(device_id, [change['seq'] for change in batch], delivered=False)
+
+        with self._cond:
+            state = self._state.get(device_id)
+            if state is not None:
+                state['requests'] -= 1
+                state['todos'].difference_update(change['id'] for change in batch)
+                if error is None:
+                    state['sent'] += len(batch)
+                    state['failures'] = 0
+                    state['retry_at'] = 0.0
+                elif not getattr(error, 'retry', True):
+                    state['rejected'] += len(batch)
+                    state['last_error'] = str(error)
+                    logger.warning("❌ ESP32(%s)가 변경 %d건을 거부 (재시도 안 함): %s", device_id, len(batch), error)
+                else:
+                    state['errors'] += 1
+                    state['failures'] += 1
+                    state['last_error'] = str(error)
+                    backoff = min(self.max_backoff, self.base_backoff * 2 ** (state['failures'] - 1))
+                    backoff *= random.uniform(0.5, 1.0)
+                    state['retry_at'] = time.monotonic() + backoff
+                    logger.warning("❌ ESP32(%s) 전송 실패 (%d번째), %.1f초 후 재시도: %s",
+                                   device_id, state['failures'], backoff, error)
+            if device_id in self._devices:
+                self._ready.add(device_id)
+            self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """모든 기기의 미전달 변경이 전송(또는 거부)될 때까지 대기 → 비었으면 True
+
+        재시도 대기 중인 기기가 있으면 그 기기가 성공할 때까지 기다립니다.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._cond:
+                busy = any(state['requests'] for state in self._state.values())
+            if not busy and not self.outbox.pending_counts():
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            with self._cond:
+                self._cond.wait(0.05)
+
+    def close(self, timeout=5.0):
+        """스케줄러를 멈추고 진행 중인 요청을 기다림 (미전달 변경은 아웃박스에 남아 다음 시작 때 전송)"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._scheduler.join(timeout)
+        self._executor.shutdown(wait=True)
+
+    def stats(self):
+        pending = self.outbox.pending_counts()
+        devices = self.outbox.devices()
+        with self._cond:
+            now = time.monotonic()
+            result = {}
+            for device in devices:
+                state = self._state.get(device['id']) or self._device_state()
+                result[device['id']] = {
+                    'endpoint': device['endpoint'],
+                    'user_id': device['user_id'],
+                    'format': device['format'],
+                    'acked_seq': device['acked_seq'],
+                    'pending': pending.get(device['id'], 0),
+                    'inflight': state['requests'],
+                    'max_inflight': self._limit(device),
+                    'sent': state['sent'],
+                    'errors': state['errors'],
+                    'rejected': state['rejected'],
+                    'consecutive_failures': state['failures'],
+                    'retry_in_seconds': round(max(0.0, state['retry_at'] - now), 3),
+                    'last_error': state['last_error'],
+                }
+        return {
+            'devices': result,
+            'pending': sum(pending.values()),
+            'backing_off': sum(1 for d in result.values() if d['retry_in_seconds'] > 0),
+        }
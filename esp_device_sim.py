@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+ESP32 기기 시뮬레이터 (브로커 / HTTP 전송 시험, bench_esp_transport.py)
+
+- SimulatedDevice: esp_broker.py 브로커에 연결해 PUBLISH를 받아 할일 상태에 반영하고 ACK,
+  PING에는 PONG으로 응답 (freeze()하면 아무 응답도 하지 않아 죽은 연결처럼 동작)
+- SimulatedHttpDevice: ESP32 WebServer처럼 POST 하나마다 응답 후 연결을 닫는 HTTP 서버
+  (keep_alive=True면 연결 유지)
+
+두 기기 모두 받은 변경을 esp_wire 형식(json / json-delta / msgpack)대로 풀어 todos에 반영합니다.
+
+사용법 (실행 중인 flask_firestore_listener.py의 브로커에 붙기):
+    python esp_device_sim.py --broker 127.0.0.1:1884 --device esp-1 --token <broker_token> --group kitchen
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from esp_broker import ACK, HELLO, MESSAGE_ID, PING, PONG, PUBLISH, WELCOME, encode_frame, read_frame
+from esp_wire import apply_delta, decode_msgpack
+
+logger = logging.getLogger(__name__)
+
+# 기기 쪽 프레임 최대 크기 (한 번에 받는 배치)
+MAX_DEVICE_FRAME = 4 * 1024 * 1024
+# CLI에서 연결이 끊겼을 때 다시 연결하기까지 (초)
+RECONNECT_DELAY = 2.0
+
+
+def decode_changes(body, msgpack_body=False):
+    """전송 본문 → 변경 목록"""
+    if msgpack_body:
+        return decode_msgpack(body)
+    payload = json.loads(body)
+    return payload['changes'] if payload.get('action') == 'batch' else [payload]
+
+
+class _DeviceState:
+    """받은 변경을 반영한 할일 상태 (ESP32 메모리의 할일 목록 역할)"""
+
+    def __init__(self):
+        self.todos = {}
+        self.received = 0
+        self.last_seq = None
+
+    def apply(self, changes):
+        for change in changes:
+            if change['action'] == 'delete':
+                self.todos.pop(change['id'], None)
+            elif change['action'] == 'patch':
+                self.todos[change['id']] = apply_delta(self.todos.get(change['id'], {}), change)
+            elif change['action'] in ('create', 'update'):
+                self.todos[change['id']] = change.get('data') or {}
+            if 'seq' in change:
+                self.last_seq = change['seq']
+        self.received += 1
+
+
+class SimulatedDevice(_DeviceState):
+    """브로커에 상시 연결하는 가상 ESP32 (asyncio)"""
+
+    def __init__(self, device_id, host, port, groups=(), ack_delay=0.0, token=None):
+        super().__init__()
+        self.frozen = False
+        self.device_id = device_id
+        self.token = token
+        self.host = host
+        self.port = port
+        self.groups = list(groups)
+        self.ack_delay = ack_delay
+        self.heartbeat = None
+        self.group_messages = 0
+        self._writer = None
+
+    def freeze(self):
+        """PING / PUBLISH에 더 이상 응답하지 않음 (전원이 나간 기기처럼 연결만 남김)"""
+        self.frozen = True
+
+    async def run(self, connected=None):
+        """연결 → HELLO → 끊길 때까지 프레임 처리"""
+        reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        hello = {'device': self.device_id, 'token': self.token, 'groups': self.groups}
+        self._writer.write(encode_frame(HELLO, json.dumps(hello).encode('utf-8')))
+        kind, payload = await read_frame(reader, MAX_DEVICE_FRAME)
+        if kind != WELCOME:
+            raise ConnectionError(f"WELCOME 대신 프레임 {kind}")
+        self.heartbeat = json.loads(payload)['heartbeat']
+        if connected is not None:
+            connected.set()
+
+        try:
+            while True:
+                kind, payload = await read_frame(reader, MAX_DEVICE_FRAME)
+                if self.frozen:
+                    continue
+                if kind == PING:
+                    self._writer.write(encode_frame(PONG))
+                elif kind == PUBLISH:
+                    message_id = payload[:MESSAGE_ID.size]
+                    msgpack_body = payload[MESSAGE_ID.size] == 1
+                    changes = decode_changes(payload[MESSAGE_ID.size + 1:], msgpack_body)
+                    if 'seq' in changes[0]:
+                        self.apply(changes)
+                    else:
+                        self.group_messages += 1
+                    if self.ack_delay:
+                        await asyncio.sleep(self.ack_delay)
+                    self._writer.write(encode_frame(ACK, message_id))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._writer.close()
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+class SimulatedHttpDevice(_DeviceState):
+    """POST /api/todos를 받는 가상 ESP32 HTTP 서버 (스레드)"""
+
+    def __init__(self, host='127.0.0.1', port=0, keep_alive=False):
+        super().__init__()
+        device = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # keep_alive=False면 ESP32 WebServer처럼 응답마다 연결을 닫음
+            protocol_version = 'HTTP/1.1' if keep_alive else 'HTTP/1.0'
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                device.apply(decode_changes(body, self.headers.get('Content-Type') == 'application/msgpack'))
+                self.send_response(200)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.endpoint = f"http://{host}:{self.server.server_port}/api/todos"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ESP32 기기 시뮬레이터 (브로커 연결)')
+    parser.add_argument('--broker', default='127.0.0.1:1884', help='브로커 주소 host:port')
+    parser.add_argument('--device', required=True, help='기기 ID (devices 컬렉션 / PUT /devices의 ID)')
+    parser.add_argument('--token', required=True, help='기기 비밀값 (devices 컬렉션 / PUT /devices의 broker_token)')
+    parser.add_argument('--group', action='append', default=[], help='구독할 그룹 (여러 번 지정 가능)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    host, _, port = args.broker.rpartition(':')
+    device = SimulatedDevice(args.device, host, int(port), args.group, token=args.token)
+
+    async def report():
+        while True:
+            await asyncio.sleep(5)
+            logger.info("📟 %s: 메시지 %d개, 할일 %d개, 마지막 seq %s",
+                        args.device, device.received, len(device.todos), device.last_seq)
+
+    async def run():
+        reporter = asyncio.ensure_future(report())
+        # 실제 기기처럼 끊기면 잠시 뒤 다시 연결 (할일 상태는 유지)
+        while True:
+            try:
+                await device.run()
+                logger.info("🔌 연결 끊김 - %.0f초 후 다시 연결", RECONNECT_DELAY)
+            except OSError as e:
+                logger.info("🔌 연결 실패 (%s) - %.0f초 후 다시 시도", e, RECONNECT_DELAY)
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+from observability import timed
+
+
+class EspRenderCache:
+    """ESP용 렌더 결과 캐시 (콘텐츠 주소 기반)
+
+    키는 원본 이미지 데이터의 해시와 목표 크기로 만들어지므로, 선택된 캐릭터가
+    바뀌지 않는 한 디코딩/리사이즈를 다시 하지 않습니다.
+    렌더 결과는 디스크(cache_dir)에 저장되고, 최근 사용한 항목은 메모리 LRU에 유지됩니다.
+    디스크 캐시도 max_disk_entries개까지만 두고, 오래 사용하지 않은(mtime) 파일부터 지웁니다.
+    """
+
+    def __init__(self, cache_dir='static/esp_cache', max_entries=16, max_disk_entries=256):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(source, size):
+        """원본 데이터 + 목표 크기로 캐시 키 생성
+
+        data URL의 base64 본문은 원본 바이트와 1:1로 대응하므로, 디코딩하지 않고
+        인코딩된 문자열을 그대로 해싱합니다. 블롭 저장소의 이미지는 이미 콘텐츠 주소인
+        블롭 키를 source로 사용합니다.
+        """
+        if isinstance(source, str):
+            source = source.encode()
+        digest = hashlib.sha256(source)
+        digest.update(f"|{size[0]}x{size[1]}".encode())
+        return digest.hexdigest()[:32]
+
+    def path_for(self, key):
+        return os.path.join(self.cache_dir, f"{key}.jpg")
+
+    def get(self, key):
+        """캐시된 JPEG 바이트 반환 (메모리 → 디스크 순서로 조회)"""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return data
+
+        path = self.path_for(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            # 디스크 캐시 정리 순서(mtime)를 최근 사용 순서로 유지
+            os.utime(path)
+        except FileNotFoundError:
+            # 없거나 방금 다른 워커가 정리함
+            return None
+        self._remember(key, data)
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def render(self, key, load_source, size=(400, 400)):
+        """원본 이미지를 목표 크기 JPEG로 렌더링 (캐시 우선)
+
+        Args:
+            key: make_key로 만든 캐시 키
+            load_source: 원본 이미지 바이트를 돌려주는 함수 (캐시 미스일 때만 호출)
+
+        Returns:
+            (key, jpeg_bytes)
+        """
+        data = self.get(key)
+        if data is not None:
+            return key, data
+
+        with self._lock:
+            self.misses += 1
+
+        from PIL import Image  # 첫 렌더링에서 로드 (콜드 스타트 단축)
+
+        with timed('decode'):
+            image = Image.open(BytesIO(load_source()))
+            if image.mode != "RGB":
+                image = image.convert("RGB")
+
+        with timed('resize'):
+            buffer = BytesIO()
+            image.resize(size).save(buffer, format='JPEG')
+            data = buffer.getvalue()
+
+        # 임시 파일에 쓴 뒤 교체해서 읽는 쪽이 절반만 쓰인 파일을 보지 않도록 함
+        # 같은 키를 동시에 렌더링하는 스레드 / 워커끼리 임시 파일이 겹치지 않도록 호출마다 새 이름
+        path = self.path_for(key)
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{key}.", suffix='.tmp', dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            # 다른 쪽이 같은 키를 먼저 저장함 - 키가 같으면 내용도 같으므로 성공
+            if not os.path.exists(path):
+                raise
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self._prune()
+
+        self._remember(key, data)
+        return key, data
+
+    def _prune(self):
+        """디스크 캐시를 max_disk_entries개로 유지 (오래 사용하지 않은 파일부터 삭제)"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.startswith('.') or not name.endswith('.jpg'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                entries.append((os.path.getmtime(path), path))
+            except FileNotFoundError:
+                continue
+        if len(entries) <= self.max_disk_entries:
+            return
+        entries.sort(reverse=True)
+        for _, path in entries[self.max_disk_entries:]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _remember(self, key, data):
+        with self._lock:
+            self._memory[key] = data
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'memory_entries': len(self._memory),
+                'max_disk_entries': self.max_disk_entries,
+            }
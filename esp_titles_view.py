@@ -0,0 +1,188 @@
+import hashlib
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from tenants import TODO_USER_FIELD
+
+logger = logging.getLogger(__name__)
+
+# 자정 재구독이 실패했을 때 다시 시도하기까지 (초, 실패할 때마다 두 배, 최대 ROLLOVER_MAX_RETRY_DELAY)
+ROLLOVER_RETRY_DELAY = 5
+ROLLOVER_MAX_RETRY_DELAY = 300
+
+
+class TodayTitlesView:
+    """오늘 마감인 미완료 할일 제목의 인메모리 뷰
+
+    오늘 날짜로 범위를 좁힌 Firestore on_snapshot 리스너가 뷰를 최신 상태로 유지하므로
+    /esp-titles는 요청마다 Firestore를 읽지 않고 메모리에서 바로 응답할 수 있습니다.
+    자정이 지나면 다음 날짜로 리스너를 다시 엽니다 (실패하면 지수 백오프로 다시 시도).
+
+    제목은 사용자(userId)별로도 나눠 보관합니다. user_id를 넘기면 그 사용자의 제목과 버전만
+    다루므로, 다른 사용자의 할일이 바뀌어도 롱폴링 / SSE 대기가 깨어나지 않습니다.
+    user_id가 None이면 전체 제목과 전체 버전입니다.
+
+    버전은 날짜와 (문서 ID, 제목) 목록의 해시라서 같은 내용이면 어느 gunicorn 워커든,
+    재시작한 프로세스든 같은 값입니다. 롱폴링 / SSE가 다른 워커로 이어져도 그대로 쓸 수 있습니다.
+    """
+
+    def __init__(self, db, collection='todos'):
+        self.db = db
+        self.collection = collection
+        self.date_str = None
+        self.ready = False
+
+        self._titles = {}  # 문서 ID → (사용자 ID, 제목)
+        self._titles_date = None  # self._titles가 속한 날짜
+        self.version = self._empty_version = self._make_version(None, [])
+        self._user_versions = {}  # 사용자 ID → 버전 (제목이 없는 사용자는 self._empty_version)
+        self._watch = None
+        self._rollover_timer = None
+        self._changed = threading.Condition()
+        self._listeners = []
+
+    def start(self):
+        """오늘 날짜 리스너 시작 및 자정 롤오버 예약"""
+        today = datetime.now()
+        date_str = today.strftime("%Y-%m-%d")
+
+        query = self.db.collection(self.collection) \
+            .where('due_date_string', '==', date_str) \
+            .where('is_completed', '==', False)
+
+        with self._changed:
+            self.date_str = date_str
+            self.ready = False
+
+        self._watch = query.on_snapshot(
+            lambda docs, changes, read_time: self._on_snapshot(date_str, docs)
+        )
+
+        # 다음 자정 직후에 롤오버
+        midnight = datetime.combine(today.date() + timedelta(days=1), datetime.min.time())
+        delay = (midnight - today).total_seconds() + 1
+        self._rollover_timer = threading.Timer(delay, self._rollover)
+        self._rollover_timer.daemon = True
+        self._rollover_timer.start()
+
+        logger.info("👀 오늘 할일 뷰 리스너 시작: %s", date_str)
+
+    def stop(self):
+        """리스너와 롤오버 타이머 정리"""
+        if self._rollover_timer:
+            self._rollover_timer.cancel()
+            self._rollover_timer = None
+        if self._watch:
+            self._watch.unsubscribe()
+            self._watch = None
+
+        with self._changed:
+            self.ready = False
+
+    def _rollover(self, attempt=0):
+        logger.info("🌙 자정 롤오버: 오늘 할일 뷰 재구독")
+        self.stop()
+        with self._changed:
+            self._replace({})
+        try:
+            self.start()
+        except Exception as e:
+            # 재구독할 때까지 /esp-titles는 Firestore 조회로 대체되므로 계속 다시 시도
+            delay = min(ROLLOVER_MAX_RETRY_DELAY, ROLLOVER_RETRY_DELAY * 2 ** attempt)
+            logger.exception("❌ 오늘 할일 뷰 재구독 실패 (%d번째), %d초 후 다시 시도: %s", attempt + 1, delay, e)
+            self._rollover_timer = threading.Timer(delay, self._rollover, args=(attempt + 1,))
+            self._rollover_timer.daemon = True
+            self._rollover_timer.start()
+
+    def _on_snapshot(self, date_str, docs):
+        """스냅샷 콜백 - 쿼리 결과 전체로 뷰를 교체"""
+        titles = {}
+        for doc in docs:
+            data = doc.to_dict()
+            title = data.get('title')
+            if title:
+                titles[doc.id] = (data.get(TODO_USER_FIELD), title)
+
+        with self._changed:
+            # 롤오버 이후 늦게 도착한 이전 날짜 스냅샷은 무시
+            if date_str != self.date_str:
+                return
+            self.ready = True
+            self._replace(titles)
+            self._changed.notify_all()
+
+    @staticmethod
+    def _make_version(date_str, pairs):
+        """날짜 + 정렬한 (문서 ID, 제목) 목록의 해시 (프로세스와 무관하게 내용만으로 결정)"""
+        payload = json.dumps([date_str, sorted(pairs)], ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+    def _replace(self, titles):
+        # self._changed를 잡은 상태에서 호출
+        if titles == self._titles and self.date_str == self._titles_date:
+            return
+
+        by_user = {}
+        for doc_id, (user_id, title) in titles.items():
+            by_user.setdefault(user_id, []).append((doc_id, title))
+
+        self._titles = titles
+        self._titles_date = self.date_str
+        self._empty_version = self._make_version(self.date_str, [])
+        self._user_versions = {
+            user_id: self._make_version(self.date_str, pairs) for user_id, pairs in by_user.items()
+        }
+        self.version = self._make_version(
+            self.date_str, [(doc_id, title) for doc_id, (_, title) in titles.items()]
+        )
+        self._changed.notify_all()
+        for listener in self._listeners:
+            listener(self.version)
+
+    def wait_ready(self, timeout):
+        """첫 스냅샷이 도착할 때까지 대기 → 준비 여부"""
+        with self._changed:
+            return self._changed.wait_for(lambda: self.ready, timeout)
+
+    def add_listener(self, callback):
+        """뷰가 바뀔 때마다 callback(버전) 호출 (리스너 스레드에서 호출되므로 빨리 반환해야 함)"""
+        with self._changed:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        with self._changed:
+            self._listeners.remove(callback)
+
+    @staticmethod
+    def _user_titles(titles, user_id):
+        return [title for user, title in titles.values() if user_id is None or user == user_id]
+
+    def _version_of(self, user_id):
+        # self._changed를 잡은 상태에서 호출
+        if user_id is None:
+            return self.version
+        return self._user_versions.get(user_id, self._empty_version)
+
+    def titles(self, user_id=None):
+        """현재 뷰의 제목 목록"""
+        with self._changed:
+            return self._user_titles(self._titles, user_id)
+
+    def snapshot(self, user_id=None):
+        """(버전, 제목 목록)을 한 번에 반환"""
+        with self._changed:
+            return self._version_of(user_id), self._user_titles(self._titles, user_id)
+
+    def wait_for_change(self, version, timeout, user_id=None):
+        """뷰 버전이 version과 달라질 때까지 대기
+
+        Returns:
+            (버전, 제목 목록). 시간 안에 바뀌지 않으면 None.
+        """
+        with self._changed:
+            changed = self._changed.wait_for(lambda: self._version_of(user_id) != version, timeout)
+            if not changed:
+                return None
+            return self._version_of(user_id), self._user_titles(self._titles, user_id)
@@ -0,0 +1,166 @@
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from functools import lru_cache
+from io import BytesIO
+
+from observability import timed
+
+logger = logging.getLogger(__name__)
+
+
+# 디스플레이 크기 프리셋 (정사각형 캐릭터 이미지 기준)
+ESP_SIZE_PRESETS = {
+    '128': (128, 128),   # 소형 TFT / OLED
+    '200': (200, 200),   # 1.54" e-ink
+    '240': (240, 240),   # ST7789 TFT
+    '400': (400, 400),   # 기존 /esp-image 크기
+}
+
+# 기기에서 바로 쓸 수 있는 포맷
+#   jpeg   : 기존과 동일한 JPEG
+#   rgb565 : 16bit RGB565 프레임버퍼 (빅엔디언, SPI 전송 순서 그대로)
+#   mono1  : 1bit 흑백 e-ink 비트맵 (Floyd-Steinberg 디더링, 1 = 흰색, MSB 우선)
+#   gray2  : 4단계 그레이 e-ink 비트맵 (디더링, 픽셀당 2bit, 0 = 검정, MSB 우선)
+ESP_VARIANT_FORMATS = ('jpeg', 'rgb565', 'mono1', 'gray2')
+
+ESP_VARIANTS = {
+    f"{fmt}_{preset}": (fmt, size)
+    for fmt in ESP_VARIANT_FORMATS
+    for preset, size in ESP_SIZE_PRESETS.items()
+}
+
+VARIANT_MIMETYPES = {
+    'jpeg': 'image/jpeg',
+    'rgb565': 'application/octet-stream',
+    'mono1': 'application/octet-stream',
+    'gray2': 'application/octet-stream',
+}
+
+# PIL은 첫 렌더링에서 로드 (콜드 스타트 단축)
+
+
+@lru_cache(maxsize=1)
+def _gray4_palette():
+    """4단계 그레이 팔레트 (인덱스 0~3)"""
+    from PIL import Image
+
+    palette = Image.new('P', (1, 1))
+    palette.putpalette([0, 0, 0, 85, 85, 85, 170, 170, 170, 255, 255, 255] + [0, 0, 0] * 252)
+    return palette
+
+
+def encode_variant(image, fmt):
+    """RGB 이미지를 지정한 기기용 포맷의 바이트로 변환"""
+    from PIL import Image, ImageChops
+
+    if fmt == 'jpeg':
+        buffer = BytesIO()
+        image.save(buffer, format='JPEG')
+        return buffer.getvalue()
+
+    if fmt == 'rgb565':
+        r, g, b = image.split()
+        # 상위 바이트: RRRRRGGG, 하위 바이트: GGGBBBBB (비트가 겹치지 않아 add로 합성 가능)
+        high = ImageChops.add(r.point(lambda v: v & 0xF8), g.point(lambda v: v >> 5))
+        low = ImageChops.add(g.point(lambda v: (v << 3) & 0xE0), b.point(lambda v: v >> 3))
+        return Image.merge('LA', (high, low)).tobytes()
+
+    if fmt == 'mono1':
+        return image.convert('L').convert('1').tobytes()
+
+    if fmt == 'gray2':
+        quantized = image.quantize(palette=_gray4_palette(), dither=Image.Dither.FLOYDSTEINBERG)
+        return quantized.tobytes('raw', 'P;2')
+
+    raise ValueError(f"지원하지 않는 포맷: {fmt}")
+
+
+def render_variant(image, variant):
+    """원본 이미지에서 variant 하나를 렌더링"""
+    fmt, size = ESP_VARIANTS[variant]
+    return encode_variant(image.resize(size), fmt)
+
+
+def decode_source(image_bytes):
+    """원본 이미지 바이트를 RGB 이미지로 디코딩"""
+    from PIL import Image
+
+    image = Image.open(BytesIO(image_bytes))
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    return image
+
+
+class EspVariantStore:
+    """캐릭터 이미지의 기기별 variant를 미리 렌더링해 디스크에 보관
+
+    원본 키(렌더 캐시 키)마다 디렉토리 하나를 만들고 모든 variant를 한 번에 렌더링합니다.
+    요청 시에는 파일을 그대로 전송하므로 요청마다 렌더링이나 복사가 발생하지 않습니다.
+    """
+
+    def __init__(self, root_dir='static/esp_variants', max_sources=8):
+        self.root_dir = root_dir
+        self.max_sources = max_sources
+        self._lock = threading.Lock()
+
+        os.makedirs(self.root_dir, exist_ok=True)
+
+    def variant_path(self, key, variant):
+        return os.path.join(self.root_dir, key, f"{variant}.bin")
+
+    def is_rendered(self, key):
+        return os.path.isdir(os.path.join(self.root_dir, key))
+
+    def ensure(self, key, load_source):
+        """key에 대한 모든 variant가 준비되도록 보장
+
+        load_source는 원본 이미지 바이트를 돌려주는 함수이며, 아직 렌더링되지 않은
+        경우에만 호출됩니다. 동시에 여러 요청이 와도 렌더링은 한 번만 수행됩니다.
+        """
+        if self.is_rendered(key):
+            return
+
+        with self._lock:
+            if self.is_rendered(key):
+                return
+
+            logger.info("🖼️ ESP variant 렌더링 시작: %s", key)
+            with timed('decode'):
+                image = decode_source(load_source())
+
+            # 임시 디렉토리에 모두 쓴 뒤 이름을 바꿔서 일부만 렌더링된 상태가 보이지 않도록 함
+            # (잠금은 프로세스 안에서만 유효하므로 gunicorn 워커마다 다른 임시 디렉토리를 사용)
+            tmp_dir = tempfile.mkdtemp(prefix=f".{key}.", suffix='.tmp', dir=self.root_dir)
+            try:
+                with timed('resize'):
+                    for variant in ESP_VARIANTS:
+                        with open(os.path.join(tmp_dir, f"{variant}.bin"), 'wb') as f:
+                            f.write(render_variant(image, variant))
+
+                try:
+                    os.replace(tmp_dir, os.path.join(self.root_dir, key))
+                except OSError:
+                    # 다른 워커가 같은 key를 먼저 끝냄 - 내용이 같으므로 그쪽 결과를 사용
+                    if not self.is_rendered(key):
+                        raise
+                    logger.info("♻️ ESP variant는 다른 워커가 이미 렌더링함: %s", key)
+                    return
+            finally:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+            logger.info("✅ ESP variant %d개 렌더링 완료: %s", len(ESP_VARIANTS), key)
+
+            self._prune()
+
+    def _prune(self):
+        """오래된 원본의 variant 디렉토리 정리"""
+        entries = [
+            os.path.join(self.root_dir, name)
+            for name in os.listdir(self.root_dir)
+            if not name.startswith('.')
+        ]
+        entries.sort(key=os.path.getmtime, reverse=True)
+        for path in entries[self.max_sources:]:
+            shutil.rmtree(path, ignore_errors=True)
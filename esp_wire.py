@@ -0,0 +1,139 @@
+"""
+ESP32로 보내는 할일 변경 메시지 형식 (esp_delivery.py / flask_firestore_listener.py)
+
+기기마다 format을 고릅니다.
+- json       : 기존 형식 - 변경마다 할일 문서 전체 ({action, id, data, seq, timestamp})
+- json-delta : 기기가 마지막으로 확인한 상태와 달라진 필드만 ({action: 'patch', id, seq, set, unset, append})
+- msgpack    : json-delta와 같은 내용을 MessagePack으로, 필드 이름은 FIELD_IDS의 번호로 보냄
+               (ESP32에서는 ArduinoJson의 deserializeMsgPack으로 그대로 읽을 수 있음)
+
+patch의 append는 배열 필드(pause_times 등)에 항목이 뒤에 추가되기만 한 경우로, 추가된 항목만 보냅니다.
+"""
+
+import json
+
+WIRE_FORMATS = ('json', 'json-delta', 'msgpack')
+DELTA_FORMATS = ('json-delta', 'msgpack')
+
+# 필드 이름 → 번호 (펌웨어와 공유하므로 번호를 바꾸거나 재사용하지 말 것, 새 필드는 뒤에 추가)
+# 목록에 없는 필드는 이름(문자열)을 그대로 키로 사용합니다.
+FIELD_IDS = {
+    'title': 1,
+    'is_completed': 2,
+    'due_date_string': 3,
+    'userId': 4,
+    'priority': 5,
+    'category': 6,
+    'order': 7,
+    'start_time': 8,
+    'stop_time': 9,
+    'pause_times': 10,
+    'resume_times': 11,
+    'due_date': 12,
+    'createdAt': 13,
+    'updatedAt': 14,
+    'description': 15,
+}
+FIELD_NAMES = {number: name for name, number in FIELD_IDS.items()}
+
+# msgpack 메시지의 키 / 동작 번호
+KEY_ACTION, KEY_ID, KEY_SEQ, KEY_DATA, KEY_UNSET, KEY_APPEND = range(6)
+ACTION_IDS = {'create': 0, 'update': 1, 'patch': 2, 'delete': 3}
+ACTION_NAMES = {number: name for name, number in ACTION_IDS.items()}
+
+
+def compute_delta(base, new):
+    """base → new로 바뀐 필드 → (set, unset, append)
+
+    배열 필드가 base 배열 뒤에 항목이 추가된 것뿐이면 append에 추가된 항목만 넣습니다.
+    """
+    set_fields, append = {}, {}
+    for field, value in new.items():
+        if field not in base:
+            set_fields[field] = value
+            continue
+        old = base[field]
+        if old == value:
+            continue
+        if isinstance(old, list) and isinstance(value, list) and old and value[:len(old)] == old:
+            append[field] = value[len(old):]
+        else:
+            set_fields[field] = value
+    unset = [field for field in base if field not in new]
+    return set_fields, unset, append
+
+
+def apply_delta(base, change):
+    """patch 변경을 base에 적용한 새 상태 (기기 쪽 동작, 테스트 / 벤치마크용)"""
+    state = dict(base)
+    state.update(change.get('set', {}))
+    for field in change.get('unset', []):
+        state.pop(field, None)
+    for field, items in change.get('append', {}).items():
+        state[field] = list(state.get(field, [])) + list(items)
+    return state
+
+
+def encode_json(changes):
+    """변경 목록 → JSON 바이트 (한 건이면 그 변경, 여러 건이면 {'action': 'batch', 'changes': [...]})"""
+    if len(changes) == 1:
+        payload = changes[0]
+    else:
+        payload = {'action': 'batch', 'changes': changes}
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _compact_fields(fields):
+    return {FIELD_IDS.get(name, name): value for name, value in fields.items()}
+
+
+def _expand_fields(fields):
+    return {FIELD_NAMES.get(key, key): value for key, value in fields.items()}
+
+
+def encode_msgpack(changes):
+    """변경 목록 → MessagePack 바이트 (항상 배열, 키와 필드 이름은 번호로)"""
+    import msgpack
+
+    messages = []
+    for change in changes:
+        message = {KEY_ACTION: ACTION_IDS[change['action']], KEY_ID: change['id']}
+        if 'seq' in change:
+            message[KEY_SEQ] = change['seq']
+        if change['action'] == 'patch':
+            if change.get('set'):
+                message[KEY_DATA] = _compact_fields(change['set'])
+            if change.get('unset'):
+                message[KEY_UNSET] = [FIELD_IDS.get(name, name) for name in change['unset']]
+            if change.get('append'):
+                message[KEY_APPEND] = _compact_fields(change['append'])
+        elif change['action'] != 'delete':
+            message[KEY_DATA] = _compact_fields(change.get('data') or {})
+        messages.append(message)
+    return msgpack.packb(messages, use_bin_type=True)
+
+
+def decode_msgpack(payload):
+    """encode_msgpack의 역변환 (기기 쪽 동작, 테스트 / 벤치마크용)"""
+    import msgpack
+
+    changes = []
+    for message in msgpack.unpackb(payload, strict_map_key=False):
+        change = {'action': ACTION_NAMES[message[KEY_ACTION]], 'id': message[KEY_ID]}
+        if KEY_SEQ in message:
+            change['seq'] = message[KEY_SEQ]
+        if change['action'] == 'patch':
+            change['set'] = _expand_fields(message.get(KEY_DATA, {}))
+            change['unset'] = [FIELD_NAMES.get(key, key) for key in message.get(KEY_UNSET, [])]
+            change['append'] = _expand_fields(message.get(KEY_APPEND, {}))
+        elif change['action'] != 'delete':
+            change['data'] = _expand_fields(message.get(KEY_DATA, {}))
+        changes.append(change)
+    return changes
+
+
+def encode(changes, wire_format):
+    """기기 format에 맞는 (본문 바이트, Content-Type)"""
+    if wire_format == 'msgpack':
+        return encode_msgpack(changes), 'application/msgpack'
+    return encode_json(changes), 'application/json'
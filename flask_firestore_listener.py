@@ -1,88 +1,341 @@
-from flask import Flask, jsonify
+from flask import Flask, jsonify, request
 import firebase_admin
 from firebase_admin import credentials, firestore
+import hmac
+import os
 import threading
 import time
 import requests
 import json
+import logging
+import atexit
+
+from change_journal import ChangeJournal
+from esp_broker import EspBroker
+from esp_delivery import ALL_SCOPE, DeliveryError, DeviceOutbox, OutboxDispatcher
+from esp_wire import WIRE_FORMATS, encode
+from listener_scopes import ScopeManager, TodoScope
+from observability import REGISTRY, instrument_flask, setup_logging, timed
+from tenants import TODO_USER_FIELD
+
+# 로그는 백그라운드 대기열로 출력 (LOG_LEVEL=DEBUG이면 변경 건별 로그 포함)
+setup_logging()
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
+# 요청 처리 시간 히스토그램 + /metrics
+instrument_flask(app)
 
 # Firebase 초기화 (서비스 계정 키 필요)
 cred = credentials.Certificate('path/to/your/serviceAccountKey.json')
 firebase_admin.initialize_app(cred)
 db = firestore.client()
 
-# ESP32 엔드포인트 설정
-ESP32_ENDPOINT = "http://your-esp32-ip/api/todos"
+# ESP32 엔드포인트 설정 (ESP32_ENDPOINT=''이면 기본 기기를 등록하지 않음)
+ESP32_ENDPOINT = os.environ.get('ESP32_ENDPOINT', "http://your-esp32-ip/api/todos")
+
+# 기기별 아웃박스 (재시작 후에도 전달되지 않은 변경을 다시 보냄)
+ESP32_OUTBOX_DB = os.environ.get('ESP32_OUTBOX_DB', 'esp32_outbox.db')
+ESP32_DELIVERY_WORKERS = int(os.environ.get('ESP32_DELIVERY_WORKERS', '32'))
+ESP32_MAX_INFLIGHT = int(os.environ.get('ESP32_MAX_INFLIGHT', '1'))
+ESP32_BATCH_SIZE = int(os.environ.get('ESP32_BATCH_SIZE', '20'))
+ESP32_MAX_BACKOFF = float(os.environ.get('ESP32_MAX_BACKOFF', '30'))
+# 재시작 후 초기 동기화를 한 요청에 담을 최대 변경 수
+ESP32_SYNC_BATCH_SIZE = int(os.environ.get('ESP32_SYNC_BATCH_SIZE', '1000'))
+
+def _scope_setting(name, default, parse):
+    value = os.environ.get(name, default).strip().lower()
+    return parse(value) if value not in ('', 'all', 'none') else None
+
+# 기기가 scope를 따로 정하지 않았을 때의 리스너 범위 (''이면 조건 없음)
+# 기본값은 ESP32 화면과 같은 '오늘 마감인 미완료 할일' - 둘 다 ''이면 예전처럼 컬렉션 전체
+ESP32_SCOPE_DEFAULTS = {
+    'days': _scope_setting('ESP32_SCOPE_DAYS', '1', int),
+    'is_completed': _scope_setting('ESP32_SCOPE_COMPLETED', 'false', lambda v: v == 'true'),
+}
+
+# 상시 연결 브로커 (esp_broker.py, 기본 꺼짐 - ESP32_BROKER_PORT를 정하면 켬): 연결된 기기는 HTTP 대신 브로커로 전송
+# 기기는 HELLO에 등록 정보의 broker_token을 보내야 하고 (없는 기기는 연결 불가), endpoint가 'broker'인 기기는 브로커로만 받음
+ESP32_BROKER_HOST = os.environ.get('ESP32_BROKER_HOST', '0.0.0.0')
+ESP32_BROKER_PORT = os.environ.get('ESP32_BROKER_PORT', '')
+ESP32_HEARTBEAT = float(os.environ.get('ESP32_HEARTBEAT', '15'))
+# PUT / DELETE /devices/<기기 ID>에 필요한 관리자 비밀값 (X-Admin-Token 헤더, 없으면 두 API 모두 꺼짐)
+ESP32_ADMIN_TOKEN = os.environ.get('ESP32_ADMIN_TOKEN', '')
+BROKER_ENDPOINT = 'broker'
+
+# 기기들로의 연결 재사용 (기기 수만큼 연결 풀 유지)
+esp32_session = requests.Session()
+esp32_session.mount('http://', requests.adapters.HTTPAdapter(pool_connections=256, pool_maxsize=ESP32_DELIVERY_WORKERS))
+
+def send_batch_to_esp32(device, changes):
+    """변경 목록을 기기 하나에 한 번의 요청으로 전송
+
+    기기의 format(json / json-delta / msgpack, esp_wire.py)으로 인코딩합니다. JSON은 한 건이면
+    그 변경 그대로, 여러 건이면 {'action': 'batch', 'changes': [...]}로 보냅니다.
+    기기가 브로커에 연결되어 있으면 device/<기기 ID> 토픽으로, 아니면 endpoint로 POST합니다.
+    200 응답(브로커는 ACK)은 전부 확인으로 보고, 본문에 {"ack": <seq>}가 있으면 그 seq까지만 확인한 것으로 처리합니다.
+
+    Raises:
+        DeliveryError: 응답이 200이 아닐 때 (408 / 429 / 5xx가 아닌 4xx는 재시도 안 함),
+            브로커 전용 기기가 연결되어 있지 않거나 ACK가 없을 때
+    """
+    body, content_type = encode(changes, device['format'])
+
+    if esp32_broker is not None and esp32_broker.connected(device['id']):
+        with timed('esp32_send_broker'):
+            ack = esp32_broker.publish(f"device/{device['id']}", body, content_type, timeout=5).get('ack')
+        return ack if isinstance(ack, int) else None
+    if device['endpoint'] == BROKER_ENDPOINT:
+        raise DeliveryError(f"ESP32({device['id']})가 브로커에 연결되어 있지 않음")
+
+    with timed('esp32_send'):
+        response = esp32_session.post(
+            device['endpoint'], data=body, headers={'Content-Type': content_type}, timeout=5
+        )
+
+    if response.status_code != 200:
+        status = response.status_code
+        retry = status >= 500 or status in (408, 429) or status < 400
+        raise DeliveryError(f"ESP32 응답 {status}", retry=retry)
+
+    try:
+        ack = response.json().get('ack')
+    except ValueError:
+        return None
+    return ack if isinstance(ack, int) else None
+
+# 변경 저널: 딥슬립에서 깨어난 기기가 GET /changes?since=<seq>로 놓친 변경을 한 번에 받아 감
+# 최근 ESP32_JOURNAL_SIZE개는 메모리, 밀려난 항목은 ESP32_JOURNAL_FILE(''이면 버림, 최대 ESP32_JOURNAL_MAX_MB)
+ESP32_JOURNAL_SIZE = int(os.environ.get('ESP32_JOURNAL_SIZE', '10000'))
+ESP32_JOURNAL_FILE = os.environ.get('ESP32_JOURNAL_FILE', 'esp32_journal.jsonl')
+ESP32_JOURNAL_MAX_MB = float(os.environ.get('ESP32_JOURNAL_MAX_MB', '16'))
+CHANGES_MAX_LIMIT = 1000
+
+change_journal = ChangeJournal(
+    ESP32_JOURNAL_SIZE, ESP32_JOURNAL_FILE or None, int(ESP32_JOURNAL_MAX_MB * 1024 * 1024)
+)
+atexit.register(change_journal.close)
+
+# 기기 목록: devices 컬렉션에서 endpoint가 있는 문서 (user_id, max_inflight, format, scope 선택) + 기본 기기
+esp32_outbox = DeviceOutbox(ESP32_OUTBOX_DB)
+if ESP32_ENDPOINT:
+    esp32_outbox.register_device('default', ESP32_ENDPOINT)
+
+esp32_broker = EspBroker(
+    ESP32_BROKER_HOST, int(ESP32_BROKER_PORT), ESP32_HEARTBEAT, authenticate=esp32_outbox.check_token
+) if ESP32_BROKER_PORT else None
+
+def device_scope(device):
+    """기기 → 리스너 범위 (기기의 user_id + scope 설정, 설정에 없는 조건은 ESP32_SCOPE_* 기본값)"""
+    return TodoScope.from_config(device['user_id'], device['scope'], ESP32_SCOPE_DEFAULTS)
 
 class FirestoreListener:
-    def __init__(self):
-        self.last_todos = {}
-        self.listener = None
+    def __init__(self, dispatcher=None, journal=None):
+        self.device_listener = None
+        self.journal = journal or change_journal
+        self.devices_loaded = threading.Event()
+        self.last_sync = {}
+        # 변경사항은 아웃박스에 기록하고 바로 반환 - 느리거나 꺼진 ESP32가 리스너 스레드를 막지 않음
+        self.dispatcher = dispatcher or OutboxDispatcher(
+            esp32_outbox,
+            send_batch_to_esp32,
+            workers=ESP32_DELIVERY_WORKERS,
+            batch_size=ESP32_BATCH_SIZE,
+            max_inflight=ESP32_MAX_INFLIGHT,
+            max_backoff=ESP32_MAX_BACKOFF,
+            bulk_batch_size=ESP32_SYNC_BATCH_SIZE,
+        )
+        # 기기 범위별 todos 쿼리 리스너 (같은 범위의 기기끼리 공유, 자정에 날짜 범위 갱신)
+        self.scopes = ScopeManager(db, self.on_snapshot, self.on_join)
+        # 기기가 브로커에 (다시) 연결되면 재시도 대기 없이 밀린 변경부터 전송
+        if esp32_broker is not None:
+            esp32_broker.on_connect = self.dispatcher.wake
+        
+    @property
+    def listening(self):
+        return self.scopes.active
         
     def start_listening(self):
         """Firestore 변경사항 실시간 감지 시작"""
-        print("🔄 Firestore 실시간 감지 시작...")
+        logger.info("🔄 Firestore 실시간 감지 시작...")
+        if esp32_broker is not None:
+            esp32_broker.start()
         
-        # todos 컬렉션의 변경사항 감지
-        todos_ref = db.collection('todos')
-        self.listener = todos_ref.on_snapshot(self.on_snapshot)
+        # 기기 목록을 먼저 받아 두어야 기기별 범위 리스너를 한 번에 열 수 있음
+        self.devices_loaded.clear()
+        self.device_listener = db.collection('devices').on_snapshot(self.on_devices_snapshot)
+        if not self.devices_loaded.wait(10):
+            logger.warning("⚠️ 기기 목록을 10초 안에 받지 못함 - 등록된 기기로 먼저 시작")
         
-    def on_snapshot(self, col_snapshot, changes, read_time):
-        """Firestore 변경사항 콜백"""
-        print(f"📊 Firestore 변경 감지: {len(changes)}개 변경사항")
+        # 범위 리스너의 첫 스냅샷은 저장된 범위별 스냅샷과 비교해 달라진 것만 전송
+        self.refresh_scopes(start=True)
         
+    def refresh_scopes(self, start=False):
+        """등록된 기기들의 범위대로 리스너 열기 / 닫기 (감지 중일 때만)"""
+        if not (start or self.listening):
+            return
+        outbox = self.dispatcher.outbox
+        self.scopes.update({device['id']: device_scope(device) for device in outbox.devices()})
+        removed = outbox.prune_scopes(self.scopes.keys())
+        if removed:
+            logger.info("🧹 쓰지 않는 범위 스냅샷 삭제: %s", ', '.join(removed))
+        
+    def on_devices_snapshot(self, col_snapshot, changes, read_time):
+        """devices 컬렉션 변경 → 기기 등록 / 삭제"""
+        outbox = self.dispatcher.outbox
         for change in changes:
             doc = change.document
-            todo_data = doc.to_dict()
+            data = doc.to_dict() or {}
+            if change.type.name == 'REMOVED' or not data.get('endpoint'):
+                if outbox.remove_device(doc.id):
+                    logger.info("🗑️ ESP32 기기 삭제: %s", doc.id)
+                continue
+            wire_format = data.get('format') if data.get('format') in WIRE_FORMATS else None
+            scope = data.get('scope') if isinstance(data.get('scope'), dict) else None
+            try:
+                TodoScope.from_config(data.get('user_id'), scope, ESP32_SCOPE_DEFAULTS)
+            except ValueError as e:
+                logger.warning("⚠️ ESP32 기기 %s의 scope 무시: %s", doc.id, e)
+                scope = None
+            outbox.register_device(
+                doc.id, data['endpoint'], data.get('user_id'), data.get('max_inflight'), wire_format, scope,
+                data.get('broker_token') if isinstance(data.get('broker_token'), str) else None,
+            )
+            logger.info("📟 ESP32 기기 등록: %s → %s", doc.id, data['endpoint'])
+        self.dispatcher.reload_devices()
+        self.refresh_scopes()
+        self.devices_loaded.set()
+        
+    def on_snapshot(self, key, device_ids, docs, changes, read_time, initial):
+        """범위 리스너 콜백 → 그 범위의 기기들에게 전송"""
+        if initial:
+            # 구독 직후에는 모든 문서가 ADDED로 들어오므로 변경 목록 대신 전체 스냅샷으로 비교
+            self.initial_sync(key, device_ids, docs, read_time)
+            return
+        
+        logger.info("📊 Firestore 변경 감지 (%s): %d개 변경사항", key, len(changes))
+        
+        outgoing = []
+        for change in changes:
+            doc = change.document
+            todo_data = doc.to_dict() or {}
             todo_id = doc.id
+            owner = todo_data.get(TODO_USER_FIELD)
             
             if change.type.name == 'ADDED':
-                print(f"➕ 할일 추가: {todo_data.get('title', '')}")
-                self.send_to_esp32('create', todo_id, todo_data)
+                logger.debug("➕ 할일 추가: %s", todo_data.get('title', ''))
+                outgoing.append(('create', todo_id, todo_data, owner))
                 
             elif change.type.name == 'MODIFIED':
-                print(f"🔄 할일 수정: {todo_data.get('title', '')}")
-                self.send_to_esp32('update', todo_id, todo_data)
+                logger.debug("🔄 할일 수정: %s", todo_data.get('title', ''))
+                outgoing.append(('update', todo_id, todo_data, owner))
                 
             elif change.type.name == 'REMOVED':
-                print(f"🗑️ 할일 삭제: {todo_id}")
-                self.send_to_esp32('delete', todo_id, {})
+                # 문서 삭제 또는 범위를 벗어남 (완료 처리 등) - 기기에서는 둘 다 삭제
+                logger.debug("🗑️ 할일 삭제: %s", todo_id)
+                outgoing.append(('delete', todo_id, {}, owner))
+        
+        self.send_to_esp32(outgoing, read_time, key, device_ids)
     
-    def send_to_esp32(self, action, todo_id, todo_data):
-        """ESP32에 데이터 전송"""
-        try:
-            payload = {
-                'action': action,
-                'id': todo_id,
-                'data': todo_data,
-                'timestamp': time.time()
-            }
-            
-            response = requests.post(
-                ESP32_ENDPOINT,
-                json=payload,
-                timeout=5
-            )
-            
-            if response.status_code == 200:
-                print(f"✅ ESP32 전송 성공: {action} - {todo_data.get('title', todo_id)}")
-            else:
-                print(f"❌ ESP32 전송 실패: {response.status_code}")
-                
-        except Exception as e:
-            print(f"❌ ESP32 전송 오류: {e}")
+    def initial_sync(self, key, device_ids, docs, read_time):
+        """범위 리스너를 (다시) 연 뒤 첫 스냅샷 → 저장된 범위 스냅샷(내용 해시)과 달라진 할일만 전송
+        
+        리스너가 꺼져 있는 동안 추가 / 수정된 할일은 create / update, 사라졌거나 범위를 벗어난 할일
+        (자정 롤오버 포함)은 delete로 보냅니다. Firestore Python 클라이언트는 read_time부터 리스너를
+        이어 받을 수 없으므로 초기 스냅샷 자체는 다시 받지만, 기기로는 실제 차이만 나갑니다.
+        이 범위의 전체 문서를 아직 받지 않은 기기(새 기기, 범위가 바뀐 기기)에는 전체 문서를 보냅니다.
+        """
+        start = time.perf_counter()
+        outbox = self.dispatcher.outbox
+        previous = outbox.snapshot_info(key)
+        synced_scopes = {device['id']: device['synced_scope'] for device in outbox.devices()}
+        synced = [d for d in device_ids if synced_scopes.get(d) == key]
+        joining = [d for d in device_ids if d in synced_scopes and synced_scopes[d] != key]
+        
+        outgoing = []
+        for doc in docs:
+            todo_data = doc.to_dict() or {}
+            outgoing.append(('create', doc.id, todo_data, todo_data.get(TODO_USER_FIELD)))
+        present = {doc.id for doc in docs}
+        for todo_id, owner in outbox.missing_todos(present, key):
+            outgoing.append(('delete', todo_id, {}, owner))
+        
+        # 범위 해시는 기기가 없어도 갱신 (다음 diff의 기준)
+        recorded = self.dispatcher.submit(outgoing, read_time=read_time, bulk=True, scope=key, devices=synced)
+        self.journal.append(recorded, key)
+        changed = len(recorded)
+        if joining:
+            self.on_join(key, joining, {doc.id: doc.to_dict() or {} for doc in docs})
+        self.last_sync[key] = {
+            'documents': len(present),
+            'changed': changed,
+            'joined': len(joining),
+            'previous_read_time': previous['read_time'],
+            'read_time': read_time.isoformat() if read_time else None,
+            'ms': round((time.perf_counter() - start) * 1000, 1),
+        }
+        logger.info("🔁 초기 동기화 (%s): 문서 %d개 중 %d개 변경, 새로 합류한 기기 %d대 (이전 read_time %s)",
+                    key, len(present), changed, len(joining), previous['read_time'])
+    
+    def on_join(self, key, device_ids, docs):
+        """범위에 새로 들어온 기기 → 범위의 전체 문서 + 이전 범위에만 있던 할일 삭제"""
+        outbox = self.dispatcher.outbox
+        previous_scopes = {}
+        for device in outbox.devices():
+            if device['id'] in device_ids:
+                previous_scopes.setdefault(device['synced_scope'], []).append(device['id'])
+        
+        upserts = [('create', todo_id, data, data.get(TODO_USER_FIELD)) for todo_id, data in docs.items()]
+        for previous, members in previous_scopes.items():
+            deletes = []
+            if previous is not None:
+                deletes = [('delete', todo_id, {}, owner) for todo_id, owner in outbox.missing_todos(set(docs), previous)]
+            self.dispatcher.submit(upserts + deletes, bulk=True, scope=None, devices=members)
+        outbox.set_synced_scope(device_ids, key)
+        
+        removed = outbox.prune_scopes(self.scopes.keys())
+        if removed:
+            logger.info("🧹 쓰지 않는 범위 스냅샷 삭제: %s", ', '.join(removed))
+    
+    def send_to_esp32(self, changes, read_time=None, scope=ALL_SCOPE, device_ids=None):
+        """변경을 받을 기기들의 아웃박스에 한 트랜잭션으로 기록 (같은 할일의 미전송 변경은 마지막 상태로 합쳐짐)
+
+        실제로 기록된 변경은 변경 저널에도 남겨 GET /changes로 받아 갈 수 있게 합니다.
+        """
+        if changes:
+            recorded = self.dispatcher.submit(changes, read_time=read_time, scope=scope, devices=device_ids)
+            self.journal.append(recorded, scope)
     
     def stop_listening(self):
         """감지 중지"""
-        if self.listener:
-            self.listener.unsubscribe()
-            print("🛑 Firestore 감지 중지")
+        if self.listening:
+            self.scopes.stop()
+            logger.info("🛑 Firestore 감지 중지")
+        if self.device_listener:
+            self.device_listener.unsubscribe()
+            self.device_listener = None
 
 # 전역 리스너 인스턴스
 firestore_listener = FirestoreListener()
 
+def _delivery_collector():
+    devices = firestore_listener.dispatcher.stats()['devices']
+    def per_device(field):
+        return [({'device': device_id}, stats[field]) for device_id, stats in devices.items()]
+    return [
+        ('esp32_delivery_pending', 'gauge', '기기별 미전달 변경 수', per_device('pending')),
+        ('esp32_delivery_sent', 'counter', '기기별 전달된 변경 수 (프로세스 시작 이후)', per_device('sent')),
+        ('esp32_delivery_errors', 'counter', '기기별 전송 실패 요청 수 (프로세스 시작 이후)', per_device('errors')),
+        ('esp32_delivery_acked_seq', 'gauge', '기기별 확인된 마지막 seq', per_device('acked_seq')),
+        ('esp32_broker_connections', 'gauge', '브로커에 연결된 기기 수',
+         [({}, len(esp32_broker.stats()['devices']) if esp32_broker is not None else 0)]),
+        ('esp32_journal_head', 'gauge', '변경 저널의 마지막 seq', [({}, change_journal.head)]),
+        ('esp32_scope_documents', 'gauge', '범위 리스너별 구독 중인 할일 수',
+         [({'scope': key}, stats['documents']) for key, stats in firestore_listener.scopes.stats().items()]),
+    ]
+
+REGISTRY.register_collector(_delivery_collector)
+
 @app.route('/start-listening', methods=['POST'])
 def start_listening():
     """Firestore 감지 시작"""
@@ -100,10 +353,144 @@ def get_status():
     """서버 상태 확인"""
     return jsonify({
         'status': 'running',
-        'listening': firestore_listener.listener is not None,
+        'listening': firestore_listener.listening,
+        'delivery': firestore_listener.dispatcher.stats(),
+        'scopes': firestore_listener.scopes.stats(),
+        'journal': change_journal.stats(),
+        'broker': esp32_broker.stats() if esp32_broker is not None else None,
+        'snapshot': {
+            key: {**esp32_outbox.snapshot_info(key), 'last_sync': firestore_listener.last_sync.get(key)}
+            for key in firestore_listener.scopes.keys()
+        },
         'timestamp': time.time()
     })
 
+@app.route('/changes', methods=['GET'])
+def get_changes():
+    """since 이후의 할일 변경 (딥슬립에서 깨어난 기기가 놓친 변경을 한 번에 받아 감)
+
+    ?since=<마지막으로 받은 seq, 처음이면 0>&limit=<할일 수, 기본 100>
+    ?device=<기기 ID> 또는 X-Device-Id 헤더: 그 기기 범위의 변경만 (없으면 전체 범위)
+
+    응답: {"changes": [{"action", "id", "data", "seq"}], "next": <다음 since>, "head", "more"}
+    - 같은 할일의 여러 변경은 마지막 상태 하나로 합침
+    - since가 저널에서 이미 밀려났으면 {"resync": true, "changes": [범위의 할일 전체 (create)], "next"}
+      → 기기는 가지고 있던 할일을 지우고 changes로 다시 채움
+    """
+    since = request.args.get('since', 0, type=int)
+    limit = max(1, min(request.args.get('limit', 100, type=int), CHANGES_MAX_LIMIT))
+    device_id = request.args.get('device') or request.headers.get('X-Device-Id')
+
+    scopes = None
+    if device_id:
+        device = next((d for d in esp32_outbox.devices() if d['id'] == device_id), None)
+        if device is None:
+            return jsonify({'error': '등록되지 않은 기기입니다'}), 404
+        scopes = [device_scope(device).key]
+
+    result = change_journal.read(since, limit, scopes)
+    if result is not None:
+        return jsonify(result)
+
+    # 다시 받기: 저널 head를 먼저 읽고 문서를 읽어야 그 사이 변경이 빠지지 않음 (중복은 기기에서 덮어씀)
+    head = change_journal.head
+    docs = firestore_listener.scopes.documents(scopes)
+    if docs is None:
+        return jsonify({'error': '리스너가 아직 준비되지 않았습니다', 'resync': True}), 503
+    changes = [{'action': 'create', 'id': todo_id, 'data': data} for todo_id, data in docs.items()]
+    logger.info("🔄 변경 저널 다시 받기: since %d → 할일 %d개 (head %d)", since, len(changes), head)
+    return jsonify({'resync': True, 'changes': changes, 'next': head, 'head': head, 'more': False})
+
+@app.route('/devices', methods=['GET'])
+def list_devices():
+    """등록된 ESP32 기기별 전송 상태 (미전달 변경 수, 커서, 재시도 대기)"""
+    return jsonify(firestore_listener.dispatcher.stats())
+
+def _admin_error():
+    """기기 관리 API의 관리자 확인 → 거절 응답 또는 None"""
+    if not ESP32_ADMIN_TOKEN:
+        return jsonify({'error': '기기 관리 API가 꺼져 있습니다 (ESP32_ADMIN_TOKEN)'}), 403
+    token = request.headers.get('X-Admin-Token', '')
+    if not hmac.compare_digest(token.encode(), ESP32_ADMIN_TOKEN.encode()):
+        return jsonify({'error': '관리자 토큰(X-Admin-Token)이 올바르지 않습니다'}), 401
+    return None
+
+@app.route('/devices/<device_id>', methods=['PUT'])
+def register_device(device_id):
+    """ESP32 기기 등록 / 변경 (devices 컬렉션 없이 직접 등록할 때, X-Admin-Token 필요)
+
+    본문: {"endpoint": "http://<기기 IP>/api/todos" | "broker", "user_id": <선택>, "max_inflight": <선택>,
+           "format": "json" | "json-delta" | "msgpack" (선택, 기본 json),
+           "scope": {"days": <정수 | null>, "is_completed": <true | false | null>} (선택, 없는 키는 기본 범위),
+           "broker_token": <브로커 HELLO에 쓸 기기 비밀값, 브로커로 연결하는 기기는 필수>,
+           "current_broker_token": <이미 비밀값이 있는 기기의 broker_token을 바꾸거나 지울 때 현재 비밀값>}
+    """
+    error = _admin_error()
+    if error is not None:
+        return error
+
+    data = request.get_json(silent=True) or {}
+    endpoint = data.get('endpoint')
+    is_url = isinstance(endpoint, str) and endpoint.startswith(('http://', 'https://'))
+    if not is_url and endpoint != BROKER_ENDPOINT:
+        return jsonify({'error': "endpoint(http:// 또는 https:// URL, 브로커로만 받으면 'broker')가 필요합니다"}), 400
+    max_inflight = data.get('max_inflight')
+    if max_inflight is not None and (not isinstance(max_inflight, int) or max_inflight < 1):
+        return jsonify({'error': 'max_inflight는 1 이상의 정수여야 합니다'}), 400
+    wire_format = data.get('format', 'json')
+    if wire_format not in WIRE_FORMATS:
+        return jsonify({'error': f"format은 {', '.join(WIRE_FORMATS)} 중 하나여야 합니다"}), 400
+    scope = data.get('scope')
+    if scope is not None and not isinstance(scope, dict):
+        return jsonify({'error': 'scope는 객체여야 합니다'}), 400
+    broker_token = data.get('broker_token')
+    if broker_token is not None and (not isinstance(broker_token, str) or len(broker_token) < 16):
+        return jsonify({'error': 'broker_token은 16자 이상의 문자열이어야 합니다'}), 400
+    if endpoint == BROKER_ENDPOINT and broker_token is None:
+        return jsonify({'error': "endpoint가 'broker'인 기기는 broker_token이 필요합니다"}), 400
+    try:
+        TodoScope.from_config(data.get('user_id'), scope, ESP32_SCOPE_DEFAULTS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    # 기존 비밀값을 모르는 쪽이 기기를 가로채지 못하도록 바꾸거나 지울 때는 현재 비밀값 확인
+    if (esp32_outbox.has_token(device_id) and not esp32_outbox.check_token(device_id, broker_token)
+            and not esp32_outbox.check_token(device_id, data.get('current_broker_token'))):
+        return jsonify({'error': 'broker_token을 바꾸려면 current_broker_token(현재 비밀값)이 필요합니다'}), 403
+
+    esp32_outbox.register_device(
+        device_id, endpoint, data.get('user_id'), max_inflight, wire_format, scope, broker_token
+    )
+    firestore_listener.dispatcher.reload_devices()
+    firestore_listener.refresh_scopes()
+    return jsonify({'success': True, 'id': device_id})
+
+@app.route('/devices/<device_id>', methods=['DELETE'])
+def remove_device(device_id):
+    """ESP32 기기 삭제 (미전달 변경도 함께 삭제, X-Admin-Token 필요)"""
+    error = _admin_error()
+    if error is not None:
+        return error
+    if not esp32_outbox.remove_device(device_id):
+        return jsonify({'error': '등록되지 않은 기기입니다'}), 404
+    firestore_listener.dispatcher.reload_devices()
+    firestore_listener.refresh_scopes()
+    return jsonify({'success': True, 'id': device_id})
+
+@app.route('/groups/<group>/publish', methods=['POST'])
+def publish_to_group(group):
+    """브로커의 group/<그룹> 토픽을 구독 중인 기기 전체에 JSON 본문을 방송 (확인 없음)"""
+    if esp32_broker is None:
+        return jsonify({'error': '브로커가 꺼져 있습니다 (ESP32_BROKER_PORT)'}), 503
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'JSON 객체 본문이 필요합니다'}), 400
+    body = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    try:
+        receivers = esp32_broker.publish(f"group/{group}", body)
+    except DeliveryError as e:
+        return jsonify({'error': str(e)}), 503
+    return jsonify({'success': True, 'group': group, 'receivers': receivers})
+
 @app.route('/test-esp32', methods=['POST'])
 def test_esp32():
     """ESP32 연결 테스트"""
@@ -134,5 +521,5 @@ if __name__ == '__main__':
     # 백그라운드에서 리스너 시작
     threading.Thread(target=start_listener_delayed, daemon=True).start()
     
-    print("🚀 Flask 서버 시작 - Firestore 실시간 감지 활성화")
+    logger.info("🚀 Flask 서버 시작 - Firestore 실시간 감지 활성화")
     app.run(host='0.0.0.0', port=5000, debug=True) 
\ No newline at end of file
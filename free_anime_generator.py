@@ -1,23 +1,65 @@
 import requests
 import os
+import logging
+import base64
+import threading
 from datetime import datetime
 import time
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+# 다운로드 청크 크기 (base64 경계를 맞추기 위해 3의 배수)
+CHUNK_SIZE = 64 * 1024 - (64 * 1024) % 3
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_shared_session():
+    """연결 풀과 재시도 설정을 가진 공유 requests 세션
+
+    keep-alive 연결을 재사용하므로 같은 호스트로의 요청마다 TCP/TLS 연결을 새로 맺지 않습니다.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(
+                total=3,
+                backoff_factor=0.5,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=frozenset(['GET', 'HEAD']),
+            )
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry)
+            session = requests.Session()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _session = session
+        return _session
+
 
 class FreeAnimeGenerator:
     """무료 애니메이션 이미지 생성기"""
     
-    def __init__(self):
-        self.base_url = "https://image.pollinations.ai/prompt"
+    def __init__(self, session=None, base_url="https://image.pollinations.ai/prompt"):
+        self.base_url = base_url
         self.static_dir = "static/images"
+        self.session = session or get_shared_session()
         
         # static/images 디렉토리 생성
         os.makedirs(self.static_dir, exist_ok=True)
     
-    def generate_with_pollinations(self, prompt, style="anime"):
-        """Pollinations AI를 사용하여 이미지 생성"""
+    def generate_with_pollinations(self, prompt, style="anime", verify=False, size=(512, 512)):
+        """Pollinations AI 이미지 URL 생성
+
+        Pollinations는 URL을 요청할 때 이미지를 렌더링하므로, 기본적으로 HEAD로 미리
+        확인하지 않고 download_image/fetch_image의 GET 한 번으로 생성과 다운로드를 처리합니다.
+        verify=True이면 기존처럼 HEAD 요청으로 URL을 확인합니다.
+        """
         try:
-            print(f"🎨 Pollinations AI로 이미지 생성 시작...")
-            print(f"📝 프롬프트: {prompt}")
+            logger.info("🎨 Pollinations AI로 이미지 생성 시작...")
+            logger.debug("📝 프롬프트: %s", prompt)
             
             # 애니메이션 스타일 프롬프트 개선
             enhanced_prompt = f"anime style, cute character, {prompt}, high quality, detailed, kawaii"
@@ -26,42 +68,85 @@ class FreeAnimeGenerator:
             import urllib.parse
             encoded_prompt = urllib.parse.quote(enhanced_prompt)
             
-            # 이미지 URL 생성 (512x512 크기)
-            image_url = f"{self.base_url}/{encoded_prompt}?width=512&height=512&seed={int(time.time())}"
+            # 이미지 URL 생성 (기본 512x512 크기)
+            width, height = size
+            image_url = f"{self.base_url}/{encoded_prompt}?width={width}&height={height}&seed={int(time.time())}"
             
-            print(f"🔗 생성된 URL: {image_url}")
+            logger.debug("🔗 생성된 URL: %s", image_url)
             
+            if not verify:
+                return image_url
+
             # URL 유효성 검증
-            response = requests.head(image_url, timeout=10)
+            response = self.session.head(image_url, timeout=10)
             if response.status_code == 200:
-                print("✅ 이미지 URL 생성 성공")
+                logger.info("✅ 이미지 URL 생성 성공")
                 return image_url
             else:
-                print(f"❌ 이미지 URL 응답 오류: {response.status_code}")
+                logger.warning("❌ 이미지 URL 응답 오류: %s", response.status_code)
                 return None
                 
         except Exception as e:
-            print(f"❌ Pollinations AI 오류: {e}")
+            logger.warning("❌ Pollinations AI 오류: %s", e)
             return None
     
+    def fetch_image(self, image_url, filename, with_data_url=False):
+        """GET 한 번으로 이미지를 스트리밍 다운로드해서 청크 단위로 디스크에 저장
+
+        with_data_url=True이면 같은 스트림에서 base64 data URL도 함께 만듭니다.
+
+        Returns:
+            {'filepath', 'size', 'content_type', 'data_url'(요청 시)}
+        """
+        logger.debug("⬇️ 이미지 다운로드 시작: %s", filename)
+
+        filepath = os.path.join(self.static_dir, filename)
+        tmp_path = f"{filepath}.part"
+        size = 0
+        encoded = bytearray()
+        pending = b''  # base64는 3바이트 단위로 인코딩하므로 남은 바이트 보관
+
+        try:
+            with self.session.get(image_url, timeout=(10, 30), stream=True) as response:
+                response.raise_for_status()
+                content_type = response.headers.get('content-type', 'image/png').split(';')[0]
+
+                with open(tmp_path, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        f.write(chunk)
+                        size += len(chunk)
+
+                        if with_data_url:
+                            if not encoded:
+                                encoded += f"data:{content_type};base64,".encode()
+                            pending += chunk
+                            cut = len(pending) - len(pending) % 3
+                            encoded += base64.b64encode(pending[:cut])
+                            pending = pending[cut:]
+        except Exception:
+            # 중간에 실패하면 일부만 받은 파일 정리
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        os.replace(tmp_path, filepath)
+        logger.info("✅ 이미지 저장 완료: %s (%d bytes)", filepath, size)
+
+        result = {'filepath': filepath, 'size': size, 'content_type': content_type}
+        if with_data_url:
+            if not encoded:
+                encoded += f"data:{content_type};base64,".encode()
+            encoded += base64.b64encode(pending)
+            result['data_url'] = encoded.decode('ascii')
+        return result
+
     def download_image(self, image_url, filename):
         """이미지를 다운로드하여 로컬에 저장"""
         try:
-            print(f"⬇️ 이미지 다운로드 시작: {filename}")
-            
-            response = requests.get(image_url, timeout=30)
-            response.raise_for_status()
-            
-            filepath = os.path.join(self.static_dir, filename)
-            
-            with open(filepath, 'wb') as f:
-                f.write(response.content)
-            
-            print(f"✅ 이미지 저장 완료: {filepath}")
-            return filepath
+            return self.fetch_image(image_url, filename)['filepath']
             
         except Exception as e:
-            print(f"❌ 이미지 다운로드 실패: {e}")
+            logger.warning("❌ 이미지 다운로드 실패: %s", e)
             return None
     
     def generate_and_save(self, prompt, filename=None):
@@ -89,7 +174,7 @@ class FreeAnimeGenerator:
             }
             
         except Exception as e:
-            print(f"❌ 이미지 생성 및 저장 실패: {e}")
+            logger.warning("❌ 이미지 생성 및 저장 실패: %s", e)
             return None
 
 # 테스트 함수
@@ -108,4 +193,5 @@ def test_generator():
         print("❌ 테스트 실패!")
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     test_generator() 
\ No newline at end of file
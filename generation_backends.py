@@ -0,0 +1,489 @@
+import asyncio
+import hashlib
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from io import BytesIO
+
+from observability import timed
+
+logger = logging.getLogger(__name__)
+
+_async_http_client = None
+
+
+def get_async_http_client():
+    """비동기 모드(asgi_app.py)에서 공유하는 httpx.AsyncClient (연결 풀 재사용)"""
+    global _async_http_client
+    if _async_http_client is None:
+        import httpx
+
+        _async_http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(60, connect=10),
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=16),
+            follow_redirects=True,
+        )
+    return _async_http_client
+
+
+async def close_async_http_client():
+    global _async_http_client
+    if _async_http_client is not None:
+        await _async_http_client.aclose()
+        _async_http_client = None
+
+
+class GenerationError(Exception):
+    """이미지 생성 실패 (모든 백엔드 실패 또는 사용 가능한 백엔드 없음)"""
+
+
+class GenerationBackend:
+    """이미지 생성 백엔드 인터페이스"""
+
+    name = 'backend'
+
+    def generate(self, prompt, style, size):
+        """이미지 생성 → (이미지 바이트, content type), 실패 시 예외 발생"""
+        raise NotImplementedError
+
+    async def agenerate(self, prompt, style, size):
+        """generate()의 비동기 버전 (기본 구현은 스레드 풀에서 generate() 실행)"""
+        return await asyncio.get_running_loop().run_in_executor(None, self.generate, prompt, style, size)
+
+
+class PollinationsBackend(GenerationBackend):
+    """Pollinations AI (FreeAnimeGenerator 사용)"""
+
+    name = 'pollinations'
+
+    def generate(self, prompt, style, size):
+        from free_anime_generator import CHUNK_SIZE, FreeAnimeGenerator
+
+        generator = FreeAnimeGenerator()
+        image_url = generator.generate_with_pollinations(prompt, size=size)
+        if not image_url:
+            raise GenerationError("이미지 URL 생성 실패")
+
+        # 호출한 쪽이 블롭 저장소 / 프롬프트 캐시에 저장하므로 디스크를 거치지 않고 바이트로 반환
+        with timed('download'):
+            with generator.session.get(image_url, timeout=(10, 30), stream=True) as response:
+                response.raise_for_status()
+                content_type = response.headers.get('content-type', 'image/png').split(';')[0]
+                data = bytearray()
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    data += chunk
+        return bytes(data), content_type
+
+    async def agenerate(self, prompt, style, size):
+        from free_anime_generator import FreeAnimeGenerator
+
+        image_url = FreeAnimeGenerator().generate_with_pollinations(prompt, size=size)
+        if not image_url:
+            raise GenerationError("이미지 URL 생성 실패")
+
+        with timed('download'):
+            async with get_async_http_client().stream('GET', image_url) as response:
+                response.raise_for_status()
+                content_type = response.headers.get('content-type', 'image/png').split(';')[0]
+                data = bytearray()
+                async for chunk in response.aiter_bytes():
+                    data += chunk
+        return bytes(data), content_type
+
+
+class HuggingFaceBackend(GenerationBackend):
+    """Hugging Face Inference API (Stable Diffusion XL)
+
+    HF_API_TOKEN 환경 변수의 토큰을 사용하며, HF_MODEL로 모델을 바꿀 수 있습니다.
+    """
+
+    name = 'huggingface'
+
+    def __init__(self, model=None, token=None, timeout=60):
+        self.model = model or os.environ.get('HF_MODEL', 'stabilityai/stable-diffusion-xl-base-1.0')
+        self.token = token or os.environ.get('HF_API_TOKEN')
+        self.timeout = timeout
+
+    def query(self, payload):
+        """Inference API 호출 → 이미지 바이트"""
+        if not self.token:
+            raise GenerationError("HF_API_TOKEN이 설정되지 않았습니다")
+
+        from free_anime_generator import get_shared_session
+
+        response = get_shared_session().post(
+            f"https://api-inference.huggingface.co/models/{self.model}",
+            headers={'Authorization': f"Bearer {self.token}"},
+            json=payload,
+            timeout=(10, self.timeout),
+        )
+        self._check_response(response.status_code, response.headers.get('content-type', ''), response.text)
+        return response.content
+
+    def _check_response(self, status_code, content_type, text):
+        if status_code != 200 or not content_type.startswith('image/'):
+            raise GenerationError(f"Hugging Face API 오류: {status_code} {text[:200]}")
+
+    def _payload(self, prompt, size):
+        # 애니메이션 스타일 프롬프트 개선
+        return {
+            "inputs": f"anime style, cute character, {prompt}, high quality, detailed",
+            "parameters": {
+                "num_inference_steps": 30,
+                "guidance_scale": 7.5,
+                "width": size[0],
+                "height": size[1]
+            }
+        }
+
+    def generate(self, prompt, style, size):
+        return self.query(self._payload(prompt, size)), 'image/png'
+
+    async def agenerate(self, prompt, style, size):
+        if not self.token:
+            raise GenerationError("HF_API_TOKEN이 설정되지 않았습니다")
+
+        response = await get_async_http_client().post(
+            f"https://api-inference.huggingface.co/models/{self.model}",
+            headers={'Authorization': f"Bearer {self.token}"},
+            json=self._payload(prompt, size),
+            timeout=self.timeout,
+        )
+        self._check_response(response.status_code, response.headers.get('content-type', ''), response.text)
+        return response.content, 'image/png'
+
+
+class StubBackend(GenerationBackend):
+    """로컬 테스트/벤치마크용 가짜 백엔드
+
+    delay초(± jitter) 기다린 뒤 프롬프트에 따라 색이 정해지는 단색 PNG를 돌려주며,
+    failure_rate 확률로 실패합니다.
+    """
+
+    def __init__(self, name='stub', delay=0.05, jitter=0.0, failure_rate=0.0):
+        self.name = name
+        self.delay = delay
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+
+    def _delay(self):
+        return max(0.0, self.delay + random.uniform(-self.jitter, self.jitter))
+
+    def generate(self, prompt, style, size):
+        time.sleep(self._delay())
+        return self._render(prompt, style, size)
+
+    async def agenerate(self, prompt, style, size):
+        await asyncio.sleep(self._delay())
+        return self._render(prompt, style, size)
+
+    def _render(self, prompt, style, size):
+        from PIL import Image
+
+        if random.random() < self.failure_rate:
+            raise GenerationError(f"{self.name} 백엔드 실패 (테스트)")
+
+        color = tuple(hashlib.sha256(f"{prompt}|{style}".encode()).digest()[:3])
+        buffer = BytesIO()
+        Image.new('RGB', size, color).save(buffer, format='PNG')
+        return buffer.getvalue(), 'image/png'
+
+
+class CircuitBreaker:
+    """연속 실패가 failure_threshold번이면 reset_timeout초 동안 호출 차단
+
+    차단 시간이 지나면 한 번만 시험 호출(half-open)을 허용하고, 성공하면 다시 닫힙니다.
+    """
+
+    def __init__(self, failure_threshold=3, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self._opened_at = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                self.state = 'open'
+                self._opened_at = time.monotonic()
+
+    def release(self):
+        """결과 없이 끝난 호출 (취소) - 시험 호출이었으면 다시 차단해 reset_timeout 뒤에 새로 시험"""
+        with self._lock:
+            if self.state == 'half_open':
+                self.state = 'open'
+                self._opened_at = time.monotonic()
+
+
+class LatencyTracker:
+    """최근 window개의 성공 응답 시간으로 백분위 계산"""
+
+    def __init__(self, window=50):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def count(self):
+        with self._lock:
+            return len(self._samples)
+
+    def percentile(self, q):
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+class _BackendState:
+    def __init__(self, backend, breaker):
+        self.backend = backend
+        self.breaker = breaker
+        self.latency = LatencyTracker()
+        self.successes = 0
+        self.failures = 0
+
+
+class HedgedGenerator:
+    """여러 백엔드를 우선순위대로 사용하는 이미지 생성기
+
+    - 백엔드마다 서킷 브레이커가 있어 죽은 백엔드로는 요청을 보내지 않습니다.
+    - 먼저 시작한 백엔드가 자신의 p95 응답 시간 안에 끝나지 않으면 다음 백엔드를
+      함께 시작(hedge)하고, 먼저 성공한 결과를 사용합니다.
+    - 백엔드가 실패하면 기다리지 않고 바로 다음 백엔드로 넘어갑니다.
+    """
+
+    def __init__(self, backends, max_workers=8, min_hedge_delay=1.0, default_hedge_delay=10.0,
+                 min_samples=5, failure_threshold=3, reset_timeout=30):
+        self.min_hedge_delay = min_hedge_delay
+        self.default_hedge_delay = default_hedge_delay
+        self.min_samples = min_samples
+        self._states = [
+            _BackendState(backend, CircuitBreaker(failure_threshold, reset_timeout))
+            for backend in backends
+        ]
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='generation-backend')
+
+    def hedge_delay(self, state):
+        """이 백엔드를 기다린 뒤 다음 백엔드를 시작할 시간 (p95 기준)"""
+        if state.latency.count() < self.min_samples:
+            return self.default_hedge_delay
+        return max(self.min_hedge_delay, state.latency.percentile(0.95))
+
+    def generate(self, prompt, style, size, timeout=120):
+        """이미지 생성 → (이미지 바이트, content type)
+
+        Raises:
+            GenerationError: 모든 백엔드가 실패했거나 시간 안에 끝나지 않은 경우
+        """
+        remaining = list(self._states)
+        running = {}  # future → 백엔드 상태
+        errors = []
+        deadline = time.monotonic() + timeout
+
+        def launch_next():
+            while remaining:
+                state = remaining.pop(0)
+                if state.breaker.allow():
+                    future = self._executor.submit(self._call, state, prompt, style, size)
+                    running[future] = state
+                    return state
+                errors.append(f"{state.backend.name}: 서킷 열림")
+            return None
+
+        last_started = launch_next()
+        if last_started is None:
+            raise GenerationError("사용 가능한 생성 백엔드가 없습니다 (" + "; ".join(errors) + ")")
+
+        while running:
+            time_left = deadline - time.monotonic()
+            if time_left <= 0:
+                break
+
+            wait_time = time_left
+            if remaining:
+                wait_time = min(wait_time, self.hedge_delay(last_started))
+
+            done, _ = wait(running, timeout=wait_time, return_when=FIRST_COMPLETED)
+
+            if not done:
+                # 응답이 p95보다 늦어짐 → 다음 백엔드를 함께 시작
+                started = launch_next()
+                if started is not None:
+                    logger.info("⏱️ %s 응답 지연, %s 백엔드 추가 시작", last_started.backend.name, started.backend.name)
+                    last_started = started
+                continue
+
+            for future in done:
+                state = running.pop(future)
+                try:
+                    return future.result()
+                except Exception as e:
+                    errors.append(f"{state.backend.name}: {e}")
+                    logger.warning("❌ %s 백엔드 실패: %s", state.backend.name, e)
+
+            # 실행 중인 백엔드가 모두 실패했으면 바로 다음 백엔드로
+            if not running:
+                started = launch_next()
+                if started is not None:
+                    last_started = started
+
+        if running:
+            errors.append(f"{timeout}초 안에 응답 없음")
+        raise GenerationError("이미지 생성 실패: " + "; ".join(errors))
+
+    def _call(self, state, prompt, style, size):
+        start = time.monotonic()
+        try:
+            result = state.backend.generate(prompt, style, size)
+        except Exception:
+            self._record_failure(state)
+            raise
+        self._record_success(state, time.monotonic() - start)
+        return result
+
+    async def _acall(self, state, prompt, style, size):
+        start = time.monotonic()
+        try:
+            result = await state.backend.agenerate(prompt, style, size)
+        except asyncio.CancelledError:
+            # hedge에서 진 요청을 취소한 것은 백엔드 실패가 아님 (시험 호출이었으면 시험 기회만 돌려놓음)
+            state.breaker.release()
+            raise
+        except Exception:
+            self._record_failure(state)
+            raise
+        self._record_success(state, time.monotonic() - start)
+        return result
+
+    def _record_success(self, state, seconds):
+        state.latency.record(seconds)
+        state.successes += 1
+        state.breaker.record_success()
+
+    def _record_failure(self, state):
+        state.failures += 1
+        state.breaker.record_failure()
+
+    async def agenerate(self, prompt, style, size, timeout=120):
+        """generate()의 비동기 버전 (asgi_app.py)
+
+        스레드 대신 태스크로 백엔드를 실행하며, 먼저 성공한 결과를 받으면 나머지 요청은 취소합니다.
+        """
+        remaining = list(self._states)
+        running = {}  # 태스크 → 백엔드 상태
+        errors = []
+        deadline = time.monotonic() + timeout
+
+        def launch_next():
+            while remaining:
+                state = remaining.pop(0)
+                if state.breaker.allow():
+                    task = asyncio.ensure_future(self._acall(state, prompt, style, size))
+                    running[task] = state
+                    return state
+                errors.append(f"{state.backend.name}: 서킷 열림")
+            return None
+
+        last_started = launch_next()
+        if last_started is None:
+            raise GenerationError("사용 가능한 생성 백엔드가 없습니다 (" + "; ".join(errors) + ")")
+
+        try:
+            while running:
+                time_left = deadline - time.monotonic()
+                if time_left <= 0:
+                    break
+
+                wait_time = time_left
+                if remaining:
+                    wait_time = min(wait_time, self.hedge_delay(last_started))
+
+                done, _ = await asyncio.wait(running, timeout=wait_time, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    # 응답이 p95보다 늦어짐 → 다음 백엔드를 함께 시작
+                    started = launch_next()
+                    if started is not None:
+                        logger.info("⏱️ %s 응답 지연, %s 백엔드 추가 시작", last_started.backend.name, started.backend.name)
+                        last_started = started
+                    continue
+
+                for task in done:
+                    state = running.pop(task)
+                    try:
+                        return task.result()
+                    except Exception as e:
+                        errors.append(f"{state.backend.name}: {e}")
+                        logger.warning("❌ %s 백엔드 실패: %s", state.backend.name, e)
+
+                # 실행 중인 백엔드가 모두 실패했으면 바로 다음 백엔드로
+                if not running:
+                    started = launch_next()
+                    if started is not None:
+                        last_started = started
+        finally:
+            for task in running:
+                task.cancel()
+
+        if running:
+            errors.append(f"{timeout}초 안에 응답 없음")
+        raise GenerationError("이미지 생성 실패: " + "; ".join(errors))
+
+    def stats(self):
+        """백엔드별 서킷 상태와 응답 시간"""
+        result = {}
+        for state in self._states:
+            p50 = state.latency.percentile(0.5)
+            p95 = state.latency.percentile(0.95)
+            result[state.backend.name] = {
+                'circuit': state.breaker.state,
+                'successes': state.successes,
+                'failures': state.failures,
+                'latency_p50_ms': round(p50 * 1000, 1) if p50 is not None else None,
+                'latency_p95_ms': round(p95 * 1000, 1) if p95 is not None else None,
+                'hedge_delay_ms': round(self.hedge_delay(state) * 1000, 1),
+            }
+        return result
+
+
+def create_backends(names):
+    """쉼표로 구분한 이름 목록으로 백엔드 생성 (예: "pollinations,huggingface", "stub")"""
+    factories = {
+        'pollinations': PollinationsBackend,
+        'huggingface': HuggingFaceBackend,
+        'stub': StubBackend,
+    }
+    backends = []
+    for name in names.split(','):
+        name = name.strip()
+        if not name:
+            continue
+        if name not in factories:
+            raise ValueError(f"알 수 없는 생성 백엔드: {name}")
+        backends.append(factories[name]())
+    return backends
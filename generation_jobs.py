@@ -0,0 +1,235 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """대기 중인 작업이 너무 많아 새 작업을 받을 수 없는 경우"""
+
+
+class GenerationJobQueue:
+    """이미지 생성 작업 큐
+
+    요청 스레드는 작업을 넣고 바로 작업 ID를 돌려받으며, 정해진 수의 워커 스레드가
+    handler(params)를 실행합니다. 대기열이 가득 차면 QueueFullError로 거절합니다.
+
+    작업 상태는 SQLite에만 둡니다 (db_path가 없으면 이 프로세스의 메모리 DB).
+    db_path를 여러 프로세스(gunicorn 워커)가 함께 쓰면 어느 워커로 조회가 와도 같은 작업이 보이고,
+    대기 작업은 UPDATE ... WHERE status = 'queued'로 한 워커만 가져가 실행합니다.
+    실행 중인 작업은 lease초마다 임대를 갱신하며, 프로세스가 죽어 임대가 끝난 작업은 다른 워커가 다시 실행합니다.
+    실행할 때마다 attempts가 늘어나고, max_attempts번 실행하고도 임대가 끝난 작업(워커를 죽이는 작업)은
+    다시 실행하지 않고 실패로 처리합니다.
+
+    작업 상태: queued → running → succeeded | failed
+    """
+
+    def __init__(self, handler, workers=2, max_queue=16, db_path=None, job_ttl=3600, lease=60.0,
+                 poll_interval=1.0, max_attempts=3):
+        self.handler = handler
+        self.workers = workers
+        self.max_queue = max_queue
+        self.job_ttl = job_ttl
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+
+        # 이 프로세스에서 실행 중인 작업의 소유자 표시 (임대 갱신 / 결과 저장 때 확인)
+        self._owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        # 이 프로세스 안의 작업 추가 / 완료 알림 (다른 프로세스의 변경은 poll_interval마다 확인)
+        self._changed = threading.Condition()
+        self._db_lock = threading.Lock()
+        self._db = sqlite3.connect(db_path or ':memory:', check_same_thread=False, timeout=10)
+        with self._db_lock:
+            if db_path:
+                self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY, status TEXT, params TEXT, result TEXT,"
+                " error TEXT, created_at REAL, updated_at REAL)"
+            )
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(jobs)")}
+            if 'owner' not in columns:
+                self._db.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+            if 'lease_until' not in columns:
+                self._db.execute("ALTER TABLE jobs ADD COLUMN lease_until REAL")
+            if 'attempts' not in columns:
+                self._db.execute("ALTER TABLE jobs ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+            self._db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+            self._db.commit()
+
+        for i in range(workers):
+            threading.Thread(target=self._work, name=f"generation-worker-{i}", daemon=True).start()
+        threading.Thread(target=self._renew_leases, name='generation-lease', daemon=True).start()
+
+    def submit(self, params):
+        """작업 추가 후 작업 정보 반환
+
+        Raises:
+            QueueFullError: 대기 중인 작업 수가 max_queue 이상일 때
+        """
+        now = time.time()
+        job = {
+            'id': uuid.uuid4().hex,
+            'status': 'queued',
+            'result': None,
+            'error': None,
+            'created_at': now,
+            'updated_at': now,
+        }
+        with self._db_lock:
+            # BEGIN IMMEDIATE: 대기 작업 수 확인과 추가 사이에 다른 프로세스가 끼어들지 않도록
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                depth = self._db.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+                if depth >= self.max_queue:
+                    raise QueueFullError(f"대기 중인 생성 작업이 {self.max_queue}개를 넘었습니다")
+                self._db.execute(
+                    "INSERT INTO jobs (id, status, params, result, error, created_at, updated_at)"
+                    " VALUES (?, 'queued', ?, 'null', NULL, ?, ?)",
+                    (job['id'], json.dumps(params), now, now),
+                )
+                self._db.execute(
+                    "DELETE FROM jobs WHERE status IN ('succeeded', 'failed') AND updated_at < ?",
+                    (now - self.job_ttl,),
+                )
+                self._db.commit()
+            except BaseException:
+                self._db.rollback()
+                raise
+
+        with self._changed:
+            self._changed.notify_all()
+        return job
+
+    def get(self, job_id):
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT id, status, result, error, created_at, updated_at FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            'id': row[0],
+            'status': row[1],
+            'result': json.loads(row[2]) if row[2] else None,
+            'error': row[3],
+            'created_at': row[4],
+            'updated_at': row[5],
+        }
+
+    def wait(self, job_id, timeout):
+        """작업이 끝나거나 timeout이 지날 때까지 대기 후 작업 정보 반환
+
+        다른 프로세스가 실행하는 작업은 poll_interval마다 다시 확인합니다.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            time_left = deadline - time.monotonic()
+            if job is None or job['status'] not in ('queued', 'running') or time_left <= 0:
+                return job
+            with self._changed:
+                self._changed.wait(min(time_left, self.poll_interval))
+
+    def queue_depth(self):
+        """아직 시작하지 않은 작업 수"""
+        with self._db_lock:
+            return self._db.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+
+    def stats(self):
+        with self._db_lock:
+            counts = dict(self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"))
+        return {
+            'workers': self.workers,
+            'max_queue': self.max_queue,
+            'jobs': counts,
+        }
+
+    def _claim(self):
+        """대기 작업(또는 임대가 끝난 실행 중 작업) 하나를 이 프로세스 소유로 → (작업 ID, params) 또는 None"""
+        with self._db_lock:
+            while True:
+                now = time.time()
+                row = self._db.execute(
+                    "SELECT id, status, params, attempts FROM jobs"
+                    " WHERE status = 'queued' OR (status = 'running' AND COALESCE(lease_until, 0) < ?)"
+                    " ORDER BY created_at LIMIT 1",
+                    (now,),
+                ).fetchone()
+                if row is None:
+                    return None
+                job_id, status, params, attempts = row
+
+                if status == 'running' and attempts >= self.max_attempts:
+                    # 실행할 때마다 워커가 죽은 작업 → 더 실행하지 않고 실패 처리
+                    failed = self._db.execute(
+                        "UPDATE jobs SET status = 'failed', error = ?, owner = NULL, lease_until = NULL,"
+                        " updated_at = ? WHERE id = ? AND status = 'running' AND COALESCE(lease_until, 0) < ?",
+                        (f"최대 시도 횟수({self.max_attempts}회)를 넘었습니다", now, job_id, now),
+                    ).rowcount
+                    self._db.commit()
+                    if failed:
+                        logger.error("❌ %d번 실행하고도 끝나지 않은 생성 작업 포기: %s", attempts, job_id)
+                        with self._changed:
+                            self._changed.notify_all()
+                    continue
+
+                # 같은 작업을 다른 프로세스가 먼저 가져갔으면 rowcount가 0 → 다음 작업
+                claimed = self._db.execute(
+                    "UPDATE jobs SET status = 'running', owner = ?, lease_until = ?, updated_at = ?,"
+                    " attempts = attempts + 1"
+                    " WHERE id = ? AND (status = 'queued' OR (status = 'running' AND COALESCE(lease_until, 0) < ?))",
+                    (self._owner, now + self.lease, now, job_id, now),
+                ).rowcount
+                self._db.commit()
+                if claimed:
+                    if status == 'running':
+                        logger.info("♻️ 임대가 끝난 생성 작업 다시 실행 (%d번째): %s", attempts + 1, job_id)
+                    return job_id, json.loads(params)
+
+    def _work(self):
+        while True:
+            claimed = self._claim()
+            if claimed is None:
+                with self._changed:
+                    self._changed.wait(self.poll_interval)
+                continue
+
+            job_id, params = claimed
+            try:
+                result = self.handler(params)
+                status, result, error = 'succeeded', result, None
+            except Exception as e:
+                logger.exception("❌ 생성 작업 실패 (%s): %s", job_id, e)
+                status, result, error = 'failed', None, str(e)
+
+            with self._db_lock:
+                # 임대를 잃어 다른 워커가 다시 실행 중이면 그쪽 결과를 남김
+                self._db.execute(
+                    "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ?, lease_until = NULL"
+                    " WHERE id = ? AND owner = ? AND status = 'running'",
+                    (status, json.dumps(result), error, time.time(), job_id, self._owner),
+                )
+                self._db.commit()
+            with self._changed:
+                self._changed.notify_all()
+
+    def _renew_leases(self):
+        """이 프로세스가 실행 중인 작업의 임대 갱신 (lease / 3초마다)"""
+        while True:
+            time.sleep(self.lease / 3)
+            try:
+                with self._db_lock:
+                    self._db.execute(
+                        "UPDATE jobs SET lease_until = ? WHERE owner = ? AND status = 'running'",
+                        (time.time() + self.lease, self._owner),
+                    )
+                    self._db.commit()
+            except sqlite3.Error as e:
+                logger.warning("⚠️ 생성 작업 임대 갱신 실패: %s", e)
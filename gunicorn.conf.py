@@ -0,0 +1,31 @@
+# gunicorn 설정
+#   gunicorn -c gunicorn.conf.py app:app
+#
+# /esp-titles?wait= 롱폴링과 /esp-titles/stream(SSE)은 기기 연결을 오래 유지하므로
+# 스레드 대신 greenlet으로 연결을 처리하는 gevent 워커를 사용합니다.
+import multiprocessing
+import os
+
+bind = os.environ.get("BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("WEB_CONCURRENCY", min(multiprocessing.cpu_count(), 4)))
+worker_class = "gevent"
+worker_connections = int(os.environ.get("WORKER_CONNECTIONS", 1000))
+
+# 롱폴링 대기 시간(55초)보다 길게
+timeout = 90
+keepalive = 75
+
+# CACHE_BACKEND=socket: 워커들이 공유할 캐시 서버를 마스터와 함께 시작 / 종료 (shared_cache.py)
+_cache_server = None
+
+
+def on_starting(server):
+    global _cache_server
+    if os.environ.get("CACHE_BACKEND") == "socket":
+        from shared_cache import start_cache_server
+        _cache_server = start_cache_server()
+
+
+def on_exit(server):
+    if _cache_server is not None:
+        _cache_server.terminate()
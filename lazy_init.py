@@ -0,0 +1,77 @@
+"""
+지연 초기화 (서버리스 콜드 스타트용)
+
+Firestore 클라이언트나 google.cloud.firestore 같은 무거운 모듈을 import 시점이 아니라
+처음 사용할 때 만들어, 인스턴스가 뜨자마자 /healthz에 응답할 수 있게 합니다.
+
+    db = LazyObject(create_client, 'firestore')   # db.collection(...) 첫 호출 때 create_client()
+    firestore = lazy_module('google.cloud.firestore')
+"""
+
+import importlib
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_UNSET = object()
+
+
+class LazyObject:
+    """처음 속성에 접근할 때 factory()로 객체를 만들어 위임하는 프록시 (스레드 안전)
+
+    factory가 예외를 내면 저장하지 않으므로 다음 접근에서 다시 시도합니다.
+    프록시 자체의 상태는 force() / is_initialized() / init_seconds()로 확인합니다.
+    """
+
+    def __init__(self, factory, name=None):
+        self._lazy_factory = factory
+        self._lazy_name = name or getattr(factory, '__name__', 'lazy')
+        self._lazy_value = _UNSET
+        self._lazy_seconds = None
+        self._lazy_lock = threading.Lock()
+
+    def _lazy_get(self):
+        value = self._lazy_value
+        if value is not _UNSET:
+            return value
+
+        with self._lazy_lock:
+            if self._lazy_value is _UNSET:
+                start = time.perf_counter()
+                self._lazy_value = self._lazy_factory()
+                self._lazy_seconds = time.perf_counter() - start
+                logger.info("⚡ %s 초기화 (%.0fms)", self._lazy_name, self._lazy_seconds * 1000)
+            return self._lazy_value
+
+    def __getattr__(self, name):
+        # __init__ 전(복사 / 역직렬화 중)에 내부 속성을 찾는 경우 무한 재귀 방지
+        if name.startswith('_lazy_'):
+            raise AttributeError(name)
+        return getattr(self._lazy_get(), name)
+
+    def __repr__(self):
+        state = 'ready' if self._lazy_value is not _UNSET else 'pending'
+        return f"<LazyObject {self._lazy_name} ({state})>"
+
+
+def lazy_module(name):
+    """처음 속성에 접근할 때 import되는 모듈"""
+    return LazyObject(lambda: importlib.import_module(name), name)
+
+
+def force(obj):
+    """LazyObject면 지금 초기화해 실제 객체를 돌려주고, 아니면 그대로 반환"""
+    if isinstance(obj, LazyObject):
+        return obj._lazy_get()
+    return obj
+
+
+def is_initialized(obj):
+    return not isinstance(obj, LazyObject) or obj._lazy_value is not _UNSET
+
+
+def init_seconds(obj):
+    """초기화에 걸린 시간 (아직 초기화 전이면 None)"""
+    return obj._lazy_seconds if isinstance(obj, LazyObject) else None
@@ -0,0 +1,277 @@
+"""
+범위(scope)별 Firestore 할일 리스너 (flask_firestore_listener.py)
+
+todos 컬렉션 전체를 구독하는 대신 기기가 실제로 보여 주는 범위만 쿼리로 구독합니다.
+- TodoScope: 사용자(userId) / due_date_string 기간(오늘부터 days일) / is_completed 조건
+- ScopeManager: 기기 → 범위 배정을 받아 범위마다 리스너를 하나만 열고(같은 범위의 기기끼리 공유),
+  쓰지 않게 된 범위의 리스너는 닫습니다. 날짜 조건이 있는 범위는 자정에 새 날짜로 다시 엽니다.
+
+리스너 읽기 비용과 콜백 처리량이 컬렉션 전체가 아니라 범위 안 문서 수에 비례하게 됩니다.
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime, time as dtime, timedelta
+
+from tenants import TODO_USER_FIELD
+
+logger = logging.getLogger(__name__)
+
+# 컬렉션 전체 범위의 키 (esp_delivery.ALL_SCOPE와 같음)
+ALL_KEY = '*'
+
+# 자정 직후 날짜가 확실히 바뀐 뒤에 다시 열도록 두는 여유 (초)
+ROLLOVER_GRACE = 1.0
+
+
+class TodoScope:
+    """할일 리스너 범위 (None인 조건은 걸지 않음)
+
+    days=1이면 due_date_string이 오늘인 할일, N이면 오늘부터 N-1일 뒤까지의 할일입니다.
+    """
+
+    def __init__(self, user_id=None, days=None, is_completed=None):
+        if days is not None and (isinstance(days, bool) or not isinstance(days, int) or days < 1):
+            raise ValueError("days는 1 이상의 정수이거나 null이어야 합니다")
+        if is_completed is not None and not isinstance(is_completed, bool):
+            raise ValueError("is_completed는 true / false / null이어야 합니다")
+        self.user_id = user_id
+        self.days = days
+        self.is_completed = is_completed
+
+    @classmethod
+    def from_config(cls, user_id, config=None, defaults=None):
+        """기기 설정 → 범위
+
+        config / defaults: {'days': ..., 'is_completed': ...} - config에 없는 키는 defaults 값을 쓰고,
+        값이 null이면 그 조건을 걸지 않습니다.
+        """
+        merged = dict(defaults or {})
+        merged.update(config or {})
+        return cls(user_id, merged.get('days'), merged.get('is_completed'))
+
+    @property
+    def key(self):
+        """같은 조건이면 같은 문자열 (리스너 공유 / 아웃박스의 범위별 해시 키)"""
+        parts = []
+        if self.user_id is not None:
+            parts.append(f"user={self.user_id}")
+        if self.days is not None:
+            parts.append(f"days={self.days}")
+        if self.is_completed is not None:
+            parts.append(f"completed={'true' if self.is_completed else 'false'}")
+        return ';'.join(parts) or ALL_KEY
+
+    @property
+    def dated(self):
+        return self.days is not None
+
+    def query(self, collection, today):
+        """today(date) 기준 Firestore 쿼리
+
+        days가 2 이상이면 due_date_string 범위 조건이 들어가므로 다른 조건과 함께 쓸 때
+        (userId, is_completed, due_date_string) 복합 색인이 필요합니다.
+        """
+        query = collection
+        if self.user_id is not None:
+            query = query.where(TODO_USER_FIELD, "==", self.user_id)
+        if self.is_completed is not None:
+            query = query.where("is_completed", "==", self.is_completed)
+        if self.days == 1:
+            query = query.where("due_date_string", "==", today.strftime("%Y-%m-%d"))
+        elif self.days is not None:
+            last = today + timedelta(days=self.days - 1)
+            query = query.where("due_date_string", ">=", today.strftime("%Y-%m-%d")) \
+                .where("due_date_string", "<=", last.strftime("%Y-%m-%d"))
+        return query
+
+    def to_dict(self):
+        return {'user_id': self.user_id, 'days': self.days, 'is_completed': self.is_completed}
+
+    def __eq__(self, other):
+        return isinstance(other, TodoScope) and self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __repr__(self):
+        return f"<TodoScope {self.key}>"
+
+
+class ScopeManager:
+    """기기별 범위 → 범위별 공유 리스너
+
+    on_snapshot(key, device_ids, docs, changes, read_time, initial):
+        범위 리스너의 콜백 (initial=True면 리스너를 (다시) 연 뒤 첫 스냅샷)
+    on_join(key, device_ids, docs):
+        이미 첫 스냅샷을 받은 범위에 기기가 새로 들어왔을 때 그 범위의 현재 문서
+    콜백은 Firestore 리스너 스레드 또는 update()를 호출한 스레드에서 불립니다.
+    """
+
+    def __init__(self, db, on_snapshot, on_join, collection='todos', now=datetime.now):
+        self._db = db
+        self._on_snapshot = on_snapshot
+        self._on_join = on_join
+        self._collection = collection
+        self._now = now
+        self._lock = threading.RLock()
+        self._scopes = {}   # 범위 키 → 리스너 상태
+        self._devices = {}  # 기기 ID → 범위 키
+        self._timer = None
+        self.active = False
+
+    def update(self, device_scopes):
+        """기기 ID → TodoScope 배정을 반영 (새 범위는 열고, 아무 기기도 없는 범위는 닫음)"""
+        joins = {}
+        with self._lock:
+            self.active = True
+            assigned = {device_id: scope.key for device_id, scope in device_scopes.items()}
+            wanted = {scope.key: scope for scope in device_scopes.values()}
+
+            members = {}
+            for device_id, key in sorted(assigned.items()):
+                members.setdefault(key, []).append(device_id)
+
+            for key in list(self._scopes):
+                if key not in wanted:
+                    self._close(key)
+            for key, scope in wanted.items():
+                if key in self._scopes:
+                    entry = self._scopes[key]
+                    # 첫 스냅샷 전이면 그 스냅샷에서 함께 처리
+                    if not entry['initial']:
+                        joined = [d for d in members[key] if self._devices.get(d) != key]
+                        if joined:
+                            joins[key] = joined
+                    entry['devices'] = members[key]
+                else:
+                    self._open(scope, members[key])
+            self._devices = assigned
+            if any(entry['scope'].dated for entry in self._scopes.values()):
+                self._schedule_rollover()
+
+            join_docs = {key: dict(self._scopes[key]['docs']) for key in joins}
+
+        for key, device_ids in joins.items():
+            logger.info("📡 범위 %s에 기기 합류: %s", key, ', '.join(device_ids))
+            self._on_join(key, device_ids, join_docs[key])
+
+    def _open(self, scope, device_ids):
+        today = self._now().date()
+        entry = {
+            'scope': scope,
+            'devices': device_ids,
+            'docs': {},
+            'initial': True,
+            'day': today if scope.dated else None,
+            'opened_at': time.time(),
+            'token': object(),
+            'watch': None,
+        }
+        self._scopes[scope.key] = entry
+        self._watch(entry)
+        logger.info("👂 범위 리스너 열기: %s", scope.key)
+
+    def _watch(self, entry):
+        token = entry['token']
+        query = entry['scope'].query(self._db.collection(self._collection), entry['day'] or self._now().date())
+        entry['watch'] = query.on_snapshot(
+            lambda docs, changes, read_time: self._dispatch(entry, token, docs, changes, read_time)
+        )
+
+    def _close(self, key):
+        entry = self._scopes.pop(key)
+        entry['token'] = None
+        if entry['watch'] is not None:
+            entry['watch'].unsubscribe()
+        logger.info("🔇 범위 리스너 닫기: %s", key)
+
+    def _dispatch(self, entry, token, docs, changes, read_time):
+        with self._lock:
+            # 닫았거나 다시 연 리스너에서 늦게 도착한 스냅샷은 무시
+            if entry['token'] is not token:
+                return
+            initial = entry['initial']
+            entry['initial'] = False
+            entry['docs'] = {doc.id: doc.to_dict() or {} for doc in docs}
+            device_ids = list(entry['devices'])
+        self._on_snapshot(entry['scope'].key, device_ids, docs, changes, read_time, initial)
+
+    def _schedule_rollover(self):
+        if self._timer is not None:
+            return
+        now = self._now()
+        midnight = datetime.combine(now.date() + timedelta(days=1), dtime.min)
+        self._timer = threading.Timer((midnight - now).total_seconds() + ROLLOVER_GRACE, self._on_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _on_timer(self):
+        with self._lock:
+            self._timer = None
+        self.rollover()
+
+    def rollover(self):
+        """날짜가 바뀐 날짜 조건 범위를 새 날짜의 쿼리로 다시 열기 → 다시 연 범위 키 목록
+
+        다시 연 리스너의 첫 스냅샷은 initial=True로 전달되므로, 저장된 스냅샷과 비교해
+        기간을 벗어난 할일은 삭제로, 새로 들어온 할일은 추가로 보낼 수 있습니다.
+        """
+        reopened = []
+        with self._lock:
+            today = self._now().date()
+            for key, entry in self._scopes.items():
+                if not entry['scope'].dated or entry['day'] == today:
+                    continue
+                if entry['watch'] is not None:
+                    entry['watch'].unsubscribe()
+                entry.update(day=today, initial=True, token=object(), opened_at=time.time())
+                self._watch(entry)
+                reopened.append(key)
+            if self.active and any(entry['scope'].dated for entry in self._scopes.values()):
+                self._schedule_rollover()
+        if reopened:
+            logger.info("🌙 날짜 변경: 범위 %d개 다시 열기 (%s)", len(reopened), today.isoformat())
+        return reopened
+
+    def keys(self):
+        with self._lock:
+            return list(self._scopes)
+
+    def documents(self, keys=None):
+        """범위들의 현재 문서 {문서 ID: 데이터} (keys가 None이면 열린 범위 전체, 첫 스냅샷 전이면 None)"""
+        with self._lock:
+            keys = list(self._scopes) if keys is None else keys
+            docs = {}
+            for key in keys:
+                entry = self._scopes.get(key)
+                if entry is None or entry['initial']:
+                    return None
+                docs.update(entry['docs'])
+            return docs
+
+    def stop(self):
+        """모든 범위 리스너 닫기 (기기 배정도 비움)"""
+        with self._lock:
+            self.active = False
+            for key in list(self._scopes):
+                self._close(key)
+            self._devices = {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                key: {
+                    **entry['scope'].to_dict(),
+                    'devices': list(entry['devices']),
+                    'documents': len(entry['docs']),
+                    'day': entry['day'].isoformat() if entry['day'] else None,
+                    'waiting_initial': entry['initial'],
+                    'opened_at': entry['opened_at'],
+                }
+                for key, entry in self._scopes.items()
+            }
@@ -0,0 +1,587 @@
+import asyncio
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+from google.api_core.exceptions import AlreadyExists, NotFound
+from google.cloud.firestore_v1 import transforms
+from google.cloud.firestore_v1.watch import ChangeType
+
+logger = logging.getLogger(__name__)
+
+
+def _sort_key(value):
+    """Firestore 정렬 순서와 비슷하게 타입별로 먼저 나눈 뒤 값으로 비교"""
+    if value is None:
+        return (0, 0)
+    if isinstance(value, bool):
+        return (1, value)
+    if isinstance(value, (int, float)):
+        return (2, value)
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return (3, value.timestamp())
+    if isinstance(value, str):
+        return (4, value)
+    return (5, repr(value))
+
+
+_MISSING = object()
+
+_OPERATORS = {
+    '==': lambda a, b: a == b,
+    '!=': lambda a, b: a != b,
+    '<': lambda a, b: _sort_key(a) < _sort_key(b),
+    '<=': lambda a, b: _sort_key(a) <= _sort_key(b),
+    '>': lambda a, b: _sort_key(a) > _sort_key(b),
+    '>=': lambda a, b: _sort_key(a) >= _sort_key(b),
+    'in': lambda a, b: a in b,
+    'not-in': lambda a, b: a not in b,
+    'array_contains': lambda a, b: isinstance(a, list) and b in a,
+    'array_contains_any': lambda a, b: isinstance(a, list) and any(x in a for x in b),
+}
+
+
+def _get_field(data, path):
+    if path == '__name__':
+        return _MISSING
+    value = data
+    for part in path.split('.'):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _apply_update(data, updates):
+    """update/set(merge)의 필드 값과 변환(SERVER_TIMESTAMP, ArrayUnion 등) 적용"""
+    for path, value in updates.items():
+        parts = path.split('.')
+        target = data
+        for part in parts[:-1]:
+            target = target.setdefault(part, {})
+        field = parts[-1]
+
+        if value is transforms.DELETE_FIELD:
+            target.pop(field, None)
+        elif value is transforms.SERVER_TIMESTAMP:
+            target[field] = datetime.now(timezone.utc)
+        elif isinstance(value, transforms.ArrayUnion):
+            current = list(target.get(field) or [])
+            target[field] = current + [v for v in value.values if v not in current]
+        elif isinstance(value, transforms.ArrayRemove):
+            target[field] = [v for v in target.get(field) or [] if v not in value.values]
+        elif isinstance(value, transforms.Increment):
+            target[field] = (target.get(field) or 0) + value.value
+        else:
+            target[field] = copy.deepcopy(value)
+
+
+class MemoryDocumentSnapshot:
+    def __init__(self, reference, data, field_paths=None, read_time=None):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self.read_time = read_time
+        if data is not None and field_paths is not None:
+            data = {f: data[f] for f in field_paths if f in data}
+        self._data = data
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field_path):
+        value = _get_field(self._data or {}, field_path)
+        if value is _MISSING:
+            raise KeyError(field_path)
+        return copy.deepcopy(value)
+
+
+class MemoryDocumentChange:
+    def __init__(self, change_type, document, old_index, new_index):
+        self.type = change_type
+        self.document = document
+        self.old_index = old_index
+        self.new_index = new_index
+
+
+class MemoryWatch:
+    def __init__(self, client, query, callback):
+        self._client = client
+        self._query = query
+        self._callback = callback
+        self._docs = {}  # 문서 ID → 마지막으로 전달한 데이터
+        self.active = True
+
+    def unsubscribe(self):
+        self.active = False
+        self._client._remove_watch(self)
+
+    def _deliver(self, initial=False):
+        """현재 결과와 직전 결과를 비교해 변경분 전달 (디스패처 스레드에서 호출)"""
+        if not self.active:
+            return
+
+        snapshots = self._query._run(charge_latency=False)
+        current = {snap.id: snap for snap in snapshots}
+        read_time = datetime.now(timezone.utc)
+        old_order = list(self._docs)
+        changes = []
+
+        for doc_id in old_order:
+            if doc_id not in current:
+                reference = self._client.collection(self._query._collection).document(doc_id)
+                removed = MemoryDocumentSnapshot(reference, self._docs[doc_id], read_time=read_time)
+                changes.append(MemoryDocumentChange(ChangeType.REMOVED, removed, old_order.index(doc_id), -1))
+
+        for new_index, snap in enumerate(snapshots):
+            if snap.id not in self._docs:
+                changes.append(MemoryDocumentChange(ChangeType.ADDED, snap, -1, new_index))
+            elif self._docs[snap.id] != snap._data:
+                changes.append(MemoryDocumentChange(
+                    ChangeType.MODIFIED, snap, old_order.index(snap.id), new_index))
+
+        self._docs = {snap.id: snap._data for snap in snapshots}
+        if changes or initial:
+            try:
+                self._callback(snapshots, changes, read_time)
+            except Exception:
+                logger.exception("❌ 메모리 Firestore 리스너 콜백 오류")
+
+
+class MemoryQuery:
+    def __init__(self, client, collection, filters=(), fields=None, orders=(), limit=None, cursor=None):
+        self._client = client
+        self._collection = collection
+        self._filters = tuple(filters)
+        self._fields = fields
+        self._orders = tuple(orders)
+        self._limit = limit
+        self._cursor = cursor
+
+    def _copy(self, **changes):
+        params = {
+            'filters': self._filters, 'fields': self._fields, 'orders': self._orders,
+            'limit': self._limit, 'cursor': self._cursor,
+        }
+        params.update(changes)
+        return MemoryQuery(self._client, self._collection, **params)
+
+    def where(self, field_path=None, op_string=None, value=None, filter=None):
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        if op_string not in _OPERATORS:
+            raise ValueError(f"지원하지 않는 연산자: {op_string}")
+        return self._copy(filters=self._filters + ((field_path, op_string, value),))
+
+    def filter(self, field_path=None, op_string=None, value=None, filter=None):
+        return self.where(field_path, op_string, value, filter=filter)
+
+    def select(self, field_paths):
+        return self._copy(fields=list(field_paths))
+
+    def order_by(self, field_path, direction='ASCENDING'):
+        return self._copy(orders=self._orders + ((field_path, direction),))
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def start_after(self, document_fields_or_snapshot):
+        return self._copy(cursor=document_fields_or_snapshot)
+
+    def stream(self, transaction=None):
+        return iter(self._run())
+
+    def get(self, transaction=None):
+        return self._run()
+
+    def on_snapshot(self, callback):
+        return self._client._add_watch(self, callback)
+
+    def _matches(self, data):
+        for field_path, op, value in self._filters:
+            actual = _get_field(data, field_path)
+            if actual is _MISSING or not _OPERATORS[op](actual, value):
+                return False
+        # order_by 필드가 없는 문서는 결과에서 제외 (Firestore와 동일)
+        return all(_get_field(data, f) is not _MISSING for f, _ in self._orders if f != '__name__')
+
+    def _sort(self, items):
+        # 마지막 정렬 기준부터 안정 정렬을 반복해 여러 기준 정렬 구현, 동률은 문서 ID 순
+        items.sort(key=lambda item: item[0])
+        for field_path, direction in reversed(self._orders):
+            items.sort(
+                key=lambda item: _sort_key(item[0] if field_path == '__name__' else _get_field(item[1], field_path)),
+                reverse=direction == 'DESCENDING',
+            )
+        return items
+
+    def _after_cursor(self, items):
+        if self._cursor is None:
+            return items
+        if isinstance(self._cursor, dict):
+            cursor_id, cursor_data = self._cursor.get('__name__'), self._cursor
+        else:
+            cursor_id, cursor_data = self._cursor.id, self._cursor._data or {}
+
+        orders = self._orders or (('__name__', 'ASCENDING'),)
+        cursor_values = [
+            _sort_key(cursor_id if f == '__name__' else _get_field(cursor_data, f)) for f, _ in orders
+        ]
+
+        def is_after(item):
+            for (field_path, direction), cursor_value in zip(orders, cursor_values):
+                value = _sort_key(item[0] if field_path == '__name__' else _get_field(item[1], field_path))
+                if value != cursor_value:
+                    return value > cursor_value if direction != 'DESCENDING' else value < cursor_value
+            return item[0] > cursor_id if cursor_id is not None else False
+
+        return [item for item in items if is_after(item)]
+
+    def _run(self, charge_latency=True):
+        if charge_latency:
+            self._client._delay()
+        with self._client._lock:
+            items = [
+                (doc_id, copy.deepcopy(data))
+                for doc_id, data in self._client._collections.get(self._collection, {}).items()
+                if self._matches(data)
+            ]
+        items = self._after_cursor(self._sort(items))
+        if self._limit is not None:
+            items = items[:self._limit]
+
+        collection = self._client.collection(self._collection)
+        return [
+            MemoryDocumentSnapshot(collection.document(doc_id), data, self._fields)
+            for doc_id, data in items
+        ]
+
+
+class MemoryDocumentReference:
+    def __init__(self, client, collection, doc_id):
+        self._client = client
+        self._collection = collection
+        self.id = doc_id
+        self.path = f"{collection}/{doc_id}"
+
+    def get(self, field_paths=None, transaction=None):
+        self._client._delay()
+        return self._read(field_paths)
+
+    def _read(self, field_paths=None):
+        with self._client._lock:
+            data = copy.deepcopy(self._client._collections.get(self._collection, {}).get(self.id))
+        return MemoryDocumentSnapshot(self, data, field_paths, read_time=datetime.now(timezone.utc))
+
+    def set(self, document_data, merge=False):
+        self._client._delay()
+        self._client._commit([('set', self, document_data, merge)])
+
+    def create(self, document_data):
+        self._client._delay()
+        self._client._commit([('create', self, document_data, False)])
+
+    def update(self, field_updates):
+        self._client._delay()
+        self._client._commit([('update', self, field_updates, False)])
+
+    def delete(self):
+        self._client._delay()
+        self._client._commit([('delete', self, None, False)])
+
+
+class MemoryCollection(MemoryQuery):
+    def __init__(self, client, name):
+        super().__init__(client, name)
+        self.id = name
+
+    def document(self, document_id=None):
+        return MemoryDocumentReference(self._client, self._collection, document_id or uuid.uuid4().hex[:20])
+
+    def add(self, document_data):
+        reference = self.document()
+        reference.set(document_data)
+        return datetime.now(timezone.utc), reference
+
+
+class MemoryWriteBatch:
+    def __init__(self, client):
+        self._client = client
+        self._writes = []
+
+    def set(self, reference, document_data, merge=False):
+        self._writes.append(('set', reference, document_data, merge))
+
+    def create(self, reference, document_data):
+        self._writes.append(('create', reference, document_data, False))
+
+    def update(self, reference, field_updates):
+        self._writes.append(('update', reference, field_updates, False))
+
+    def delete(self, reference):
+        self._writes.append(('delete', reference, None, False))
+
+    def commit(self):
+        self._client._delay()
+        self._client._commit(self._writes)
+        return [datetime.now(timezone.utc)] * len(self._writes)
+
+
+class MemoryFirestore:
+    """오프라인 실행 / 부하 테스트용 인메모리 Firestore 클라이언트
+
+    앱이 사용하는 collection / where(filter) / select / order_by / limit / start_after /
+    stream / get / set / update / delete / batch / on_snapshot을 지원합니다.
+    읽기·쓰기 RPC마다 latency초(± jitter)의 지연을 넣어 네트워크 왕복을 흉내 낼 수 있으며,
+    리스너 콜백은 실제 클라이언트처럼 별도 스레드에서 호출됩니다.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        self._collections = {}
+        self._lock = threading.RLock()
+        self._watches = []
+        self._events = queue.Queue()
+        self.rpcs = 0
+        self.writes = 0
+
+        threading.Thread(target=self._dispatch, name='memory-firestore-watch', daemon=True).start()
+
+    @classmethod
+    def from_env(cls):
+        """환경 변수 설정으로 클라이언트 생성
+
+        FIRESTORE_LATENCY_MS / FIRESTORE_JITTER_MS: RPC마다 넣을 지연 (ms)
+        FIRESTORE_SEED_FILE: {컬렉션: {문서 ID: 데이터}} 형식의 초기 데이터 JSON
+        """
+        client = cls(
+            latency=float(os.environ.get('FIRESTORE_LATENCY_MS', '0')) / 1000,
+            jitter=float(os.environ.get('FIRESTORE_JITTER_MS', '0')) / 1000,
+        )
+        seed_file = os.environ.get('FIRESTORE_SEED_FILE')
+        if seed_file:
+            with open(seed_file, encoding='utf-8') as f:
+                client.load(json.load(f))
+        return client
+
+    def collection(self, name):
+        return MemoryCollection(self, name)
+
+    def batch(self):
+        return MemoryWriteBatch(self)
+
+    def load(self, data):
+        """초기 데이터 한 번에 넣기 ({컬렉션: {문서 ID: 데이터}})"""
+        writes = [
+            ('set', self.collection(name).document(doc_id), doc, False)
+            for name, docs in data.items()
+            for doc_id, doc in docs.items()
+        ]
+        self._commit(writes)
+
+    def _next_delay(self):
+        with self._lock:
+            self.rpcs += 1
+            if not (self.latency or self.jitter):
+                return 0
+            return max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+
+    def _delay(self):
+        delay = self._next_delay()
+        if delay:
+            time.sleep(delay)
+
+    async def _adelay(self):
+        delay = self._next_delay()
+        if delay:
+            await asyncio.sleep(delay)
+
+    def _commit(self, writes):
+        """쓰기 목록을 원자적으로 적용 (하나라도 실패하면 아무것도 바꾸지 않음)"""
+        with self._lock:
+            staged = {}
+
+            def current(reference):
+                key = (reference._collection, reference.id)
+                if key not in staged:
+                    staged[key] = copy.deepcopy(self._collections.get(reference._collection, {}).get(reference.id))
+                return key
+
+            for op, reference, data, merge in writes:
+                key = current(reference)
+                existing = staged[key]
+                if op == 'update':
+                    if existing is None:
+                        raise NotFound(f"No document to update: {reference.path}")
+                    _apply_update(existing, data)
+                elif op == 'create':
+                    if existing is not None:
+                        raise AlreadyExists(f"Document already exists: {reference.path}")
+                    staged[key] = {}
+                    _apply_update(staged[key], data)
+                elif op == 'set':
+                    if not merge or existing is None:
+                        staged[key] = {}
+                    _apply_update(staged[key], data)
+                elif op == 'delete':
+                    staged[key] = None
+
+            for (collection, doc_id), data in staged.items():
+                docs = self._collections.setdefault(collection, {})
+                if data is None:
+                    docs.pop(doc_id, None)
+                else:
+                    docs[doc_id] = data
+            self.writes += len(writes)
+
+            collections = {collection for collection, _ in staged}
+            for watch in self._watches:
+                if watch._query._collection in collections:
+                    self._events.put((watch, False))
+
+    def _add_watch(self, query, callback):
+        watch = MemoryWatch(self, query, callback)
+        with self._lock:
+            self._watches.append(watch)
+        self._events.put((watch, True))
+        return watch
+
+    def _remove_watch(self, watch):
+        with self._lock:
+            if watch in self._watches:
+                self._watches.remove(watch)
+
+    def _dispatch(self):
+        while True:
+            watch, initial = self._events.get()
+            # 같은 리스너에 쌓인 이벤트는 최신 상태 한 번으로 합쳐서 전달
+            pending = [(watch, initial)]
+            while True:
+                try:
+                    pending.append(self._events.get_nowait())
+                except queue.Empty:
+                    break
+            seen = set()
+            for item_watch, item_initial in pending:
+                if id(item_watch) in seen and not item_initial:
+                    continue
+                seen.add(id(item_watch))
+                item_watch._deliver(initial=item_initial)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'collections': {name: len(docs) for name, docs in self._collections.items()},
+                'rpcs': self.rpcs,
+                'writes': self.writes,
+                'watches': len(self._watches),
+            }
+
+
+class AsyncMemoryDocumentReference:
+    def __init__(self, reference):
+        self._reference = reference
+        self._client = reference._client
+        self._collection = reference._collection
+        self.id = reference.id
+        self.path = reference.path
+
+    async def get(self, field_paths=None, transaction=None):
+        await self._client._adelay()
+        snapshot = self._reference._read(field_paths)
+        snapshot.reference = self
+        return snapshot
+
+    async def set(self, document_data, merge=False):
+        await self._client._adelay()
+        self._client._commit([('set', self, document_data, merge)])
+
+    async def create(self, document_data):
+        await self._client._adelay()
+        self._client._commit([('create', self, document_data, False)])
+
+    async def update(self, field_updates):
+        await self._client._adelay()
+        self._client._commit([('update', self, field_updates, False)])
+
+    async def delete(self):
+        await self._client._adelay()
+        self._client._commit([('delete', self, None, False)])
+
+
+class AsyncMemoryQuery:
+    def __init__(self, query):
+        self._query = query
+
+    def where(self, field_path=None, op_string=None, value=None, filter=None):
+        return AsyncMemoryQuery(self._query.where(field_path, op_string, value, filter=filter))
+
+    def filter(self, field_path=None, op_string=None, value=None, filter=None):
+        return self.where(field_path, op_string, value, filter=filter)
+
+    def select(self, field_paths):
+        return AsyncMemoryQuery(self._query.select(field_paths))
+
+    def order_by(self, field_path, direction='ASCENDING'):
+        return AsyncMemoryQuery(self._query.order_by(field_path, direction))
+
+    def limit(self, count):
+        return AsyncMemoryQuery(self._query.limit(count))
+
+    def start_after(self, document_fields_or_snapshot):
+        return AsyncMemoryQuery(self._query.start_after(document_fields_or_snapshot))
+
+    async def stream(self, transaction=None):
+        for snapshot in await self.get():
+            yield snapshot
+
+    async def get(self, transaction=None):
+        await self._query._client._adelay()
+        snapshots = self._query._run(charge_latency=False)
+        for snapshot in snapshots:
+            snapshot.reference = AsyncMemoryDocumentReference(snapshot.reference)
+        return snapshots
+
+
+class AsyncMemoryCollection(AsyncMemoryQuery):
+    def __init__(self, collection):
+        super().__init__(collection)
+        self.id = collection.id
+
+    def document(self, document_id=None):
+        return AsyncMemoryDocumentReference(self._query.document(document_id))
+
+
+class AsyncMemoryWriteBatch(MemoryWriteBatch):
+    async def commit(self):
+        await self._client._adelay()
+        self._client._commit(self._writes)
+        return [datetime.now(timezone.utc)] * len(self._writes)
+
+
+class AsyncMemoryFirestore:
+    """MemoryFirestore의 비동기 인터페이스 (google.cloud.firestore.AsyncClient 대역)
+
+    같은 MemoryFirestore 데이터를 공유하므로 동기 클라이언트의 리스너에도 변경이 전달됩니다.
+    지연은 asyncio.sleep으로 넣어 이벤트 루프를 막지 않습니다.
+    """
+
+    def __init__(self, client):
+        self._client = client
+
+    def collection(self, name):
+        return AsyncMemoryCollection(self._client.collection(name))
+
+    def batch(self):
+        return AsyncMemoryWriteBatch(self._client)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+characters 문서의 base64 data URL 이미지를 블롭 저장소로 옮기는 마이그레이션 스크립트
+
+image_url에 data URL이 들어있는 문서마다 원본과 썸네일을 블롭 저장소(BLOB_STORE 설정)에
+저장하고, 문서의 image_url을 URL로 바꾼 뒤 image_ref / thumbnail_urls 참조를 추가합니다.
+
+사용법:
+    python migrate_character_images.py --dry-run     # 대상 문서와 줄어드는 크기만 출력
+    python migrate_character_images.py --page-size 20
+    BLOB_PUBLIC_BASE_URL=http://192.168.0.12:5050 python migrate_character_images.py   # 로컬 저장소는 서버 주소 필요
+"""
+
+import argparse
+
+from firebase import init_firebase
+from blob_store import LocalBlobStore, get_blob_store, parse_data_url, store_character_image
+
+DEFAULT_CREDENTIALS = "lg-dx-school-5eaae-firebase-adminsdk-fbsvc-41ea7b7d71.json"
+
+
+def iter_character_pages(db, page_size):
+    """문서 ID 순서로 characters 컬렉션을 페이지 단위로 조회"""
+    last_doc = None
+    while True:
+        query = db.collection('characters').order_by('__name__').limit(page_size)
+        if last_doc is not None:
+            query = query.start_after(last_doc)
+
+        docs = list(query.stream())
+        if not docs:
+            return
+        yield docs
+        last_doc = docs[-1]
+
+
+def migrate(db, store, page_size=20, dry_run=False):
+    stats = {'scanned': 0, 'migrated': 0, 'skipped': 0, 'failed': 0, 'bytes_before': 0, 'bytes_after': 0}
+
+    for docs in iter_character_pages(db, page_size):
+        batch = db.batch()
+        pending = 0
+
+        for doc in docs:
+            stats['scanned'] += 1
+            data = doc.to_dict()
+            image_url = data.get('image_url') or ''
+
+            if data.get('image_ref') or not image_url.startswith('data:image'):
+                stats['skipped'] += 1
+                continue
+
+            try:
+                image_bytes, content_type = parse_data_url(image_url)
+                stats['migrated'] += 1
+                stats['bytes_before'] += len(image_url)
+
+                if dry_run:
+                    print(f"🔎 {doc.id}: {len(image_url):,} bytes (이미지 {len(image_bytes):,} bytes)")
+                    continue
+
+                fields = store_character_image(store, image_bytes, content_type)
+                batch.update(doc.reference, fields)
+                pending += 1
+
+                stats['bytes_after'] += len(str(fields))
+                print(f"✅ {doc.id}: {len(image_url):,} bytes → 참조 {len(str(fields)):,} bytes")
+
+            except Exception as e:
+                stats['failed'] += 1
+                print(f"❌ {doc.id} 변환 실패: {e}")
+
+        if pending:
+            batch.commit()
+            print(f"📤 {pending}개 문서 업데이트 완료")
+
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='캐릭터 이미지를 블롭 저장소로 마이그레이션')
+    parser.add_argument('--credentials', default=DEFAULT_CREDENTIALS, help='Firebase 서비스 계정 키 경로')
+    parser.add_argument('--page-size', type=int, default=20, help='한 번에 읽고 커밋할 문서 수')
+    parser.add_argument('--dry-run', action='store_true', help='저장/업데이트 없이 대상만 확인')
+    args = parser.parse_args()
+
+    print("🚀 캐릭터 이미지 마이그레이션 시작!")
+    if args.dry_run:
+        print("💡 dry-run: 블롭 저장소와 Firestore를 변경하지 않습니다")
+
+    store = get_blob_store()
+    if isinstance(store, LocalBlobStore) and not store.base_url:
+        # 앱이 Firestore의 image_url을 그대로 불러오므로 상대 URL은 저장하지 않음
+        parser.error("로컬 블롭 저장소는 BLOB_PUBLIC_BASE_URL(앱에서 접근 가능한 서버 주소)이 필요합니다")
+
+    db = init_firebase(args.credentials)
+    stats = migrate(db, store, args.page_size, args.dry_run)
+
+    print("=" * 50)
+    print(f"🏁 검사 {stats['scanned']}개, 변환 {stats['migrated']}개, "
+          f"건너뜀 {stats['skipped']}개, 실패 {stats['failed']}개")
+    if args.dry_run:
+        print(f"📉 옮길 data URL 크기: {stats['bytes_before']:,} bytes")
+    else:
+        print(f"📉 이미지 필드 크기: {stats['bytes_before']:,} → {stats['bytes_after']:,} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+# 요청/단계 응답 시간 히스토그램 구간 (초)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """단조 증가 카운터"""
+
+    type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield self.name, list(zip(self.labelnames, key)), value
+
+
+class Histogram:
+    """누적 구간 히스토그램 (Prometheus histogram과 같은 형식)"""
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) + (float('inf'),)
+        self._values = {}  # 라벨 → [구간별 개수, 합계, 개수]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            values = {key: (list(entry[0]), entry[1], entry[2]) for key, entry in self._values.items()}
+        for key, (counts, total, count) in sorted(values.items()):
+            labels = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket", labels + [('le', _format_value(bound))], cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, count
+
+
+class MetricsRegistry:
+    """메트릭 모음 + Prometheus 텍스트 형식 출력
+
+    collector는 스크랩할 때마다 호출되어 (이름, 타입, 설명, [(라벨 dict, 값)]) 목록을 돌려주는
+    함수로, 각 캐시의 stats() 같은 기존 통계를 그대로 내보낼 때 사용합니다.
+
+    값은 모두 이 프로세스의 것입니다. gunicorn 워커가 여럿이면 /metrics는 요청을 받은 워커의 값만
+    보여주므로, 모든 샘플에 worker(프로세스 ID) 라벨을 붙입니다 - 합계는 Prometheus에서
+    sum without (worker) (...)로 구하고, 카운터는 워커가 재시작하면 0부터 다시 셉니다.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector):
+        self._collectors.append(collector)
+
+    def render(self):
+        # fork 뒤의 워커 프로세스 ID (import 시점에 정하면 preload 때 모든 워커가 같은 값)
+        worker = str(os.getpid())
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels([('worker', worker)] + labels)} {_format_value(value)}")
+
+        for collector in self._collectors:
+            try:
+                families = collector()
+            except Exception as e:
+                logger.warning("메트릭 수집 실패 (%s): %s", getattr(collector, '__name__', collector), e)
+                continue
+            for name, metric_type, documentation, samples in families:
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for labels, value in samples:
+                    labels = sorted({**labels, 'worker': worker}.items())
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+REQUEST_LATENCY = REGISTRY.histogram(
+    'http_request_duration_seconds', 'HTTP 요청 처리 시간', ['endpoint', 'method', 'status'])
+STAGE_LATENCY = REGISTRY.histogram(
+    'stage_duration_seconds', '요청 내부 단계별 처리 시간 (firestore_query, decode, resize, generation, download)',
+    ['stage'])
+CACHE_REQUESTS = REGISTRY.counter(
+    'cache_requests_total', '캐시 조회 결과', ['cache', 'result'])
+LOG_RECORDS_DROPPED = REGISTRY.counter(
+    'log_records_dropped_total', '로그 대기열이 가득 차서 버린 로그 수')
+
+
+def timed(stage):
+    """with timed('firestore_query'): ... 형태로 단계 처리 시간 기록"""
+    return STAGE_LATENCY.time(stage=stage)
+
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.inc(cache=cache, result='hit' if hit else 'miss')
+
+
+def cache_stats_collector(caches):
+    """stats()의 hits / misses를 가진 캐시들을 cache_hits / cache_misses로 내보내는 collector
+
+    Args:
+        caches: {캐시 이름: stats()를 가진 객체}
+    """
+    def collect():
+        hits, misses = [], []
+        for name, cache in caches.items():
+            stats = cache.stats()
+            hits.append(({'cache': name}, stats.get('hits', 0)))
+            misses.append(({'cache': name}, stats.get('misses', 0)))
+        return [
+            ('cache_hits', 'counter', '캐시 적중 수 (프로세스 시작 이후)', hits),
+            ('cache_misses', 'counter', '캐시 미스 수 (프로세스 시작 이후)', misses),
+        ]
+    return collect
+
+
+def instrument_flask(app):
+    """모든 요청의 처리 시간을 기록하고 /metrics 경로 추가"""
+    from flask import Response, g, request
+
+    @app.before_request
+    def _start_timer():
+        g._request_start = time.perf_counter()
+
+    @app.after_request
+    def _record_latency(response):
+        start = getattr(g, '_request_start', None)
+        if start is not None:
+            endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            REQUEST_LATENCY.observe(
+                time.perf_counter() - start,
+                endpoint=endpoint, method=request.method, status=str(response.status_code),
+            )
+        return response
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+
+class JsonFormatter(logging.Formatter):
+    """한 줄에 JSON 객체 하나로 로그 출력
+
+    logger.info("...", extra={'fields': {...}})로 넘긴 값은 최상위 키로 함께 기록됩니다.
+    """
+
+    def format(self, record):
+        entry = {
+            'ts': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        entry.update(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """대기열이 가득 차면 기다리지 않고 로그를 버림"""
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+_listener = None
+
+
+def setup_logging(level=None, fmt=None, max_queue=10000):
+    """루트 로거를 백그라운드 대기열 방식으로 설정
+
+    요청 스레드는 대기열에 넣기만 하고, 실제 출력은 QueueListener 스레드가 합니다.
+
+    LOG_LEVEL: DEBUG | INFO(기본) | WARNING ... (DEBUG일 때만 요청 본문 등 상세 로그 출력)
+    LOG_FORMAT: json(기본) | text
+    """
+    global _listener
+
+    if _listener is not None:
+        return _listener
+
+    level = level or os.environ.get('LOG_LEVEL', 'INFO').upper()
+    fmt = fmt or os.environ.get('LOG_FORMAT', 'json')
+
+    handler = logging.StreamHandler(sys.stdout)
+    if fmt == 'text':
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+    else:
+        handler.setFormatter(JsonFormatter())
+
+    log_queue = queue.Queue(maxsize=max_queue)
+    root = logging.getLogger()
+    root.handlers[:] = [_DroppingQueueHandler(log_queue)]
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return _listener
+
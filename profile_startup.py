@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+서버 시작(import) 시간 프로파일
+
+새 인터프리터에서 `python -X importtime -c "import app"`을 실행해 모듈별 import 시간을 모으고,
+누적 시간이 큰 모듈과 전체 시간을 JSON으로 출력합니다.
+배포 빌드에 넣어 콜드 스타트가 다시 느려지는 것을 막는 용도입니다.
+- --max-import-ms: 전체 import 시간 상한
+- --forbid: import 시점에 로드되면 안 되는 모듈 (지연 초기화 대상, 기본값 FORBIDDEN_MODULES)
+둘 중 하나라도 어기면 종료 코드 1로 끝납니다.
+
+사용법:
+    python profile_startup.py
+    python profile_startup.py --module asgi_app --top 30 --output startup_profile.json
+    python profile_startup.py --max-import-ms 800 --forbid google.cloud.firestore,grpc
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+
+# import app 시점에는 로드되지 않아야 하는 무거운 모듈 (첫 요청 / 워밍업에서 로드)
+FORBIDDEN_MODULES = ('google.cloud.firestore', 'grpc', 'PIL', 'requests', 'httpx', 'firebase_admin')
+
+_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$')
+
+
+def run_importtime(module, env=None):
+    """module을 import하는 새 인터프리터의 -X importtime 출력 → [(이름, self_us, 누적_us, 깊이)]
+
+    static/ 등을 만들지 않도록 임시 디렉터리에서 실행합니다.
+    """
+    root = os.path.dirname(os.path.abspath(__file__))
+    child_env = dict(os.environ, **(env or {}))
+    child_env['PYTHONPATH'] = os.pathsep.join(filter(None, [root, child_env.get('PYTHONPATH')]))
+
+    with tempfile.TemporaryDirectory(prefix='profile_startup_') as workdir:
+        proc = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            cwd=workdir, env=child_env, capture_output=True, text=True,
+        )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} 실패:\n{proc.stderr[-2000:]}")
+
+    entries = []
+    for line in proc.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return entries
+
+
+def summarize(entries, top):
+    """누적 시간 상위 모듈 / 전체 import 시간"""
+    # 깊이 0인 항목의 누적 시간 합 = 전체 import 시간
+    total_us = sum(cumulative for _, _, cumulative, depth in entries if depth == 0)
+    ranked = sorted(entries, key=lambda e: e[2], reverse=True)[:top]
+    return {
+        'total_ms': round(total_us / 1000, 1),
+        'module_count': len(entries),
+        'top': [
+            {'module': name, 'cumulative_ms': round(cumulative / 1000, 1), 'self_ms': round(self_us / 1000, 1)}
+            for name, self_us, cumulative, _ in ranked
+        ],
+    }
+
+
+def find_forbidden(entries, prefixes):
+    """prefixes로 시작하는(또는 같은) 모듈 중 실제로 로드된 것"""
+    loaded = {name for name, _, _, _ in entries}
+    return sorted(
+        name for name in loaded
+        if any(name == prefix or name.startswith(prefix + '.') for prefix in prefixes)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='서버 시작(import) 시간 프로파일')
+    parser.add_argument('--module', default='app', help='import할 모듈 (app / asgi_app)')
+    parser.add_argument('--top', type=int, default=20, help='출력할 상위 모듈 수')
+    parser.add_argument('--max-import-ms', type=float, default=None, help='전체 import 시간 상한 (ms)')
+    parser.add_argument('--forbid', default=','.join(FORBIDDEN_MODULES),
+                        help="import 시점에 로드되면 안 되는 모듈 (쉼표 구분, ''이면 검사 안 함)")
+    parser.add_argument('--output', default=None, help='결과 JSON 파일 경로 (기본: stdout)')
+    args = parser.parse_args()
+
+    entries = run_importtime(args.module)
+    report = {'module': args.module, 'python': sys.version.split()[0], **summarize(entries, args.top)}
+
+    prefixes = [p.strip() for p in args.forbid.split(',') if p.strip()]
+    report['forbidden_loaded'] = find_forbidden(entries, prefixes)
+
+    failures = []
+    if report['forbidden_loaded']:
+        failures.append(f"import 시점에 로드된 모듈: {', '.join(report['forbidden_loaded'])}")
+    if args.max_import_ms is not None and report['total_ms'] > args.max_import_ms:
+        failures.append(f"전체 import 시간 {report['total_ms']}ms > {args.max_import_ms}ms")
+    report['ok'] = not failures
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    for failure in failures:
+        print(f"❌ {failure}", file=sys.stderr)
+    return 0 if report['ok'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def normalize_prompt(prompt):
+    """대소문자와 공백 차이를 무시하도록 프롬프트 정규화"""
+    return ' '.join(prompt.lower().split())
+
+
+def prompt_cache_key(prompt, style, size):
+    """정규화된 프롬프트 + 스타일 + 크기로 캐시 키 생성"""
+    raw = f"{normalize_prompt(prompt)}|{normalize_prompt(style or '')}|{size[0]}x{size[1]}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class SingleFlight:
+    """같은 키로 동시에 들어온 호출을 하나로 합침
+
+    먼저 들어온 호출만 함수를 실행하고, 나머지는 그 결과(또는 예외)를 함께 받습니다.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}  # 키 → [완료 이벤트, 결과, 예외]
+
+    def do(self, key, func):
+        """Returns: (결과, 공유 여부)"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = [threading.Event(), None, None]
+                self._calls[key] = call
+
+        if not leader:
+            call[0].wait()
+            if call[2] is not None:
+                raise call[2]
+            return call[1], True
+
+        try:
+            call[1] = func()
+        except Exception as e:
+            call[2] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call[0].set()
+
+        return call[1], False
+
+
+class PromptCache:
+    """프롬프트 생성 결과(이미지 바이트) LRU 캐시
+
+    항목 수(max_entries)와 전체 바이트(max_bytes) 중 하나라도 넘으면 오래 안 쓴 항목부터
+    제거합니다. 같은 키의 생성이 진행 중이면 SingleFlight로 그 결과를 기다립니다.
+    """
+
+    def __init__(self, max_entries=64, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+        self._entries = OrderedDict()  # 키 → (이미지 바이트, content type)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+        self._async_flights = {}  # 키 → 진행 중인 asyncio 태스크 (asgi_app.py)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, data, content_type):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[0])
+
+            # 한 항목이 전체 한도보다 크면 캐시하지 않음
+            if self.max_bytes and len(data) > self.max_bytes:
+                return
+
+            self._entries[key] = (data, content_type)
+            self._bytes += len(data)
+
+            while self._entries and (
+                len(self._entries) > self.max_entries
+                or (self.max_bytes and self._bytes > self.max_bytes)
+            ):
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def get_or_generate(self, key, generate):
+        """캐시된 결과를 반환하거나 generate()로 생성 (동시 요청은 한 번만 생성)
+
+        Args:
+            generate: (이미지 바이트, content type)을 돌려주는 함수
+        """
+        entry = self.get(key)
+        if entry is not None:
+            with self._lock:
+                self.hits += 1
+            return entry
+
+        def generate_and_store():
+            # 앞선 생성이 방금 끝난 경우 다시 생성하지 않음
+            entry = self.get(key)
+            if entry is not None:
+                return entry
+            data, content_type = generate()
+            self.put(key, data, content_type)
+            return data, content_type
+
+        entry, shared = self._flight.do(key, generate_and_store)
+        with self._lock:
+            if shared:
+                self.coalesced += 1
+            else:
+                self.misses += 1
+        return entry
+
+    async def aget_or_generate(self, key, agenerate):
+        """get_or_generate()의 비동기 버전 (같은 이벤트 루프 안의 동시 요청은 한 번만 생성)
+
+        Args:
+            agenerate: (이미지 바이트, content type)을 돌려주는 코루틴 함수
+        """
+        entry = self.get(key)
+        if entry is not None:
+            with self._lock:
+                self.hits += 1
+            return entry
+
+        task = self._async_flights.get(key)
+        shared = task is not None
+        if not shared:
+            async def generate_and_store():
+                try:
+                    data, content_type = await agenerate()
+                    self.put(key, data, content_type)
+                    return data, content_type
+                finally:
+                    self._async_flights.pop(key, None)
+
+            task = asyncio.ensure_future(generate_and_store())
+            self._async_flights[key] = task
+
+        # 기다리던 요청 하나가 끊겨도 함께 기다리는 요청의 생성은 취소되지 않도록 shield
+        entry = await asyncio.shield(task)
+        with self._lock:
+            if shared:
+                self.coalesced += 1
+            else:
+                self.misses += 1
+        return entry
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+            }
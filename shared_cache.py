@@ -0,0 +1,406 @@
+"""
+이름별 TTL 캐시 (단일 비행 조회 + stale-while-revalidate)
+
+- 만료 전(ttl): 저장된 값을 그대로 반환
+- 만료 후 stale_ttl 동안: 이전 값을 바로 반환하고, 갱신은 백그라운드에서 한 번만 실행
+- 그 이후 / 처음: 같은 키의 동시 요청 중 하나만 조회하고 나머지는 그 결과를 기다림
+
+저장소는 CACHE_BACKEND로 고릅니다.
+- local(기본): 프로세스 안의 dict
+- socket: 호스트의 캐시 서버(유닉스 소켓)를 모든 gunicorn 워커가 공유.
+  갱신 임대(lease)도 서버에 있으므로 TTL이 끝나도 Firestore 조회는 호스트 전체에서 한 번만 나갑니다.
+  gunicorn.conf.py가 CACHE_BACKEND=socket일 때 캐시 서버를 함께 띄웁니다.
+
+캐시 서버 단독 실행:
+    CACHE_AUTHKEY=<비밀값> python shared_cache.py --socket /tmp/dx_cache.sock
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import pickle
+import secrets
+import subprocess
+import sys
+import threading
+import time
+from collections import OrderedDict
+from multiprocessing.managers import BaseManager
+
+from observability import record_cache
+from prompt_cache import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET = '/tmp/dx_cache.sock'
+
+
+class CacheStore:
+    """키 → (값, 저장 시각) 저장소 + 키별 갱신 임대
+
+    항목 수(max_entries)나 전체 크기(max_bytes, pickle 기준) 중 하나라도 넘으면
+    테넌트와 상관없이 가장 오래 안 쓴 항목부터 제거합니다.
+    시각은 여러 프로세스가 같이 비교하므로 time.time()을 사용합니다.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self._entries = OrderedDict()  # 키 → (값, 저장 시각, 크기)
+        self._bytes = 0
+        self._leases = {}  # 키 → 임대 만료 시각
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0], entry[1]
+
+    def set(self, key, value):
+        size = len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        with self._lock:
+            self._pop(key)
+            # 한 항목이 전체 한도보다 크면 저장하지 않음
+            if self.max_bytes and size > self.max_bytes:
+                return
+
+            self._entries[key] = (value, time.time(), size)
+            self._bytes += size
+            while self._entries and (
+                len(self._entries) > self.max_entries
+                or (self.max_bytes and self._bytes > self.max_bytes)
+            ):
+                self._pop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _pop(self, key):
+        # self._lock을 잡은 상태에서 호출
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def delete(self, key):
+        with self._lock:
+            self._pop(key)
+
+    def delete_prefix(self, prefix):
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                self._pop(key)
+
+    def try_lease(self, key, seconds):
+        """키 갱신 권한 획득 (이미 다른 쪽이 갱신 중이면 False, 임대는 seconds초 뒤 자동 만료)"""
+        now = time.time()
+        with self._lock:
+            if self._leases.get(key, 0) > now:
+                return False
+            self._leases[key] = now + seconds
+            return True
+
+    def release_lease(self, key):
+        with self._lock:
+            self._leases.pop(key, None)
+
+    def usage(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'evictions': self.evictions,
+            }
+
+
+def _store_from_env():
+    return CacheStore(
+        int(os.environ.get('CACHE_MAX_ENTRIES', '1024')),
+        int(os.environ.get('CACHE_MAX_BYTES', str(64 * 1024 * 1024))),
+    )
+
+
+class CacheManager(BaseManager):
+    """CacheStore 하나를 유닉스 소켓으로 공유하는 매니저"""
+
+
+_server_store = None
+
+
+def _get_server_store():
+    global _server_store
+    if _server_store is None:
+        _server_store = _store_from_env()
+    return _server_store
+
+
+CacheManager.register('get_store', callable=_get_server_store)
+
+
+def _authkey():
+    authkey = os.environ.get('CACHE_AUTHKEY')
+    if not authkey:
+        raise RuntimeError('CACHE_AUTHKEY가 설정되지 않았습니다')
+    return authkey.encode()
+
+
+def serve(socket_path=DEFAULT_SOCKET):
+    """캐시 서버 실행 (소켓 파일은 소유자만 접근 가능)"""
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+    server = CacheManager(address=socket_path, authkey=_authkey()).get_server()
+    os.chmod(socket_path, 0o600)
+    logger.info("🗄️ 캐시 서버 시작: %s", socket_path)
+    server.serve_forever()
+
+
+def start_cache_server(socket_path=None):
+    """캐시 서버를 자식 프로세스로 시작 (gunicorn 마스터의 on_starting에서 호출)
+
+    CACHE_AUTHKEY가 없으면 임의 값을 만들어 환경 변수에 넣으므로, 이후 fork되는 워커가 그대로 물려받습니다.
+    """
+    socket_path = socket_path or os.environ.get('CACHE_SOCKET', DEFAULT_SOCKET)
+    os.environ.setdefault('CACHE_AUTHKEY', secrets.token_hex(16))
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--socket', socket_path])
+
+    # 워커가 접속하기 전에 소켓이 만들어질 때까지 잠시 대기
+    deadline = time.monotonic() + 5
+    while not os.path.exists(socket_path) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return process
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_cache_store():
+    """CACHE_BACKEND에 맞는 공용 저장소 (socket 서버에 접속할 수 없으면 local로 대체)"""
+    global _store
+
+    with _store_lock:
+        if _store is not None:
+            return _store
+
+        if os.environ.get('CACHE_BACKEND', 'local') == 'socket':
+            socket_path = os.environ.get('CACHE_SOCKET', DEFAULT_SOCKET)
+            try:
+                manager = CacheManager(address=socket_path, authkey=_authkey())
+                manager.connect()
+                _store = manager.get_store()
+                logger.info("🗄️ 공유 캐시 서버 사용: %s", socket_path)
+                return _store
+            except Exception as e:
+                logger.warning("❌ 공유 캐시 서버 접속 실패 (프로세스 내 캐시로 대체): %s", e)
+
+        _store = _store_from_env()
+        return _store
+
+
+def cache_backend_name():
+    return 'local' if isinstance(get_cache_store(), CacheStore) else 'socket'
+
+
+class SharedCache:
+    """이름 하나에 해당하는 TTL 캐시
+
+    Args:
+        name: 캐시 이름 (키 접두어, 메트릭 라벨). CACHE_TTL_<NAME> 환경 변수로 ttl을 바꿀 수 있습니다.
+        ttl: 값을 그대로 쓰는 시간 (초)
+        stale_ttl: ttl이 지난 뒤 이전 값을 반환하면서 백그라운드로 갱신하는 시간 (초, 기본 ttl과 같음)
+        refresh_timeout: 다른 요청 / 워커의 조회를 기다리는 최대 시간 (초)
+
+    조회 함수가 None을 돌려주면 저장하지 않습니다 (다음 요청에서 다시 조회).
+    통계는 프로세스별로 집계됩니다.
+    """
+
+    def __init__(self, name, ttl, stale_ttl=None, refresh_timeout=30, store=None):
+        self.name = name
+        self.ttl = float(os.environ.get(f'CACHE_TTL_{name.upper()}', ttl))
+        self.stale_ttl = self.ttl if stale_ttl is None else stale_ttl
+        self.refresh_timeout = refresh_timeout
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.refreshes = 0
+        self.errors = 0
+
+        self._store = store
+        self._flight = SingleFlight()
+        self._async_flights = {}  # 키 → 진행 중인 asyncio 태스크 (asgi_app.py)
+        self._refresh_tasks = set()
+        self._lock = threading.Lock()
+
+    @property
+    def store(self):
+        if self._store is None:
+            self._store = get_cache_store()
+        return self._store
+
+    def _key(self, key):
+        return f"{self.name}:{key}"
+
+    def _lookup(self, full_key):
+        """Returns: ('fresh' | 'stale' | None, 값)"""
+        entry = self.store.get(full_key)
+        if entry is None:
+            return None, None
+        value, stored_at = entry
+        age = time.time() - stored_at
+        if age < self.ttl:
+            return 'fresh', value
+        if age < self.ttl + self.stale_ttl:
+            return 'stale', value
+        return None, None
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _cached(self, full_key):
+        """Returns: (적중 여부, 값, 백그라운드 갱신을 맡았는지 여부)"""
+        state, value = self._lookup(full_key)
+        record_cache(self.name, hit=state is not None)
+        if state == 'fresh':
+            self._count('hits')
+            return True, value, False
+        if state == 'stale':
+            self._count('stale_hits')
+            return True, value, self.store.try_lease(full_key, self.refresh_timeout)
+        return False, None, False
+
+    def _save(self, full_key, value):
+        if value is None:
+            self.store.delete(full_key)
+        else:
+            self.store.set(full_key, value)
+
+    def get_or_load(self, key, load):
+        """캐시된 값을 반환하거나 load()로 조회해 저장"""
+        full_key = self._key(key)
+        found, value, refresh = self._cached(full_key)
+        if found:
+            if refresh:
+                threading.Thread(target=self._refresh, args=(full_key, load), daemon=True).start()
+            return value
+
+        value, shared = self._flight.do(full_key, lambda: self._load(full_key, load))
+        self._count('coalesced' if shared else 'misses')
+        return value
+
+    def _load(self, full_key, load):
+        # 다른 워커가 같은 키를 조회 중이면 그 결과가 저장될 때까지 대기
+        deadline = time.monotonic() + self.refresh_timeout
+        leased = self.store.try_lease(full_key, self.refresh_timeout)
+        while not leased and time.monotonic() < deadline:
+            time.sleep(0.05)
+            state, value = self._lookup(full_key)
+            if state is not None:
+                return value
+            leased = self.store.try_lease(full_key, self.refresh_timeout)
+
+        try:
+            value = load()
+            self._save(full_key, value)
+            return value
+        finally:
+            if leased:
+                self.store.release_lease(full_key)
+
+    def _refresh(self, full_key, load):
+        try:
+            self._save(full_key, load())
+            self._count('refreshes')
+        except Exception as e:
+            self._count('errors')
+            logger.warning("❌ 캐시 갱신 실패 (%s): %s", full_key, e)
+        finally:
+            self.store.release_lease(full_key)
+
+    async def aget_or_load(self, key, aload):
+        """get_or_load()의 비동기 버전
+
+        Args:
+            aload: 값을 돌려주는 코루틴 함수
+        """
+        full_key = self._key(key)
+        found, value, refresh = self._cached(full_key)
+        if found:
+            if refresh:
+                task = asyncio.ensure_future(self._arefresh(full_key, aload))
+                self._refresh_tasks.add(task)
+                task.add_done_callback(self._refresh_tasks.discard)
+            return value
+
+        task = self._async_flights.get(full_key)
+        shared = task is not None
+        if not shared:
+            task = asyncio.ensure_future(self._aload(full_key, aload))
+            self._async_flights[full_key] = task
+            task.add_done_callback(lambda _: self._async_flights.pop(full_key, None))
+
+        value = await asyncio.shield(task)
+        self._count('coalesced' if shared else 'misses')
+        return value
+
+    async def _aload(self, full_key, aload):
+        deadline = time.monotonic() + self.refresh_timeout
+        leased = self.store.try_lease(full_key, self.refresh_timeout)
+        while not leased and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+            state, value = self._lookup(full_key)
+            if state is not None:
+                return value
+            leased = self.store.try_lease(full_key, self.refresh_timeout)
+
+        try:
+            value = await aload()
+            self._save(full_key, value)
+            return value
+        finally:
+            if leased:
+                self.store.release_lease(full_key)
+
+    async def _arefresh(self, full_key, aload):
+        try:
+            self._save(full_key, await aload())
+            self._count('refreshes')
+        except Exception as e:
+            self._count('errors')
+            logger.warning("❌ 캐시 갱신 실패 (%s): %s", full_key, e)
+        finally:
+            self.store.release_lease(full_key)
+
+    def invalidate(self, key=None):
+        """키 하나(또는 이 캐시 전체) 삭제 - socket 저장소면 모든 워커에 바로 반영"""
+        if key is None:
+            self.store.delete_prefix(f"{self.name}:")
+        else:
+            self.store.delete(self._key(key))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'ttl': self.ttl,
+                'stale_ttl': self.stale_ttl,
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'refreshes': self.refreshes,
+                'errors': self.errors,
+            }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='워커 공유 캐시 서버')
+    parser.add_argument('--socket', default=os.environ.get('CACHE_SOCKET', DEFAULT_SOCKET), help='유닉스 소켓 경로')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    serve(args.socket)
@@ -0,0 +1,95 @@
+"""
+테넌트(사용자) 구분
+
+ESP 기기는 다음 중 하나로 사용자를 알립니다.
+- X-User-Id 헤더 (또는 ?user_id=): 사용자 ID를 직접 지정
+- X-Device-Id 헤더 (또는 ?device=): devices/<기기 ID> 문서의 user_id로 사용자를 찾음
+
+둘 다 없으면 테넌트는 None이며, 기존처럼 사용자 구분 없이 전체 데이터를 대상으로 동작합니다.
+할일 문서는 userId, 캐릭터 문서는 user_id 필드에 사용자 ID가 들어 있습니다.
+"""
+
+import re
+
+TODO_USER_FIELD = 'userId'
+CHARACTER_USER_FIELD = 'user_id'
+DEFAULT_USER_ID = 'anonymous_user'
+
+# 캐시 키 / static 파일 이름에 그대로 쓰므로 경로 문자가 들어가지 않도록 제한
+TENANT_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,128}$')
+
+
+class TenantError(ValueError):
+    """잘못된 사용자 ID이거나 등록되지 않은 기기"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def validate_tenant_id(value, what='사용자 ID'):
+    if not isinstance(value, str) or not TENANT_ID_PATTERN.match(value):
+        raise TenantError(f'잘못된 {what}입니다')
+    return value
+
+
+def tenant_key(tenant):
+    """캐시 키에 쓸 테넌트 이름 (전체 범위는 '*')"""
+    return tenant or '*'
+
+
+class TenantResolver:
+    """요청의 사용자 ID / 기기 ID → 테넌트
+
+    기기 → 사용자 매핑은 devices 컬렉션에서 읽어 cache(SharedCache)에 보관합니다.
+    """
+
+    def __init__(self, db, cache, collection='devices'):
+        self.db = db
+        self.cache = cache
+        self.collection = collection
+
+    def resolve(self, user_id=None, device_id=None):
+        """Returns: 사용자 ID 또는 None(전체 범위)
+
+        Raises:
+            TenantError: ID 형식이 잘못되었거나 등록되지 않은 기기일 때
+        """
+        if user_id:
+            return validate_tenant_id(user_id)
+        if not device_id:
+            return None
+
+        validate_tenant_id(device_id, '기기 ID')
+        return self._checked(self.cache.get_or_load(device_id, lambda: self._load_device(device_id)))
+
+    async def aresolve(self, adb, user_id=None, device_id=None):
+        """resolve()의 비동기 버전 (adb: Firestore AsyncClient)"""
+        if user_id:
+            return validate_tenant_id(user_id)
+        if not device_id:
+            return None
+
+        validate_tenant_id(device_id, '기기 ID')
+
+        async def load_device():
+            doc = await adb.collection(self.collection).document(device_id).get(field_paths=['user_id'])
+            return self._device_user(doc)
+
+        return self._checked(await self.cache.aget_or_load(device_id, load_device))
+
+    def _load_device(self, device_id):
+        doc = self.db.collection(self.collection).document(device_id).get(field_paths=['user_id'])
+        return self._device_user(doc)
+
+    @staticmethod
+    def _device_user(doc):
+        if not doc.exists:
+            return None
+        return doc.to_dict().get('user_id')
+
+    @staticmethod
+    def _checked(user_id):
+        if not user_id:
+            raise TenantError('등록되지 않은 기기입니다', 404)
+        return validate_tenant_id(user_id)
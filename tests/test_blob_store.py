@@ -0,0 +1,28 @@
+"""blob_store.LocalBlobStore 회귀 테스트"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from blob_store import LocalBlobStore, content_key
+
+
+def test_concurrent_put_of_same_content(tmp_path):
+    store = LocalBlobStore(str(tmp_path))
+    for _ in range(10):
+        data = os.urandom(256 * 1024)
+        with ThreadPoolExecutor(max_workers=20) as pool:
+            keys = list(pool.map(lambda _: store.put(data, 'image/png'), range(20)))
+
+        key = content_key(data, 'image/png')
+        assert set(keys) == {key}
+        assert store.get(key) == data
+        assert not [name for name in os.listdir(os.path.dirname(store.path_for(key))) if name.endswith('.tmp')]
+
+
+def test_local_url_requires_base_url(tmp_path):
+    store = LocalBlobStore(str(tmp_path))
+    with pytest.raises(ValueError):
+        store.url_for('a' * 64 + '.png')
+    assert store.url_for('k.png', 'http://10.0.0.2:5050/') == 'http://10.0.0.2:5050/blobs/k.png'
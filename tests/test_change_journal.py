@@ -0,0 +1,74 @@
+"""change_journal.ChangeJournal / compact 테스트"""
+
+from change_journal import ChangeJournal, compact
+
+
+def _entry(seq, action, todo_id, data=None):
+    return {'seq': seq, 'action': action, 'id': todo_id, 'data': data or {}}
+
+
+def test_compact_merges_changes_per_todo():
+    entries = [
+        _entry(1, 'create', 'a', {'title': 'a1'}),
+        _entry(2, 'update', 'b', {'title': 'b1'}),
+        _entry(3, 'update', 'a', {'title': 'a2'}),
+        _entry(4, 'create', 'c', {'title': 'c1'}),
+        _entry(5, 'delete', 'c'),
+    ]
+    changes, last_seq = compact(entries)
+    assert changes == [
+        {'action': 'update', 'id': 'b', 'data': {'title': 'b1'}, 'seq': 2},
+        {'action': 'create', 'id': 'a', 'data': {'title': 'a2'}, 'seq': 3},
+        {'action': 'delete', 'id': 'c', 'seq': 5},
+    ]
+    assert last_seq == 5
+
+    # 할일 두 개를 채우면 세 번째 할일 앞에서 멈춤 (이미 본 할일의 변경은 계속 합침)
+    changes, last_seq = compact(entries, limit=2)
+    assert [change['id'] for change in changes] == ['b', 'a']
+    assert last_seq == 3
+
+
+def test_read_pages_across_spill_file_and_ring(tmp_path):
+    journal = ChangeJournal(capacity=3, spill_path=str(tmp_path / 'journal.jsonl'))
+    for n in range(1, 9):
+        journal.append([('create', f"todo{n}", {'n': n}, None)])
+
+    first = journal.read(0, limit=5)
+    assert [change['id'] for change in first['changes']] == [f"todo{n}" for n in range(1, 6)]
+    assert first['more'] and first['next'] == 5
+    rest = journal.read(first['next'], limit=5)
+    assert [change['id'] for change in rest['changes']] == ['todo6', 'todo7', 'todo8']
+    assert not rest['more'] and rest['next'] == rest['head'] == 8
+    journal.close()
+
+
+def test_clean_restart_continues_seq(tmp_path):
+    path = str(tmp_path / 'journal.jsonl')
+    journal = ChangeJournal(capacity=10, spill_path=path)
+    journal.append([('create', 'a', {'title': 'a'}, None), ('update', 'b', {'title': 'b'}, None)])
+    journal.close()
+
+    restarted = ChangeJournal(capacity=10, spill_path=path)
+    assert restarted.head == 2
+    assert restarted.append([('delete', 'a', None, None)]) == 3
+    result = restarted.read(1)
+    assert [(change['action'], change['id']) for change in result['changes']] == [('update', 'b'), ('delete', 'a')]
+    restarted.close()
+
+
+def test_unclean_shutdown_skips_seq_and_forces_resync(tmp_path):
+    path = str(tmp_path / 'journal.jsonl')
+    journal = ChangeJournal(capacity=10, spill_path=path)
+    journal.append([('create', 'a', {'title': 'a'}, None)] * 3)
+    # close() 없이 종료 - 링 버퍼의 항목은 사라짐
+
+    restarted = ChangeJournal(capacity=10, spill_path=path)
+    # 파일에 남은 마지막 seq(0)에서 capacity만큼 건너뜀 - 잃어버린 링 버퍼의 seq(1~3)는 다시 쓰지 않음
+    assert restarted.head == 10
+    assert restarted.append([('update', 'b', {'title': 'b'}, None)]) == 11
+    # 이전 seq로 이어 받으려는 기기는 전체 다시 받기
+    assert restarted.read(3) is None
+    assert restarted.read(0) is None
+    assert [change['id'] for change in restarted.read(10)['changes']] == ['b']
+    restarted.close()
@@ -0,0 +1,52 @@
+"""character_pages 목록 항목 / 페이지 캐시 테스트"""
+
+from datetime import datetime
+
+from character_pages import CharacterPageCache, character_summary
+from memory_firestore import MemoryFirestore
+
+
+def test_summary_omits_image_unless_requested():
+    db = MemoryFirestore()
+    reference = db.collection('characters').document('c1')
+    reference.set({'name': '고양이', 'image_url': 'data:image/png;base64,xxxx',
+                   'created_at': datetime(2026, 10, 18, 9, 30), 'thumbnail_urls': {'128': 'http://t/128.jpg'}})
+    doc = reference.get()
+
+    item = character_summary(doc)
+    assert item['character_id'] == 'c1'
+    assert item['created_at'] == '2026-10-18T09:30:00'
+    assert item['thumbnail_urls'] == {'128': 'http://t/128.jpg'}
+    assert item['is_selected'] is False
+    assert 'image_url' not in item
+    assert character_summary(doc, include_image=True)['image_url'] == 'data:image/png;base64,xxxx'
+
+
+def test_page_cache_hits_until_invalidated():
+    cache = CharacterPageCache(max_pages=2)
+    loads = []
+
+    def load(page):
+        def loader():
+            loads.append(page)
+            return {'items': [page]}
+        return loader
+
+    assert cache.get_or_load(('', 20, False), load('p1')) == {'items': ['p1']}
+    assert cache.get_or_load(('', 20, False), load('p1')) == {'items': ['p1']}
+    assert loads == ['p1']
+
+    cache.invalidate()
+    cache.get_or_load(('', 20, False), load('p1'))
+    assert loads == ['p1', 'p1']
+    assert cache.stats()['hits'] == 1
+
+
+def test_page_loaded_across_invalidation_is_not_stored():
+    cache = CharacterPageCache()
+    page, generation = cache.lookup('key')
+    assert page is None
+    # 조회하는 사이에 캐릭터가 생성되어 캐시가 비워짐 → 이전 내용은 저장하지 않음
+    cache.invalidate()
+    cache.store('key', {'items': ['stale']}, generation)
+    assert cache.lookup('key')[0] is None
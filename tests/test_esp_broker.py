@@ -0,0 +1,65 @@
+"""esp_broker.EspBroker 테스트 (esp_device_sim의 가상 기기 사용)"""
+
+import asyncio
+import json
+import threading
+
+import pytest
+
+from esp_broker import EspBroker
+from esp_delivery import DeliveryError, DeviceOutbox
+from esp_device_sim import SimulatedDevice
+from esp_wire import encode
+
+TOKEN = 's3cret-device-token'
+
+
+@pytest.fixture
+def broker():
+    outbox = DeviceOutbox()
+    outbox.register_device('esp-1', 'broker', broker_token=TOKEN)
+    broker = EspBroker(port=0, heartbeat=5, authenticate=outbox.check_token)
+    broker.start()
+    yield broker
+    broker.stop()
+
+
+def _run_device(device):
+    """가상 기기를 별도 스레드의 이벤트 루프에서 실행 → (WELCOME 이벤트, 종료 이벤트, 오류 목록)"""
+    connected, finished, errors = threading.Event(), threading.Event(), []
+
+    def run():
+        try:
+            asyncio.run(device.run(connected))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            finished.set()
+
+    threading.Thread(target=run, daemon=True).start()
+    return connected, finished, errors
+
+
+def test_authenticated_device_receives_and_acks(broker):
+    device = SimulatedDevice('esp-1', '127.0.0.1', broker.port, groups=['kitchen'], token=TOKEN)
+    connected, _, _ = _run_device(device)
+    assert connected.wait(5)
+    assert broker.connected('esp-1')
+
+    body, content_type = encode([{'action': 'create', 'id': 't1', 'seq': 1, 'data': {'title': 'a'}}], 'msgpack')
+    assert broker.publish('device/esp-1', body, content_type) == {}
+    assert device.todos == {'t1': {'title': 'a'}}
+    assert device.last_seq == 1
+
+    assert broker.publish('group/kitchen', json.dumps({'beep': 1}).encode()) == 1
+    assert broker.publish('group/garage', b'{}') == 0
+
+
+def test_wrong_token_is_rejected(broker):
+    device = SimulatedDevice('esp-1', '127.0.0.1', broker.port, token='not-the-device-token')
+    connected, finished, errors = _run_device(device)
+    assert finished.wait(5)
+    assert not connected.is_set() and errors
+    assert broker.stats()['rejected'] == 1
+    with pytest.raises(DeliveryError):
+        broker.publish('device/esp-1', b'{}', timeout=0.5)
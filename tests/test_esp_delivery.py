@@ -0,0 +1,158 @@
+"""esp_delivery.DeviceOutbox / OutboxDispatcher 회귀 테스트"""
+
+import threading
+from datetime import datetime, timezone
+
+from esp_delivery import DeviceOutbox, OutboxDispatcher
+from esp_wire import apply_delta
+
+
+def make_dispatcher(send):
+    outbox = DeviceOutbox()
+    outbox.register_device('esp-1', 'http://esp-1/api/todos', wire_format='json-delta')
+    return outbox, OutboxDispatcher(outbox, send, workers=2, base_backoff=0.01)
+
+
+def test_patch_acked_after_row_replaced_moves_base_forward():
+    """patch 전송 중에 같은 할일의 새 변경이 들어와도 다음 patch는 기기가 적용한 상태 기준"""
+    device = {}
+    sent = []
+    in_flight = threading.Event()
+    arrived = threading.Event()
+
+    def send(_, changes):
+        for change in changes:
+            sent.append(change)
+            if change['action'] == 'patch':
+                device[change['id']] = apply_delta(device.get(change['id'], {}), change)
+            else:
+                device[change['id']] = change['data']
+        if len(sent) == 2:
+            # 두 번째 전송(p2 append)이 끝나기 전에 p3 변경이 도착
+            in_flight.set()
+            arrived.wait(5)
+        return None
+
+    outbox, dispatcher = make_dispatcher(send)
+    try:
+        dispatcher.submit([('create', 'todo1', {'title': 'a', 'pause_times': ['p1']}, None)], scope=None)
+        assert dispatcher.flush(5)
+        dispatcher.submit([('update', 'todo1', {'title': 'a', 'pause_times': ['p1', 'p2']}, None)], scope=None)
+        assert in_flight.wait(5)
+        dispatcher.submit([('update', 'todo1', {'title': 'a', 'pause_times': ['p1', 'p2', 'p3']}, None)], scope=None)
+        arrived.set()
+        assert dispatcher.flush(5)
+    finally:
+        dispatcher.close()
+
+    assert [change.get('append') for change in sent[1:]] == [{'pause_times': ['p2']}, {'pause_times': ['p3']}]
+    assert device['todo1']['pause_times'] == ['p1', 'p2', 'p3']
+    assert outbox.pending_counts() == {}
+
+
+def test_ack_without_next_batch_uses_outbox_row():
+    """next_batch를 거치지 않은 seq의 ack는 아웃박스 행의 내용을 기준 상태로 저장"""
+    outbox = DeviceOutbox()
+    outbox.register_device('esp-1', 'http://esp-1/api/todos', wire_format='json-delta')
+    targets, _ = outbox.enqueue([('create', 'todo1', {'title': 'a'}, None)], scope=None)
+    outbox.ack('esp-1', [targets['esp-1']])
+
+    outbox.enqueue([('update', 'todo1', {'title': 'b'}, None)], scope=None)
+    (change,) = outbox.next_batch('esp-1', 10)
+    assert change['action'] == 'patch' and change['set'] == {'title': 'b'}
+
+
+def test_check_token_requires_registered_secret():
+    outbox = DeviceOutbox()
+    outbox.register_device('esp-1', 'broker', broker_token='s3cret-device-token')
+    outbox.register_device('esp-2', 'http://esp-2/api/todos')
+
+    assert outbox.check_token('esp-1', 's3cret-device-token')
+    assert not outbox.check_token('esp-1', 'wrong')
+    assert not outbox.check_token('esp-1', None)
+    assert not outbox.check_token('esp-2', '')
+    assert not outbox.check_token('esp-3', 's3cret-device-token')
+    assert outbox.has_token('esp-1')
+    assert not outbox.has_token('esp-2')
+    assert not outbox.has_token('esp-3')
+
+
+def test_outbox_merges_pending_changes_per_todo():
+    """아직 확인하지 않은 create 뒤의 update는 최신 데이터의 create 하나로 합침"""
+    outbox = DeviceOutbox()
+    outbox.register_device('esp-1', 'http://esp-1/api/todos')
+    outbox.enqueue([('create', 'todo1', {'title': 'a'}, None)], scope=None)
+    outbox.enqueue([('update', 'todo2', {'title': 'x'}, None)], scope=None)
+    outbox.enqueue([('update', 'todo1', {'title': 'b'}, None)], scope=None)
+
+    batch = outbox.next_batch('esp-1', 10)
+    assert [(change['action'], change['id'], change['data']) for change in batch] == [
+        ('update', 'todo2', {'title': 'x'}),
+        ('create', 'todo1', {'title': 'b'}),
+    ]
+    # 다시 넣은 변경은 새 seq를 받아 기기 안의 순서가 유지됨
+    assert batch[0]['seq'] < batch[1]['seq']
+
+
+def test_outbox_fans_out_by_owner_and_acks_per_device():
+    outbox = DeviceOutbox()
+    outbox.register_device('shared', 'http://shared/api/todos')
+    outbox.register_device('alice', 'http://alice/api/todos', user_id='alice')
+    outbox.register_device('bob', 'http://bob/api/todos', user_id='bob')
+    targets, _ = outbox.enqueue([('create', 'todo1', {'title': 'a'}, 'alice')], scope=None)
+
+    assert set(targets) == {'shared', 'alice'}
+    assert outbox.pending_counts() == {'shared': 1, 'alice': 1}
+
+    outbox.ack('alice', [targets['alice']])
+    assert outbox.pending_counts() == {'shared': 1}
+    assert {device['id']: device['acked_seq'] for device in outbox.devices()}['alice'] == targets['alice']
+
+
+def test_outbox_replays_unacked_changes_in_order_after_restart(tmp_path):
+    db_path = str(tmp_path / 'outbox.db')
+    outbox = DeviceOutbox(db_path)
+    outbox.register_device('esp-1', 'http://esp-1/api/todos')
+    for n in range(5):
+        outbox.enqueue([('create', f"todo{n}", {'title': str(n)}, None)], scope=None)
+    first = outbox.next_batch('esp-1', 2)
+    outbox.ack('esp-1', [change['seq'] for change in first])
+    # 보냈지만 확인받지 못한 변경 (전송 중에 프로세스 종료)
+    outbox.next_batch('esp-1', 2)
+    outbox.close()
+
+    restarted = DeviceOutbox(db_path)
+    replay = restarted.next_batch('esp-1', 10)
+    assert [change['id'] for change in replay] == ['todo2', 'todo3', 'todo4']
+    assert [change['seq'] for change in replay] == sorted(change['seq'] for change in replay)
+    restarted.close()
+
+
+def test_restart_snapshot_sends_only_differences(tmp_path):
+    """리스너를 다시 연 뒤의 첫 스냅샷은 저장된 범위 해시와 비교해 달라진 할일만 기록"""
+    db_path = str(tmp_path / 'outbox.db')
+    read_time = datetime(2026, 10, 18, 9, 0, tzinfo=timezone.utc)
+    outbox = DeviceOutbox(db_path)
+    outbox.register_device('esp-1', 'http://esp-1/api/todos')
+    outbox.enqueue([
+        ('create', 'a', {'title': 'a'}, None),
+        ('create', 'b', {'title': 'b'}, None),
+        ('create', 'c', {'title': 'c'}, None),
+    ], read_time=read_time, scope='S')
+    outbox.ack('esp-1', [change['seq'] for change in outbox.next_batch('esp-1', 10)])
+    outbox.close()
+
+    restarted = DeviceOutbox(db_path)
+    assert restarted.snapshot_info('S') == {'todos': 3, 'read_time': read_time.isoformat()}
+    # 꺼져 있는 동안 b가 수정되고 c가 삭제됨 - 초기 스냅샷은 모두 create로 들어옴
+    snapshot = [('create', 'a', {'title': 'a'}, None), ('create', 'b', {'title': 'b2'}, None)]
+    deletes = [('delete', todo_id, {}, owner) for todo_id, owner in restarted.missing_todos({'a', 'b'}, 'S')]
+    _, recorded = restarted.enqueue(snapshot + deletes, scope='S')
+
+    assert [(action, todo_id) for action, todo_id, _, _ in recorded] == [('update', 'b'), ('delete', 'c')]
+    assert [(change['action'], change['id']) for change in restarted.next_batch('esp-1', 10)] == [
+        ('update', 'b'), ('delete', 'c'),
+    ]
+    # 본 적 없는 문서의 삭제와 같은 내용의 재전달은 기록하지 않음
+    assert restarted.enqueue([('delete', 'zzz', {}, None), ('create', 'a', {'title': 'a'}, None)], scope='S')[1] == []
+    restarted.close()
@@ -0,0 +1,79 @@
+"""esp_render_cache.EspRenderCache 테스트"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import pytest
+
+from esp_render_cache import EspRenderCache
+
+Image = pytest.importorskip('PIL.Image')
+
+
+def _png(color):
+    buffer = BytesIO()
+    Image.new('RGB', (32, 32), color).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def test_render_is_cached_in_memory_and_on_disk(tmp_path):
+    cache = EspRenderCache(str(tmp_path))
+    source = _png('red')
+    key = EspRenderCache.make_key(source, (16, 16))
+    calls = []
+
+    def load_source():
+        calls.append(1)
+        return source
+
+    _, first = cache.render(key, load_source, (16, 16))
+    _, second = cache.render(key, load_source, (16, 16))
+    assert first == second
+    assert len(calls) == 1
+    assert Image.open(BytesIO(first)).size == (16, 16)
+
+    # 재시작한 프로세스는 디스크에서 읽음
+    restarted = EspRenderCache(str(tmp_path))
+    assert restarted.get(key) == first
+
+
+def test_concurrent_render_of_same_key(tmp_path):
+    cache = EspRenderCache(str(tmp_path))
+    source = _png('blue')
+    key = EspRenderCache.make_key(source, (64, 64))
+
+    for _ in range(5):
+        # 매번 새 인스턴스 (메모리 캐시 없이 디스크 쓰기가 겹치도록)
+        caches = [EspRenderCache(str(tmp_path)) for _ in range(8)]
+        for c in caches:
+            path = c.path_for(key)
+            if os.path.exists(path):
+                os.remove(path)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda c: c.render(key, lambda: source, (64, 64))[1], caches))
+        assert len(set(results)) == 1
+        assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
+    assert cache.get(key) == results[0]
+
+
+def test_disk_cache_is_bounded(tmp_path):
+    cache = EspRenderCache(str(tmp_path), max_entries=1, max_disk_entries=2)
+    keys = []
+    for i, color in enumerate(['red', 'green', 'blue']):
+        source = _png(color)
+        key = EspRenderCache.make_key(source, (8, 8))
+        cache.render(key, lambda: source, (8, 8))
+        os.utime(cache.path_for(key), (1000 + i, 1000 + i))
+        keys.append(key)
+
+    # 오래된 키도 다시 사용하면 최근 사용으로 남음 (디스크 조회는 mtime 갱신)
+    cache._memory.clear()
+    assert cache.get(keys[1]) is not None
+
+    source = _png('white')
+    key = EspRenderCache.make_key(source, (8, 8))
+    cache.render(key, lambda: source, (8, 8))
+
+    remaining = sorted(name for name in os.listdir(tmp_path) if name.endswith('.jpg'))
+    assert remaining == sorted([f"{keys[1]}.jpg", f"{key}.jpg"])
@@ -0,0 +1,108 @@
+"""esp_titles_view.TodayTitlesView 회귀 테스트"""
+
+from datetime import datetime
+
+import esp_titles_view
+from esp_titles_view import TodayTitlesView
+from memory_firestore import MemoryFirestore
+
+
+def test_failed_rollover_is_retried(monkeypatch):
+    monkeypatch.setattr(esp_titles_view, 'ROLLOVER_RETRY_DELAY', 0.01)
+    db = MemoryFirestore()
+    db.collection('todos').document('t1').set({'title': 'a', 'is_completed': False, 'due_date_string': 'x'})
+    view = TodayTitlesView(db)
+
+    real_start = view.start
+    failures = iter([RuntimeError('unavailable'), RuntimeError('unavailable')])
+
+    def flaky_start():
+        error = next(failures, None)
+        if error is not None:
+            raise error
+        real_start()
+
+    view.start = flaky_start
+    view._rollover()
+    try:
+        assert view.wait_ready(5)
+    finally:
+        view.stop()
+
+
+def _todo(title, user, date='2026-10-18'):
+    return {'title': title, 'userId': user, 'is_completed': False, 'due_date_string': date}
+
+
+def test_version_is_derived_from_content():
+    first = TodayTitlesView(MemoryFirestore())
+    second = TodayTitlesView(MemoryFirestore())
+    for view in (first, second):
+        view.date_str = '2026-10-18'
+        view._on_snapshot('2026-10-18', [])
+
+    docs = MemoryFirestore()
+    docs.collection('todos').document('t1').set(_todo('a', 'u1'))
+    docs.collection('todos').document('t2').set(_todo('b', 'u2'))
+    snapshot = list(docs.collection('todos').stream())
+
+    # 다른 워커 / 재시작한 프로세스도 같은 내용이면 같은 버전
+    first._on_snapshot('2026-10-18', snapshot)
+    second._on_snapshot('2026-10-18', list(reversed(snapshot)))
+    assert first.snapshot()[0] == second.snapshot()[0]
+    assert first.snapshot('u1')[0] == second.snapshot('u1')[0]
+    assert first.snapshot('u1')[0] != first.snapshot('u2')[0]
+
+    # 다른 사용자의 변경은 그 사용자 버전만 바꿈
+    before = first.snapshot('u1')[0], first.snapshot('u2')[0]
+    docs.collection('todos').document('t2').set(_todo('c', 'u2'))
+    first._on_snapshot('2026-10-18', list(docs.collection('todos').stream()))
+    assert first.snapshot('u1')[0] == before[0]
+    assert first.snapshot('u2')[0] != before[1]
+
+
+def test_version_changes_after_date_rollover():
+    db = MemoryFirestore()
+    view = TodayTitlesView(db)
+    view.date_str = '2026-10-18'
+    db.collection('todos').document('t1').set(_todo('a', 'u1'))
+    view._on_snapshot('2026-10-18', list(db.collection('todos').stream()))
+    before = view.snapshot('u1')
+
+    # 다음 날 같은 제목의 할일 (반복 할일)이어도 날짜가 바뀌었으므로 새 버전
+    view.date_str = '2026-10-19'
+    view._on_snapshot('2026-10-19', list(db.collection('todos').stream()))
+    after = view.snapshot('u1')
+    assert after[1] == before[1] == ['a']
+    assert after[0] != before[0]
+    assert view.wait_for_change(before[0], 0, 'u1') == after
+
+    # 늦게 도착한 이전 날짜 스냅샷은 무시
+    view._on_snapshot('2026-10-18', [])
+    assert view.snapshot('u1') == after
+
+
+def test_view_follows_todays_todos():
+    db = MemoryFirestore()
+    today = datetime.now().strftime("%Y-%m-%d")
+    todos = db.collection('todos')
+    todos.document('t1').set(_todo('물 마시기', 'u1', today))
+    todos.document('t2').set(_todo('내일 할일', 'u1', '1999-01-01'))
+
+    view = TodayTitlesView(db)
+    view.start()
+    try:
+        assert view.wait_ready(5)
+        version, titles = view.snapshot('u1')
+        assert titles == ['물 마시기']
+
+        todos.document('t3').set(_todo('산책', 'u1', today))
+        version, titles = view.wait_for_change(version, 5, 'u1')
+        assert sorted(titles) == ['물 마시기', '산책']
+
+        # 완료한 할일은 뷰에서 빠짐
+        todos.document('t1').update({'is_completed': True})
+        version, titles = view.wait_for_change(version, 5, 'u1')
+        assert titles == ['산책']
+    finally:
+        view.stop()
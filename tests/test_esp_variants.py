@@ -0,0 +1,29 @@
+"""esp_variants.EspVariantStore 회귀 테스트 (gunicorn 워커끼리 같은 디렉토리 공유)"""
+
+import os
+from io import BytesIO
+
+from PIL import Image
+
+from esp_variants import ESP_VARIANTS, EspVariantStore
+
+
+def _png():
+    buffer = BytesIO()
+    Image.new('RGB', (32, 32), (200, 100, 50)).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def test_concurrent_render_in_other_worker_is_success(tmp_path):
+    """다른 워커가 먼저 같은 key를 렌더링해 두었으면 os.replace 실패를 성공으로 처리"""
+    first = EspVariantStore(str(tmp_path))
+    second = EspVariantStore(str(tmp_path))
+    first.ensure('key1', _png)
+
+    # 두 번째 워커는 렌더링을 시작할 때까지 아직 결과를 보지 못한 상태
+    checks = iter([False, False])
+    second.is_rendered = lambda key: next(checks, True)
+    second.ensure('key1', _png)
+
+    assert sorted(os.listdir(tmp_path)) == ['key1']
+    assert sorted(os.listdir(tmp_path / 'key1')) == sorted(f"{variant}.bin" for variant in ESP_VARIANTS)
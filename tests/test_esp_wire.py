@@ -0,0 +1,71 @@
+"""esp_wire 델타 / MessagePack 형식 테스트"""
+
+import json
+
+import pytest
+
+from esp_wire import apply_delta, compute_delta, decode_msgpack, encode
+
+BASE = {
+    'title': '운동',
+    'is_completed': False,
+    'pause_times': ['09:00'],
+    'category': 'health',
+    'memo': '필드 번호가 없는 필드',
+}
+
+
+def _patch(todo_id, base, new, seq=7):
+    set_fields, unset, append = compute_delta(base, new)
+    return {'action': 'patch', 'id': todo_id, 'seq': seq, 'set': set_fields, 'unset': unset, 'append': append}
+
+
+def test_delta_round_trip():
+    new = dict(BASE, is_completed=True, pause_times=['09:00', '09:30'], memo='바뀜')
+    del new['category']
+    new['priority'] = 2
+
+    set_fields, unset, append = compute_delta(BASE, new)
+    assert set_fields == {'is_completed': True, 'memo': '바뀜', 'priority': 2}
+    assert unset == ['category']
+    # 배열 뒤에 추가된 항목만 보냄
+    assert append == {'pause_times': ['09:30']}
+    assert apply_delta(BASE, _patch('t1', BASE, new)) == new
+
+
+def test_replaced_array_is_sent_whole():
+    new = dict(BASE, pause_times=['10:00'])
+    set_fields, unset, append = compute_delta(BASE, new)
+    assert set_fields == {'pause_times': ['10:00']}
+    assert not unset and not append
+    assert compute_delta(BASE, dict(BASE)) == ({}, [], {})
+
+
+def test_msgpack_round_trip():
+    pytest.importorskip('msgpack')
+    new = dict(BASE, is_completed=True, pause_times=['09:00', '09:30'])
+    del new['memo']
+    changes = [
+        {'action': 'create', 'id': 't1', 'seq': 1, 'data': BASE},
+        _patch('t1', BASE, new, seq=2),
+        {'action': 'delete', 'id': 't2', 'seq': 3},
+    ]
+
+    body, content_type = encode(changes, 'msgpack')
+    assert content_type == 'application/msgpack'
+    decoded = decode_msgpack(body)
+
+    assert decoded[0] == changes[0]
+    assert decoded[1] == changes[1]
+    assert decoded[2] == changes[2]
+    assert apply_delta(decoded[0]['data'], decoded[1]) == new
+    # 필드 이름 대신 번호를 쓰므로 JSON 전체 문서보다 작음
+    assert len(body) < len(encode(changes, 'json')[0])
+
+
+def test_json_single_change_and_batch():
+    change = {'action': 'delete', 'id': 't1', 'seq': 1}
+    body, content_type = encode([change], 'json-delta')
+    assert content_type == 'application/json'
+    assert json.loads(body) == change
+    assert json.loads(encode([change, change], 'json')[0]) == {'action': 'batch', 'changes': [change, change]}
@@ -0,0 +1,146 @@
+"""generation_backends.CircuitBreaker / HedgedGenerator 회귀 테스트"""
+
+import asyncio
+import time
+
+import pytest
+
+import free_anime_generator
+from generation_backends import CircuitBreaker, GenerationError, HedgedGenerator, PollinationsBackend
+
+
+class _SlowBackend:
+    name = 'slow'
+
+    async def agenerate(self, prompt, style, size):
+        await asyncio.sleep(10)
+
+
+class _FastBackend:
+    name = 'fast'
+
+    async def agenerate(self, prompt, style, size):
+        await asyncio.sleep(0.01)
+        return b'image', 'image/png'
+
+
+def test_cancelled_half_open_probe_reopens_breaker():
+    """hedge에서 진 시험 호출이 취소되어도 reset_timeout 뒤에 다시 시험할 수 있음"""
+    generator = HedgedGenerator([_SlowBackend(), _FastBackend()], min_hedge_delay=0.01,
+                                default_hedge_delay=0.01, reset_timeout=0.05)
+    breaker = generator._states[0].breaker
+    breaker.state = 'open'
+    breaker._opened_at = time.monotonic() - 1
+
+    assert asyncio.run(generator.agenerate('prompt', 'style', (1, 1))) == (b'image', 'image/png')
+    assert breaker.state == 'open'
+    time.sleep(0.06)
+    assert breaker.allow()
+
+
+def test_breaker_half_open_allows_one_probe():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.allow() and breaker.state == 'closed'
+    breaker.record_failure()
+    assert breaker.state == 'open' and not breaker.allow()
+
+    time.sleep(0.06)
+    # 차단 시간이 지나면 시험 호출 하나만 허용
+    assert breaker.allow() and breaker.state == 'half_open'
+    assert not breaker.allow()
+    # 시험 호출이 실패하면 (연속 실패 수와 상관없이) 바로 다시 차단
+    breaker.record_failure()
+    assert breaker.state == 'open' and not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == 'closed' and breaker.failures == 0
+    assert breaker.allow()
+
+
+class _SyncBackend:
+    def __init__(self, name, delay=0.0, error=None):
+        self.name = name
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    def generate(self, prompt, style, size):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return self.name.encode(), 'image/png'
+
+
+def test_failing_backend_falls_through_and_opens_its_breaker():
+    broken = _SyncBackend('broken', error=RuntimeError('500'))
+    backup = _SyncBackend('backup')
+    generator = HedgedGenerator([broken, backup], failure_threshold=2, reset_timeout=60)
+
+    for _ in range(3):
+        assert generator.generate('p', 's', (1, 1)) == (b'backup', 'image/png')
+    # 두 번 실패한 뒤로는 차단되어 호출하지 않음
+    assert broken.calls == 2
+    assert generator._states[0].breaker.state == 'open'
+
+
+def test_slow_backend_is_hedged():
+    slow = _SyncBackend('slow', delay=1.0)
+    fast = _SyncBackend('fast')
+    generator = HedgedGenerator([slow, fast], min_hedge_delay=0.01, default_hedge_delay=0.05)
+
+    start = time.monotonic()
+    assert generator.generate('p', 's', (1, 1)) == (b'fast', 'image/png')
+    assert time.monotonic() - start < 0.5
+
+
+def test_no_available_backend_raises():
+    generator = HedgedGenerator([_SyncBackend('broken', error=RuntimeError('500'))], failure_threshold=1)
+    with pytest.raises(GenerationError, match='broken: 500'):
+        generator.generate('p', 's', (1, 1))
+    with pytest.raises(GenerationError, match='서킷 열림'):
+        generator.generate('p', 's', (1, 1))
+
+
+class _StreamResponse:
+    headers = {'content-type': 'image/png; charset=binary'}
+
+    def __init__(self, body):
+        self._body = body
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self._body), chunk_size):
+            yield self._body[i:i + chunk_size]
+
+
+class _Session:
+    def __init__(self, body):
+        self.body = body
+
+    def get(self, url, timeout, stream):
+        assert stream
+        return _StreamResponse(self.body)
+
+
+def test_pollinations_generate_returns_bytes_without_writing_files(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    body = b'\x89PNG' + b'x' * 200000
+    monkeypatch.setattr(free_anime_generator, 'get_shared_session', lambda: _Session(body))
+
+    data, content_type = PollinationsBackend().generate('cat', 'anime', (64, 64))
+
+    assert data == body
+    assert content_type == 'image/png'
+    assert not [path for path in tmp_path.rglob('*') if path.is_file()]
@@ -0,0 +1,60 @@
+"""generation_jobs.GenerationJobQueue 회귀 테스트 (gunicorn 워커끼리 같은 DB 공유)"""
+
+import threading
+import time
+
+from generation_jobs import GenerationJobQueue
+
+
+def test_jobs_shared_between_workers_run_once(tmp_path):
+    runs = []
+    lock = threading.Lock()
+
+    def handler(params):
+        with lock:
+            runs.append(params['n'])
+        time.sleep(0.01)
+        return {'n': params['n']}
+
+    db_path = str(tmp_path / 'jobs.db')
+    first = GenerationJobQueue(handler, workers=2, db_path=db_path, poll_interval=0.02)
+    second = GenerationJobQueue(handler, workers=2, db_path=db_path, poll_interval=0.02)
+
+    jobs = [(first if n % 2 else second).submit({'n': n}) for n in range(8)]
+    # 작업을 넣은 워커가 아닌 쪽에서 조회 / 대기
+    finished = [(second if n % 2 else first).wait(job['id'], 5) for n, job in enumerate(jobs)]
+
+    assert [job['status'] for job in finished] == ['succeeded'] * 8
+    assert [job['result'] for job in finished] == [{'n': n} for n in range(8)]
+    assert sorted(runs) == list(range(8))
+
+
+def test_expired_lease_is_reclaimed(tmp_path):
+    db_path = str(tmp_path / 'jobs.db')
+    stalled = GenerationJobQueue(lambda params: time.sleep(5), workers=1, db_path=db_path, lease=0.1,
+                                 poll_interval=0.02)
+    job = stalled.submit({})
+    time.sleep(0.05)
+    # 프로세스가 죽은 것처럼 임대 갱신 중지
+    stalled._owner = 'gone'
+
+    alive = GenerationJobQueue(lambda params: {'ok': True}, workers=1, db_path=db_path, poll_interval=0.02)
+    assert alive.wait(job['id'], 3)['status'] == 'succeeded'
+
+
+def test_job_that_keeps_losing_its_lease_fails_after_max_attempts(tmp_path):
+    queue = GenerationJobQueue(lambda params: {'ok': True}, workers=0, db_path=str(tmp_path / 'jobs.db'),
+                               lease=0.05, poll_interval=0.02, max_attempts=2)
+    job = queue.submit({})
+
+    for attempt in range(2):
+        assert queue._claim()[0] == job['id']
+        # 실행 중에 워커가 죽은 것처럼 임대 갱신 중지
+        queue._owner = f"gone-{attempt}"
+        time.sleep(0.15)
+
+    # 두 번 실행하고도 임대가 끝난 작업은 다시 실행하지 않고 실패 처리
+    assert queue._claim() is None
+    finished = queue.get(job['id'])
+    assert finished['status'] == 'failed'
+    assert '최대 시도 횟수' in finished['error']
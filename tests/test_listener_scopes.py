@@ -0,0 +1,63 @@
+"""listener_scopes.TodoScope / ScopeManager 테스트"""
+
+import queue
+from datetime import datetime
+
+import pytest
+
+from listener_scopes import ALL_KEY, ScopeManager, TodoScope
+from memory_firestore import MemoryFirestore
+
+
+def _todo(title, user, date, completed=False):
+    return {'title': title, 'userId': user, 'due_date_string': date, 'is_completed': completed}
+
+
+def test_scope_key_and_config():
+    defaults = {'days': 1, 'is_completed': False}
+    assert TodoScope.from_config('u1', None, defaults).key == 'user=u1;days=1;completed=false'
+    # 기기 설정의 null은 기본값을 덮어써서 조건을 걸지 않음
+    assert TodoScope.from_config(None, {'days': None, 'is_completed': None}, defaults).key == ALL_KEY
+    assert TodoScope('u1', 1, False) == TodoScope.from_config('u1', {}, defaults)
+    with pytest.raises(ValueError):
+        TodoScope(days=0)
+    with pytest.raises(ValueError):
+        TodoScope(is_completed='no')
+
+
+def test_devices_share_a_scope_listener_and_roll_over_at_midnight():
+    db = MemoryFirestore()
+    todos = db.collection('todos')
+    todos.document('a').set(_todo('오늘', 'u1', '2026-10-18'))
+    todos.document('b').set(_todo('내일', 'u1', '2026-10-19'))
+    todos.document('c').set(_todo('다른 사용자', 'u2', '2026-10-18'))
+
+    clock = {'now': datetime(2026, 10, 18, 23, 59)}
+    snapshots, joins = queue.Queue(), queue.Queue()
+    manager = ScopeManager(
+        db,
+        on_snapshot=lambda key, devices, docs, changes, read_time, initial:
+            snapshots.put((key, devices, sorted(doc.id for doc in docs), initial)),
+        on_join=lambda key, devices, docs: joins.put((key, devices, sorted(docs))),
+        now=lambda: clock['now'],
+    )
+    scope = TodoScope('u1', days=1, is_completed=False)
+    try:
+        manager.update({'esp-1': scope})
+        assert snapshots.get(timeout=5) == (scope.key, ['esp-1'], ['a'], True)
+
+        # 같은 범위의 기기는 리스너를 새로 열지 않고 현재 문서를 받음
+        manager.update({'esp-1': scope, 'esp-2': scope})
+        assert joins.get(timeout=5) == (scope.key, ['esp-2'], ['a'])
+        assert manager.keys() == [scope.key]
+        assert manager.documents() == {'a': _todo('오늘', 'u1', '2026-10-18')}
+
+        # 자정이 지나면 새 날짜의 쿼리로 다시 열고 첫 스냅샷을 initial로 전달
+        clock['now'] = datetime(2026, 10, 19, 0, 0, 2)
+        assert manager.rollover() == [scope.key]
+        assert snapshots.get(timeout=5) == (scope.key, ['esp-1', 'esp-2'], ['b'], True)
+
+        manager.update({})
+        assert manager.keys() == []
+    finally:
+        manager.stop()
@@ -0,0 +1,66 @@
+"""memory_firestore.MemoryFirestore 테스트 (오프라인 실행 / 부하 테스트용 Firestore)"""
+
+import threading
+
+import pytest
+from google.api_core.exceptions import NotFound
+
+from memory_firestore import MemoryFirestore
+
+
+def _seed():
+    db = MemoryFirestore()
+    db.load({'characters': {
+        f"c{n}": {'name': f"캐릭터{n}", 'user_id': 'u1' if n % 2 else 'u2', 'order': n, 'image': 'x' * 100}
+        for n in range(6)
+    }})
+    return db
+
+
+def test_query_filters_orders_and_pages():
+    db = _seed()
+    query = db.collection('characters').where('user_id', '==', 'u1').order_by('order').limit(2)
+
+    first = list(query.stream())
+    assert [doc.id for doc in first] == ['c1', 'c3']
+    rest = list(query.start_after(first[-1]).stream())
+    assert [doc.id for doc in rest] == ['c5']
+
+    # select는 요청한 필드만 돌려줌
+    (doc,) = list(db.collection('characters').where('order', '==', 0).select(['name']).stream())
+    assert doc.to_dict() == {'name': '캐릭터0'}
+
+
+def test_batch_is_atomic():
+    db = _seed()
+    batch = db.batch()
+    batch.update(db.collection('characters').document('c0'), {'name': '바뀜'})
+    batch.update(db.collection('characters').document('missing'), {'name': '없음'})
+    with pytest.raises(NotFound):
+        batch.commit()
+    assert db.collection('characters').document('c0').get().to_dict()['name'] == '캐릭터0'
+
+
+def test_on_snapshot_delivers_initial_state_and_changes():
+    db = _seed()
+    events = []
+    received = threading.Semaphore(0)
+
+    def callback(docs, changes, read_time):
+        events.append(([doc.id for doc in docs], [(change.type.name, change.document.id) for change in changes]))
+        received.release()
+
+    watch = db.collection('characters').where('user_id', '==', 'u2').on_snapshot(callback)
+    try:
+        assert received.acquire(timeout=5)
+        assert sorted(events[0][0]) == ['c0', 'c2', 'c4']
+
+        db.collection('characters').document('c2').update({'name': '바뀜'})
+        assert received.acquire(timeout=5)
+        assert events[-1][1] == [('MODIFIED', 'c2')]
+
+        db.collection('characters').document('c4').delete()
+        assert received.acquire(timeout=5)
+        assert events[-1][1] == [('REMOVED', 'c4')]
+    finally:
+        watch.unsubscribe()
@@ -0,0 +1,25 @@
+"""observability.MetricsRegistry 출력 테스트"""
+
+import os
+
+from observability import MetricsRegistry, cache_stats_collector
+
+
+class _Cache:
+    def stats(self):
+        return {'hits': 3, 'misses': 1}
+
+
+def test_samples_carry_worker_label_and_cache_totals_are_counters():
+    registry = MetricsRegistry()
+    registry.counter('requests_total', '요청 수', ['endpoint']).inc(endpoint='/a')
+    registry.register_collector(cache_stats_collector({'render': _Cache()}))
+
+    lines = registry.render().splitlines()
+    worker = str(os.getpid())
+
+    assert f'requests_total{{worker="{worker}",endpoint="/a"}} 1' in lines
+    assert '# TYPE cache_hits counter' in lines
+    assert '# TYPE cache_misses counter' in lines
+    assert f'cache_hits{{cache="render",worker="{worker}"}} 3' in lines
+    assert f'cache_misses{{cache="render",worker="{worker}"}} 1' in lines
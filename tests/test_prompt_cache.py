@@ -0,0 +1,86 @@
+"""prompt_cache.PromptCache 단일 비행 / LRU 테스트"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from prompt_cache import PromptCache, SingleFlight, prompt_cache_key
+
+
+def test_concurrent_callers_share_one_generation():
+    cache = PromptCache()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def generate():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return b'png', 'image/png'
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = [pool.submit(cache.get_or_generate, 'k', generate)]
+        assert started.wait(5)
+        futures += [pool.submit(cache.get_or_generate, 'k', generate) for _ in range(7)]
+        # 뒤의 호출들이 앞선 생성에 합류할 시간을 준 뒤 생성 완료
+        threading.Timer(0.1, release.set).start()
+        results = [future.result(5) for future in futures]
+
+    assert results == [(b'png', 'image/png')] * 8
+    assert len(calls) == 1
+    stats = cache.stats()
+    assert stats['misses'] == 1
+    assert stats['coalesced'] + stats['hits'] == 7
+
+    assert cache.get_or_generate('k', generate) == (b'png', 'image/png')
+    assert len(calls) == 1
+
+
+def test_single_flight_shares_errors_and_forgets_the_key():
+    def fail():
+        raise RuntimeError('backend down')
+
+    flight = SingleFlight()
+    with pytest.raises(RuntimeError):
+        flight.do('k', fail)
+    # 실패한 호출은 남지 않으므로 다음 호출은 새로 실행
+    assert flight.do('k', lambda: 42) == (42, False)
+
+
+def test_async_callers_share_one_generation():
+    cache = PromptCache()
+    calls = []
+
+    async def agenerate():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return b'png', 'image/png'
+
+    async def main():
+        return await asyncio.gather(*(cache.aget_or_generate('k', agenerate) for _ in range(5)))
+
+    assert asyncio.run(main()) == [(b'png', 'image/png')] * 5
+    assert len(calls) == 1
+    assert cache.stats()['coalesced'] == 4
+
+
+def test_lru_evicts_by_entries_and_bytes():
+    cache = PromptCache(max_entries=2, max_bytes=10)
+    cache.put('a', b'1234', 'image/png')
+    cache.put('b', b'1234', 'image/png')
+    cache.get('a')
+    cache.put('c', b'1234', 'image/png')
+    assert cache.get('b') is None and cache.get('a') is not None
+    cache.put('d', b'12345678', 'image/png')
+    assert cache.stats()['bytes'] <= 10
+    # 한도보다 큰 항목은 저장하지 않음
+    cache.put('e', b'x' * 11, 'image/png')
+    assert cache.get('e') is None
+
+
+def test_key_ignores_case_and_whitespace():
+    assert prompt_cache_key(' Cute  Cat ', 'Anime', (512, 512)) == prompt_cache_key('cute cat', 'anime', (512, 512))
+    assert prompt_cache_key('cute cat', 'anime', (512, 512)) != prompt_cache_key('cute cat', 'anime', (256, 256))
@@ -0,0 +1,79 @@
+"""shared_cache.SharedCache 단일 비행 / stale-while-revalidate 테스트"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from shared_cache import CacheStore, SharedCache
+
+
+def _slow_loader(calls, value='v', delay=0.1):
+    lock = threading.Lock()
+
+    def load():
+        with lock:
+            calls.append(1)
+        time.sleep(delay)
+        return value
+    return load
+
+
+def test_concurrent_misses_load_once():
+    cache = SharedCache('test', ttl=60, store=CacheStore())
+    calls = []
+    load = _slow_loader(calls)
+    with ThreadPoolExecutor(max_workers=10) as pool:
+        results = list(pool.map(lambda _: cache.get_or_load('k', load), range(10)))
+
+    assert results == ['v'] * 10
+    assert len(calls) == 1
+    stats = cache.stats()
+    assert stats['misses'] == 1 and stats['coalesced'] == 9
+
+
+def test_workers_sharing_a_store_load_once():
+    """같은 저장소를 쓰는 두 워커(SharedCache 인스턴스)는 갱신 임대로 조회를 한 번만 함"""
+    store = CacheStore()
+    workers = [SharedCache('test', ttl=60, store=store) for _ in range(2)]
+    calls = []
+    load = _slow_loader(calls, delay=0.2)
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        results = list(pool.map(lambda n: workers[n % 2].get_or_load('k', load), range(6)))
+
+    assert results == ['v'] * 6
+    assert len(calls) == 1
+
+
+def test_stale_value_is_served_while_refreshing_once():
+    cache = SharedCache('test', ttl=0.05, stale_ttl=60, store=CacheStore())
+    assert cache.get_or_load('k', lambda: 'old') == 'old'
+    time.sleep(0.1)
+
+    calls = []
+    refreshed = threading.Event()
+
+    def load():
+        calls.append(1)
+        time.sleep(0.05)
+        refreshed.set()
+        return 'new'
+
+    # 만료 후에는 기다리지 않고 이전 값을 반환, 갱신은 백그라운드에서 한 번만
+    assert [cache.get_or_load('k', load) for _ in range(5)] == ['old'] * 5
+    assert refreshed.wait(5)
+    deadline = time.monotonic() + 5
+    while cache.get_or_load('k', load) != 'new' and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert cache.get_or_load('k', load) == 'new'
+    assert len(calls) == 1
+    assert cache.stats()['stale_hits'] == 5
+
+
+def test_none_is_not_cached_and_invalidate_clears():
+    cache = SharedCache('test', ttl=60, store=CacheStore())
+    assert cache.get_or_load('k', lambda: None) is None
+    assert cache.get_or_load('k', lambda: 'v') == 'v'
+    cache.invalidate('k')
+    assert cache.get_or_load('k', lambda: 'w') == 'w'
+    cache.invalidate()
+    assert cache.get_or_load('k', lambda: 'x') == 'x'
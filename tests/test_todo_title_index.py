@@ -0,0 +1,58 @@
+"""todo_title_index.TodoTitleIndex 회귀 테스트 (오늘 마감인 할일만 구독)"""
+
+import time
+from datetime import datetime, timedelta
+
+from memory_firestore import MemoryFirestore
+from todo_title_index import TodoTitleIndex
+
+TODAY = datetime.now().strftime("%Y-%m-%d")
+TOMORROW = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
+
+
+def _todo(db, doc_id, title, due, completed=False):
+    db.collection('todos').document(doc_id).set(
+        {'title': title, 'due_date_string': due, 'is_completed': completed, 'userId': 'u1'})
+
+
+def _eventually(check, timeout=2):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if check():
+            return True
+        time.sleep(0.01)
+    return check()
+
+
+def test_caches_only_today_candidates_and_follows_listener():
+    db = MemoryFirestore()
+    _todo(db, 'today1', 'walk', TODAY)
+    _todo(db, 'later1', 'walk', TOMORROW)
+    _todo(db, 'later2', 'read', TOMORROW)
+    index = TodoTitleIndex(db)
+    index.start()
+    try:
+        assert index.resolve('walk', 'u1') == 'today1'
+        assert index.resolve('walk', 'u1') == 'today1'
+        assert index.stats()['hits'] == 1
+
+        # 오늘 마감인 후보가 없는 제목은 캐시하지 않음
+        assert index.resolve('read', 'u1') == 'later2'
+        assert index.resolve('read', 'u1') == 'later2'
+        assert index.stats()['titles'] == 1
+
+        # 오늘 할일의 이름 변경은 리스너로 반영 → 다음 조회는 다시 Firestore에서
+        db.collection('todos').document('today1').update({'title': 'run'})
+        assert _eventually(lambda: index.stats()['titles'] == 0)
+        assert index.resolve('walk', 'u1') == 'later1'
+    finally:
+        index.stop()
+
+
+def test_no_cache_without_listener():
+    db = MemoryFirestore()
+    _todo(db, 'today1', 'walk', TODAY)
+    index = TodoTitleIndex(db)
+
+    assert index.resolve('walk') == 'today1'
+    assert index.stats()['titles'] == 0
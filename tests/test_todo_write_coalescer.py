@@ -0,0 +1,47 @@
+"""todo_write_coalescer 회귀 테스트 - 바로 기록 / 배치 / 병합 기록이 같은 결과인지"""
+
+from memory_firestore import MemoryFirestore
+from todo_write_coalescer import TodoWriteCoalescer, commit_updates, merge_todo_updates
+
+UPDATES = [
+    {'pause_times': ['p1'], 'resume_times': []},
+    {'pause_times': ['p1', 'p2'], 'resume_times': ['r1']},
+    {'pause_times': [], 'resume_times': [], 'is_completed': True},
+]
+
+
+def _seed(db):
+    ref = db.collection('todos').document('todo1')
+    ref.set({'title': 'a', 'pause_times': ['old'], 'resume_times': ['old']})
+    return ref
+
+
+def test_merge_is_last_value_wins():
+    merged = UPDATES[0]
+    for update in UPDATES[1:]:
+        merged = merge_todo_updates(merged, update)
+    assert merged == {'pause_times': [], 'resume_times': [], 'is_completed': True}
+
+
+def test_direct_batch_and_coalesced_writes_agree():
+    direct_db, batch_db, coalesced_db = MemoryFirestore(), MemoryFirestore(), MemoryFirestore()
+
+    ref = _seed(direct_db)
+    for update in UPDATES:
+        ref.update(update)
+
+    ref = _seed(batch_db)
+    merged = UPDATES[0]
+    for update in UPDATES[1:]:
+        merged = merge_todo_updates(merged, update)
+    assert commit_updates(batch_db, [(ref, merged)]) == {}
+
+    ref = _seed(coalesced_db)
+    coalescer = TodoWriteCoalescer(coalesced_db, window=60)
+    for update in UPDATES:
+        coalescer.submit(ref, update)
+    assert coalescer.flush() == {}
+
+    results = [db.collection('todos').document('todo1').get().to_dict() for db in (direct_db, batch_db, coalesced_db)]
+    assert results[0] == results[1] == results[2]
+    assert results[0]['pause_times'] == [] and results[0]['resume_times'] == []
@@ -0,0 +1,255 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from observability import timed
+from tenants import TODO_USER_FIELD
+
+logger = logging.getLogger(__name__)
+
+# 자정 재구독이 실패했을 때 다시 시도하기까지 (초, 실패할 때마다 두 배, 최대 ROLLOVER_MAX_RETRY_DELAY)
+ROLLOVER_RETRY_DELAY = 5
+ROLLOVER_MAX_RETRY_DELAY = 300
+
+
+class AmbiguousTodoError(Exception):
+    """같은 제목의 할일이 여러 개라 하나로 정할 수 없는 경우"""
+
+    def __init__(self, title, candidates):
+        super().__init__(f'"{title}" 제목의 할일이 {len(candidates)}개 있습니다')
+        self.title = title
+        self.candidates = candidates
+
+
+def choose_todo(title, candidates, today_str=None):
+    """같은 제목의 후보 중 업데이트할 할일 선택
+
+    오늘 마감인 미완료 할일 → 오늘 마감인 할일 → 미완료 할일 순으로 좁혀 나가며,
+    하나로 좁혀지지 않으면 AmbiguousTodoError를 발생시킵니다.
+
+    Args:
+        candidates: 문서 ID → {'is_completed', 'due_date_string'}
+    """
+    if len(candidates) <= 1:
+        return next(iter(candidates), None)
+
+    today_str = today_str or datetime.now().strftime("%Y-%m-%d")
+    preferences = (
+        lambda info: info.get('due_date_string') == today_str and not info.get('is_completed'),
+        lambda info: info.get('due_date_string') == today_str,
+        lambda info: not info.get('is_completed'),
+    )
+    for preferred in preferences:
+        matches = [doc_id for doc_id, info in candidates.items() if preferred(info)]
+        if len(matches) == 1:
+            return matches[0]
+        if matches:
+            raise AmbiguousTodoError(title, sorted(matches))
+
+    raise AmbiguousTodoError(title, sorted(candidates))
+
+
+def _todo_info(data):
+    return {
+        'is_completed': data.get('is_completed', False),
+        'due_date_string': data.get('due_date_string'),
+    }
+
+
+class TodoTitleIndex:
+    """(사용자, 제목) → 오늘 마감인 할일 문서 ID 인덱스 (LRU + TTL, 스레드 안전)
+
+    리스너는 컬렉션 전체가 아니라 오늘 마감인 할일(due_date_string == 오늘)만 구독하므로
+    gunicorn 워커마다 리스너가 있어도 읽기 비용은 오늘 할일 수만큼입니다. 자정이 지나면 다음 날짜로
+    다시 구독하고 캐시를 비웁니다 (실패하면 지수 백오프로 다시 시도).
+
+    캐시에는 후보 중 오늘 마감인 할일만 보관합니다. choose_todo는 오늘 마감인 후보가 하나라도 있으면
+    다른 날짜의 할일과 관계없이 같은 결과를 내므로, 리스너가 보는 문서만으로 캐시를 최신으로 유지할 수
+    있습니다. 오늘 마감인 후보가 없는 제목은 캐시하지 않고 매번 조회합니다.
+    같은 제목의 문서가 여러 개면 모두 후보로 보관하고 choose_todo로 고릅니다.
+    사용자를 지정하면 그 사용자(userId)의 할일만 후보가 되고, None이면 전체 할일이 후보입니다.
+    """
+
+    def __init__(self, db, max_titles=1024, ttl=600, collection='todos'):
+        self.db = db
+        self.max_titles = max_titles
+        self.ttl = ttl
+        self.collection = collection
+        self.date_str = None  # 리스너가 보는 날짜 (리스너가 없으면 None - 캐시하지 않음)
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()  # (사용자, 제목) → (만료 시각, {문서 ID: 정보})
+        self._doc_keys = {}  # 문서 ID → 이 문서가 들어 있는 (사용자, 제목) 집합 (캐시된 문서만)
+        self._lock = threading.Lock()
+        self._watch = None
+        self._rollover_timer = None
+
+    def start(self):
+        """오늘 마감인 할일 리스너 시작 및 자정 롤오버 예약"""
+        today = datetime.now()
+        date_str = today.strftime("%Y-%m-%d")
+        query = self.db.collection(self.collection).where('due_date_string', '==', date_str)
+
+        with self._lock:
+            self._clear()
+            self.date_str = date_str
+        try:
+            self._watch = query.on_snapshot(
+                lambda docs, changes, read_time: self._on_snapshot(date_str, changes)
+            )
+        except Exception:
+            with self._lock:
+                self.date_str = None
+            raise
+
+        # 다음 자정 직후에 롤오버
+        midnight = datetime.combine(today.date() + timedelta(days=1), datetime.min.time())
+        self._rollover_timer = threading.Timer((midnight - today).total_seconds() + 1, self._rollover)
+        self._rollover_timer.daemon = True
+        self._rollover_timer.start()
+        logger.info("👀 할일 제목 인덱스 리스너 시작: %s", date_str)
+
+    def stop(self):
+        if self._rollover_timer:
+            self._rollover_timer.cancel()
+            self._rollover_timer = None
+        if self._watch:
+            self._watch.unsubscribe()
+            self._watch = None
+        with self._lock:
+            self._clear()
+            self.date_str = None
+
+    def _rollover(self, attempt=0):
+        logger.info("🌙 자정 롤오버: 할일 제목 인덱스 재구독")
+        self.stop()
+        try:
+            self.start()
+        except Exception as e:
+            # 재구독할 때까지는 캐시 없이 매번 조회
+            delay = min(ROLLOVER_MAX_RETRY_DELAY, ROLLOVER_RETRY_DELAY * 2 ** attempt)
+            logger.exception("❌ 할일 제목 인덱스 재구독 실패 (%d번째), %d초 후 다시 시도: %s", attempt + 1, delay, e)
+            self._rollover_timer = threading.Timer(delay, self._rollover, args=(attempt + 1,))
+            self._rollover_timer.daemon = True
+            self._rollover_timer.start()
+
+    def resolve(self, title, user_id=None):
+        """제목에 해당하는 할일 문서 ID 반환 (없으면 None)
+
+        Raises:
+            AmbiguousTodoError: 후보가 여러 개라 하나로 정할 수 없을 때
+        """
+        key = (user_id, title)
+        cached = self._lookup(key)
+        if cached is not None:
+            date_str, candidates = cached
+            return choose_todo(title, candidates, date_str)
+
+        candidates = self._load(key)
+        return choose_todo(title, candidates)
+
+    def invalidate_doc(self, doc_id):
+        """업데이트가 NotFound로 실패한 문서를 인덱스에서 제거"""
+        with self._lock:
+            self._discard_doc(doc_id)
+
+    def _lookup(self, key):
+        """캐시 적중 → (리스너 날짜, 후보), 미스 → None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self.date_str, dict(entry[1])
+
+    def _load(self, key):
+        """캐시 미스: 같은 제목(과 사용자)의 모든 문서 조회 → 전체 후보 (오늘 마감인 후보만 캐시)"""
+        user_id, title = key
+        query = self.db.collection(self.collection).where('title', '==', title)
+        if user_id is not None:
+            query = query.where(TODO_USER_FIELD, '==', user_id)
+
+        with timed('firestore_query'):
+            docs = query.select(['is_completed', 'due_date_string']).get()
+        candidates = {doc.id: _todo_info(doc.to_dict()) for doc in docs}
+
+        with self._lock:
+            self._drop_title(key)
+            today = {doc_id: info for doc_id, info in candidates.items()
+                     if self.date_str is not None and info['due_date_string'] == self.date_str}
+            if today:
+                self._entries[key] = (time.monotonic() + self.ttl, today)
+                for doc_id in today:
+                    self._doc_keys.setdefault(doc_id, set()).add(key)
+                while len(self._entries) > self.max_titles:
+                    self._drop_title(next(iter(self._entries)))
+
+        return candidates
+
+    def _on_snapshot(self, date_str, changes):
+        """캐시된 제목에 해당하는 변경만 인덱스에 반영
+
+        REMOVED는 삭제되었거나 날짜가 바뀌어 오늘 범위를 벗어난 문서이므로 후보에서 뺍니다.
+        """
+        with self._lock:
+            # 롤오버 이후 늦게 도착한 이전 날짜 스냅샷은 무시
+            if date_str != self.date_str:
+                return
+            for change in changes:
+                doc = change.document
+                if change.type.name == 'REMOVED':
+                    self._discard_doc(doc.id)
+                    continue
+
+                data = doc.to_dict()
+                title = data.get('title')
+                keys = {(None, title), (data.get(TODO_USER_FIELD), title)}
+
+                # 이름(또는 사용자)이 바뀐 경우 이전 키에서 제거
+                if not self._doc_keys.get(doc.id, set()) <= keys:
+                    self._discard_doc(doc.id)
+
+                for key in keys:
+                    entry = self._entries.get(key)
+                    if entry is not None:
+                        entry[1][doc.id] = _todo_info(data)
+                        self._doc_keys.setdefault(doc.id, set()).add(key)
+
+    def _discard_doc(self, doc_id):
+        # self._lock을 잡은 상태에서 호출
+        for key in self._doc_keys.pop(doc_id, ()):
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry[1].pop(doc_id, None)
+                if not entry[1]:
+                    del self._entries[key]
+
+    def _clear(self):
+        # self._lock을 잡은 상태에서 호출
+        self._entries.clear()
+        self._doc_keys.clear()
+
+    def _drop_title(self, key):
+        # self._lock을 잡은 상태에서 호출
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            for doc_id in entry[1]:
+                keys = self._doc_keys.get(doc_id)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self._doc_keys[doc_id]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'date': self.date_str,
+                'hits': self.hits,
+                'misses': self.misses,
+                'titles': len(self._entries),
+            }
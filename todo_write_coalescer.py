@@ -0,0 +1,147 @@
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+# Firestore WriteBatch 한 번에 넣을 수 있는 최대 쓰기 수
+MAX_BATCH_WRITES = 500
+
+def merge_todo_updates(base, new):
+    """같은 할일에 대한 두 업데이트를 하나로 병합
+
+    /update-todo를 요청마다 바로 기록할 때와 같은 결과가 되도록 모든 필드(pause_times / resume_times
+    배열 포함)는 마지막 값으로 덮어씁니다.
+    """
+    merged = dict(base)
+    merged.update(new)
+    return merged
+
+
+class TodoWriteStats:
+    """할일 업데이트의 쓰기 증폭 측정
+
+    updates  : 클라이언트가 요청한 논리적 업데이트 수
+    writes   : Firestore에 실제로 기록한 문서 쓰기 수
+    commits  : Firestore 쓰기 RPC(update 또는 batch commit) 수
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.updates = 0
+        self.writes = 0
+        self.commits = 0
+
+    def record(self, updates=0, writes=0, commits=0):
+        with self._lock:
+            self.updates += updates
+            self.writes += writes
+            self.commits += commits
+
+    def to_dict(self):
+        with self._lock:
+            updates = self.updates or 1
+            return {
+                'updates': self.updates,
+                'writes': self.writes,
+                'commits': self.commits,
+                # 업데이트 1건당 문서 쓰기 / RPC 수 (요청마다 바로 쓰면 둘 다 1.0)
+                'writes_per_update': round(self.writes / updates, 3),
+                'commits_per_update': round(self.commits / updates, 3),
+            }
+
+
+def commit_updates(db, updates, stats=None):
+    """(doc_ref, update_data) 목록을 WriteBatch로 나누어 커밋
+
+    배치는 원자적이므로 문서 하나가 없으면 배치 전체가 실패합니다. 이 경우 해당 배치만
+    문서별 업데이트로 다시 시도해서 실패한 문서를 골라냅니다.
+
+    Returns:
+        실패한 문서 ID → 오류 메시지
+    """
+    failures = {}
+    for start in range(0, len(updates), MAX_BATCH_WRITES):
+        chunk = updates[start:start + MAX_BATCH_WRITES]
+
+        batch = db.batch()
+        for doc_ref, update_data in chunk:
+            batch.update(doc_ref, update_data)
+
+        try:
+            batch.commit()
+            if stats:
+                stats.record(writes=len(chunk), commits=1)
+            continue
+        except Exception as e:
+            logger.warning("⚠️ 배치 커밋 실패, 문서별로 재시도: %s", e)
+            if stats:
+                stats.record(commits=1)
+
+        for doc_ref, update_data in chunk:
+            try:
+                doc_ref.update(update_data)
+                if stats:
+                    stats.record(writes=1, commits=1)
+            except Exception as e:
+                failures[doc_ref.id] = str(e)
+                if stats:
+                    stats.record(commits=1)
+
+    return failures
+
+
+class TodoWriteCoalescer:
+    """짧은 시간 안에 들어온 같은 할일의 업데이트를 모아 한 번에 기록
+
+    첫 업데이트가 들어오면 window초 뒤에 대기 중인 모든 업데이트를 WriteBatch 하나로
+    커밋합니다. 같은 문서에 대한 업데이트는 merge_todo_updates로 병합되어 (필드마다 마지막 값)
+    바로 기록할 때와 같은 결과가 됩니다.
+    """
+
+    def __init__(self, db, window, stats=None, on_failure=None):
+        self.db = db
+        self.window = window
+        self.stats = stats or TodoWriteStats()
+        self.on_failure = on_failure  # 기록에 실패한 문서 ID를 받는 콜백
+
+        self._lock = threading.Lock()
+        self._pending = {}  # 문서 ID → (doc_ref, 병합된 업데이트)
+        self._timer = None
+
+    def submit(self, doc_ref, update_data):
+        """업데이트를 대기열에 추가 (즉시 반환)"""
+        with self._lock:
+            pending = self._pending.get(doc_ref.id)
+            if pending:
+                update_data = merge_todo_updates(pending[1], update_data)
+            self._pending[doc_ref.id] = (doc_ref, update_data)
+
+            if self._timer is None:
+                self._timer = threading.Timer(self.window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+        self.stats.record(updates=1)
+
+    def flush(self):
+        """대기 중인 업데이트를 모두 커밋"""
+        with self._lock:
+            pending = list(self._pending.values())
+            self._pending = {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+        if not pending:
+            return {}
+
+        updates = pending
+        failures = commit_updates(self.db, updates, self.stats)
+        for doc_id, error in failures.items():
+            logger.error("❌ 병합된 할일 업데이트 실패 (%s): %s", doc_id, error)
+            if self.on_failure:
+                self.on_failure(doc_id)
+
+        logger.info("✅ 병합된 할일 업데이트 %d건 기록", len(updates) - len(failures))
+        return failures
@@ -1,16 +1,23 @@
 #!/usr/bin/env python3
 """
 Firebase Firestore에 테스트 이미지 두 개를 저장하는 스크립트
+
+로컬 블롭 저장소(BLOB_STORE=local, 기본)는 앱이 이미지를 받을 서버 주소가 필요합니다:
+    BLOB_PUBLIC_BASE_URL=http://192.168.0.12:5050 python upload_test_images.py
+    python upload_test_images.py --base-url http://192.168.0.12:5050
 """
 
+import argparse
+
 import firebase_admin
 from firebase_admin import credentials, firestore
-import base64
 import requests
 from datetime import datetime
 import os
 import uuid
 
+from blob_store import LocalBlobStore, get_blob_store, store_character_image
+
 def initialize_firebase():
     """Firebase 초기화"""
     try:
@@ -32,8 +39,8 @@ def initialize_firebase():
     
     return firestore.client()
 
-def download_image_as_base64(url):
-    """URL에서 이미지 다운로드 후 Base64로 변환"""
+def download_image_to_blob_store(store, url, base_url=None):
+    """URL에서 이미지 다운로드 후 블롭 저장소에 저장 (원본 + 썸네일)"""
     try:
         print(f"🔄 이미지 다운로드 중: {url}")
         response = requests.get(url, timeout=30)
@@ -42,12 +49,11 @@ def download_image_as_base64(url):
         # 이미지 타입 감지
         content_type = response.headers.get('content-type', 'image/jpeg')
         
-        # Base64 인코딩
-        base64_string = base64.b64encode(response.content).decode('utf-8')
-        data_url = f"data:{content_type};base64,{base64_string}"
+        # 문서에는 이미지 대신 참조(URL, 키, 썸네일)만 저장
+        image_fields = store_character_image(store, response.content, content_type.split(';')[0], base_url)
         
         print(f"✅ 이미지 다운로드 완료! 크기: {len(response.content)} bytes")
-        return data_url
+        return image_fields
         
     except Exception as e:
         print(f"❌ 이미지 다운로드 실패: {e}")
@@ -109,6 +115,16 @@ def get_user_input():
     return images
 
 def main():
+    parser = argparse.ArgumentParser(description='테스트 캐릭터 이미지를 블롭 저장소 / Firestore에 저장')
+    parser.add_argument('--base-url', default=os.environ.get('BLOB_PUBLIC_BASE_URL', ''),
+                        help='로컬 블롭 저장소 이미지 URL에 쓸 서버 주소 (기본: BLOB_PUBLIC_BASE_URL)')
+    args = parser.parse_args()
+
+    store = get_blob_store()
+    if isinstance(store, LocalBlobStore) and not (store.base_url or args.base_url):
+        # 앱이 Firestore의 image_url을 그대로 불러오므로 상대 URL은 저장하지 않음
+        parser.error("로컬 블롭 저장소는 BLOB_PUBLIC_BASE_URL 또는 --base-url(앱에서 접근 가능한 서버 주소)이 필요합니다")
+
     print("🚀 Firebase 이미지 업로드 스크립트 시작!")
     print("=" * 50)
     
@@ -135,15 +151,15 @@ def main():
     for i, image_info in enumerate(test_images, 1):
         print(f"🎨 [{i}/{len(test_images)}] {image_info['name']} 처리 중...")
         
-        # 이미지 다운로드 및 Base64 변환
-        base64_image = download_image_as_base64(image_info['url'])
+        # 이미지 다운로드 및 블롭 저장소에 저장
+        image_fields = download_image_to_blob_store(store, image_info['url'], args.base_url or None)
         
-        if base64_image:
+        if image_fields:
             # 캐릭터 데이터 구성
             character_data = {
                 'name': image_info['name'],
                 'prompt': image_info['prompt'],
-                'image_url': base64_image,
+                **image_fields,
                 'user_id': 'test_user',  # 테스트용 사용자 ID
                 'generation_type': 'prompt',
                 'type': image_info['type'],